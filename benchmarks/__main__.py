@@ -0,0 +1,168 @@
+import argparse
+import logging
+import os
+import sys
+
+from tabulate import tabulate
+
+from benchmarks.cases import env_step_cases
+from benchmarks.history import BenchmarkHistory, compare
+from benchmarks.kernels import run_kernel_cases
+from benchmarks.runner import run_cases
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Environment step benchmarks")
+    parser.add_argument(
+        "-q",
+        "--quick",
+        action="store_true",
+        help="Only run the default configuration of each environment",
+    )
+    parser.add_argument(
+        "-f",
+        "--filter",
+        nargs="*",
+        default=[],
+        metavar=("pattern"),
+        help="Only run cases whose name contains one of the patterns",
+    )
+    parser.add_argument(
+        "-k",
+        "--kernels",
+        action="store_true",
+        help="Time the NumPy and Numba kernels instead of the environment steps",
+    )
+    parser.add_argument("--steps", type=int, default=500, help="Timed steps per repeat")
+    parser.add_argument("--warmup", type=int, default=50, help="Untimed warmup steps")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed repeats")
+    parser.add_argument(
+        "--history",
+        default=os.path.join("assets", "benchmarks", "history.json"),
+        help="Path to the JSON history",
+    )
+    parser.add_argument(
+        "-s", "--save", action="store_true", help="Append the run to the history"
+    )
+    parser.add_argument("-l", "--label", help="Label of the run in the history")
+    parser.add_argument(
+        "-c",
+        "--compare",
+        nargs="?",
+        const="",
+        metavar=("label"),
+        help="Compare against the run with the label, or the latest run if no label is given",
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown that counts as a regression",
+    )
+    args = parser.parse_args()
+
+    if args.kernels:
+        print_kernel_results(run_kernel_cases())
+        return
+
+    cases = env_step_cases(quick=args.quick)
+    if args.filter:
+        cases = [
+            case
+            for case in cases
+            if any(pattern in case.name for pattern in args.filter)
+        ]
+
+    history = BenchmarkHistory(args.history)
+    baseline = None
+    if args.compare is not None:
+        baseline = history.get(args.compare or None)
+        if baseline is None:
+            logging.warning(f"No run to compare against in {args.history}")
+
+    results = run_cases(
+        cases, steps=args.steps, warmup=args.warmup, repeats=args.repeats
+    )
+
+    print_results(results, baseline["results"] if baseline else None)
+
+    if args.save:
+        run = history.append(results, args.label)
+        history.save()
+        logging.info(f"Saved run {run['label']} to {args.history}")
+
+    if baseline is None:
+        return
+
+    regressions = compare(results, baseline["results"], args.threshold)
+    if len(regressions) == 0:
+        logging.info(f"No regressions against {baseline['label']}")
+        return
+    for regression in regressions:
+        if regression.current is None:
+            logging.error(
+                f"Regression in {regression.case}: {regression.baseline:.1f} steps/s "
+                f"-> failed with {regression.error}"
+            )
+            continue
+        logging.error(
+            f"Regression in {regression.case}: {regression.baseline:.1f} -> "
+            f"{regression.current:.1f} steps/s ({regression.change:+.1%})"
+        )
+    sys.exit(1)
+
+
+def print_results(results, baseline=None):
+    counted = any("positions_per_step" in result for result in results.values())
+    rows = []
+    for case, result in results.items():
+        row = [case, _format(result.get("steps_per_sec"), result.get("error"))]
+        if counted:
+            row.append(_format(result.get("positions_per_step")))
+        if baseline is not None:
+            previous = baseline.get(case, {}).get("steps_per_sec")
+            current = result.get("steps_per_sec")
+            change = (
+                f"{current / previous - 1:+.1%}"
+                if previous is not None and current is not None
+                else None
+            )
+            row += [_format(previous), change]
+        rows.append(row)
+
+    headers = ["Case", "Steps/s"]
+    if counted:
+        headers.append("Positions/step")
+    if baseline is not None:
+        headers += ["Baseline", "Change"]
+    print(tabulate(rows, headers=headers, disable_numparse=True))
+
+
+def print_kernel_results(results):
+    rows = []
+    for case, times in results.items():
+        numpy, numba = times.get("numpy"), times.get("numba")
+        speedup = f"{numpy / numba:.1f}x" if numba is not None else None
+        rows.append([case, f"{numpy:.3f}", _format_ms(numba), speedup])
+    print(
+        tabulate(
+            rows,
+            headers=["Kernel", "NumPy (ms)", "Numba (ms)", "Speedup"],
+            disable_numparse=True,
+        )
+    )
+
+
+def _format_ms(value: float | None) -> str:
+    return f"{value:.3f}" if value is not None else "n/a"
+
+
+def _format(value: float | None, default: str | None = None) -> str | None:
+    return f"{value:.1f}" if value is not None else default
+
+
+if __name__ == "__main__":
+    main()
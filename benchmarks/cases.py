@@ -0,0 +1,165 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
+
+from multiworld.base import MultiWorldEnv
+from multiworld.multigrid.utils.preprocessing import PreprocessingEnum
+from multiworld.utils.jit import KernelBackend
+
+
+def _go_to_goal(**kwargs) -> MultiWorldEnv:
+    from multiworld.multigrid.envs.go_to_goal import GoToGoalEnv
+
+    return GoToGoalEnv(**kwargs)
+
+
+def _tag(**kwargs) -> MultiWorldEnv:
+    from multiworld.multigrid.envs.tag import TagEnv
+
+    return TagEnv(**kwargs)
+
+
+def _cleanup(**kwargs) -> MultiWorldEnv:
+    from multiworld.multigrid.envs.cleanup import CleanUpEnv
+
+    return CleanUpEnv(boxes=4, **kwargs)
+
+
+def _boxwar(**kwargs) -> MultiWorldEnv:
+    from multiworld.multigrid.envs.boxwar import BoxWarEnv
+
+    return BoxWarEnv(boxes=4, team_reward=True, **kwargs)
+
+
+def _flock(**kwargs) -> MultiWorldEnv:
+    from multiworld.swarm.envs.flock import FlockEnv
+
+    return FlockEnv(predators=1, **kwargs)
+
+
+@dataclass
+class BenchmarkCase:
+    """
+    A single environment configuration to measure.
+    """
+
+    env: str
+    factory: Callable[..., MultiWorldEnv]
+    params: Dict[str, Any] = field(default_factory=dict)
+    render: bool = False
+    # Also count the Position objects created per step, in an untimed pass
+    count_positions: bool = False
+
+    @property
+    def name(self) -> str:
+        params = ",".join(
+            f"{key}={_format(value)}" for key, value in self.params.items()
+        )
+        return f"{self.env}/{params},render={self.render}"
+
+    def build(self) -> MultiWorldEnv:
+        return self.factory(render_mode="rgb_array", **self.params)
+
+
+# Every case starts from the defaults and changes one axis at a time, so each
+# axis can be read independently without running the full cartesian product.
+MULTIGRID_DEFAULTS = {
+    "agents": 4,
+    "width": 20,
+    "height": 20,
+    "agent_view_size": 7,
+    "preprocessing": PreprocessingEnum.none,
+}
+MULTIGRID_SWEEPS = {
+    "agents": [1, 16],
+    "size": [10, 40],
+    "agent_view_size": [3, 11],
+    "preprocessing": [PreprocessingEnum.ohe, PreprocessingEnum.ohe_minimal],
+    "batched_actions": [True],
+    "incremental_observations": [True],
+    "kernel_backend": [KernelBackend.numba],
+}
+# Environments with boxes and containers: the one-hot encodings only cover the
+# object types up to agents, and BoxWarEnv splits the agents into two teams
+CARRYING_SWEEPS = {
+    axis: [2, 16] if axis == "agents" else values
+    for axis, values in MULTIGRID_SWEEPS.items()
+    if axis != "preprocessing"
+}
+
+SWARM_DEFAULTS = {
+    "agents": 4,
+    "width": 500,
+    "height": 500,
+    "agent_view_size": 101,
+}
+SWARM_SWEEPS = {
+    "agents": [1, 32],
+    "size": [200, 1000],
+    "agent_view_size": [51, 201],
+    "kernel_backend": [KernelBackend.numba],
+}
+
+# Many agents on a small grid, where the Position allocations of the step path
+# used to dominate the step time
+ALLOCATION_CASES = [
+    BenchmarkCase(
+        "go_to_goal",
+        _go_to_goal,
+        {
+            **MULTIGRID_DEFAULTS,
+            "agents": 50,
+            "preprocessing": PreprocessingEnum.ohe_minimal,
+        },
+        count_positions=True,
+    ),
+]
+
+ENVIRONMENTS = {
+    "go_to_goal": (_go_to_goal, MULTIGRID_DEFAULTS, MULTIGRID_SWEEPS),
+    "tag": (_tag, MULTIGRID_DEFAULTS, MULTIGRID_SWEEPS),
+    "cleanup": (_cleanup, MULTIGRID_DEFAULTS, CARRYING_SWEEPS),
+    "boxwar": (_boxwar, MULTIGRID_DEFAULTS, CARRYING_SWEEPS),
+    "flock": (_flock, SWARM_DEFAULTS, SWARM_SWEEPS),
+}
+
+
+def env_step_cases(quick: bool = False) -> List[BenchmarkCase]:
+    """
+    Generate the environment step benchmark cases.
+
+    Parameters
+    ----------
+    quick : bool
+        Only measure the default configuration of each environment, with and
+        without rendering. Otherwise the allocation cases are measured too.
+
+    Returns
+    -------
+    List[BenchmarkCase]
+        The cases, in a stable order
+    """
+    cases = []
+    for env, (factory, defaults, sweeps) in ENVIRONMENTS.items():
+        variants = [dict(defaults)]
+        if not quick:
+            for axis, values in sweeps.items():
+                for value in values:
+                    params = dict(defaults)
+                    if axis == "size":
+                        params["width"] = params["height"] = value
+                    else:
+                        params[axis] = value
+                    variants.append(params)
+
+        for params in variants:
+            cases.append(BenchmarkCase(env, factory, params, render=False))
+        cases.append(BenchmarkCase(env, factory, dict(defaults), render=True))
+    if not quick:
+        cases.extend(ALLOCATION_CASES)
+    return cases
+
+
+def _format(value: Any) -> str:
+    if isinstance(value, (PreprocessingEnum, KernelBackend)):
+        return value.value
+    return str(value)
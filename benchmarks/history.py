@@ -0,0 +1,130 @@
+import json
+import os
+import platform
+import subprocess
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+
+@dataclass
+class Regression:
+    case: str
+    baseline: float
+    current: float | None
+    error: str | None = None
+
+    @property
+    def change(self) -> float:
+        """
+        Relative change in steps per second, -1 if the case failed.
+        """
+        if self.current is None:
+            return -1.0
+        return self.current / self.baseline - 1
+
+
+class BenchmarkHistory:
+    """
+    Append-only JSON history of benchmark runs.
+
+    Each run stores the results per case together with the commit and machine
+    it was measured on, so later runs can be compared against it.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._runs: List[Dict] = []
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self._runs = json.load(f)
+
+    @property
+    def runs(self) -> List[Dict]:
+        return self._runs
+
+    def get(self, label: str | None = None) -> Dict | None:
+        """
+        Return the latest run with the given label, or the latest run if no label is given.
+        """
+        for run in reversed(self._runs):
+            if label is None or run["label"] == label:
+                return run
+        return None
+
+    def append(self, results: Dict[str, Dict], label: str | None = None) -> Dict:
+        commit = _git_commit()
+        run = {
+            "label": label or commit or datetime.now().strftime("%Y%m%d-%H%M%S"),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": commit,
+            "machine": {
+                "platform": platform.platform(),
+                "processor": platform.processor(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+            },
+            "results": results,
+        }
+        self._runs.append(run)
+        return run
+
+    def save(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self._path, "w") as f:
+            json.dump(self._runs, f, indent=2)
+
+
+def compare(
+    results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float = 0.1
+) -> List[Regression]:
+    """
+    Return the cases that got slower than the baseline by more than the threshold.
+
+    Parameters
+    ----------
+    results : Dict[str, Dict]
+        Results of the current run
+    baseline : Dict[str, Dict]
+        Results of the run to compare against
+    threshold : float
+        Allowed relative drop in steps per second, e.g. 0.1 for 10%
+
+    Returns
+    -------
+    List[Regression]
+        The regressed cases, including the cases that fail now but passed in the
+        baseline. Cases missing from either run, or that failed in the baseline,
+        are not compared.
+    """
+    regressions = []
+    for case, result in results.items():
+        if case not in baseline:
+            continue
+        current = result.get("steps_per_sec")
+        previous = baseline[case].get("steps_per_sec")
+        if previous is None:
+            continue
+        if current is None:
+            regressions.append(Regression(case, previous, None, result.get("error")))
+            continue
+        if current < previous * (1 - threshold):
+            regressions.append(Regression(case, previous, current))
+    return regressions
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
@@ -0,0 +1,137 @@
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from multiworld.multigrid.core.agent import AgentState
+from multiworld.multigrid.envs.go_to_goal import GoToGoalEnv
+from multiworld.multigrid.utils.observation import (
+    gen_agent_views,
+    get_vis_mask,
+    ohe_grid_encoding,
+)
+from multiworld.multigrid.utils.preprocessing import PreprocessingEnum
+from multiworld.swarm.utils.observation import pairwise_distances
+from multiworld.utils.jit import NUMBA_AVAILABLE, KernelBackend
+
+
+@dataclass
+class KernelCase:
+    """
+    A kernel call to measure with both backends.
+    """
+
+    name: str
+    # Returns the call of the kernel with the given backend
+    setup: Callable[[KernelBackend], Callable[[], object]]
+
+
+def _grid(size: int) -> np.ndarray:
+    env = GoToGoalEnv(agents=4, width=size, height=size, render_mode="rgb_array")
+    env.reset(seed=0)
+    grid = env._world.state[..., :3].astype(np.uint8)
+    env.close()
+    return grid
+
+
+def _agent_states(agents: int, size: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    env = GoToGoalEnv(agents=agents, width=size, height=size, render_mode="rgb_array")
+    state = np.asarray(env._agent_states).copy()
+    env.close()
+    state[:, 2] = rng.integers(0, 4, agents)
+    state[:, 3:5] = rng.integers(0, size, (agents, 2))
+    return state
+
+
+def _ohe(backend: KernelBackend) -> Callable[[], object]:
+    grid = _grid(30)
+    return lambda: ohe_grid_encoding(grid, PreprocessingEnum.ohe, backend=backend)
+
+
+def _agent_views(backend: KernelBackend) -> Callable[[], object]:
+    grid = ohe_grid_encoding(_grid(30), PreprocessingEnum.ohe)
+    state = _agent_states(100, 30)
+    return lambda: gen_agent_views(grid, state, 7, PreprocessingEnum.ohe, backend)
+
+
+def _vis_mask(backend: KernelBackend) -> Callable[[], object]:
+    views = gen_agent_views(
+        _grid(30), _agent_states(100, 30), 7, PreprocessingEnum.none
+    )
+    return lambda: get_vis_mask(views, backend)
+
+
+def _moves(backend: KernelBackend) -> Callable[[], object]:
+    rng = np.random.default_rng(0)
+    agents, size = 100, 30
+    env = GoToGoalEnv(agents=agents, width=size, height=size, render_mode="rgb_array")
+    env.reset(seed=0)
+    env._kernel_backend = backend
+    view = env._agent_states._view
+    start = view.copy()
+    movers = rng.permutation(agents)
+    targets = np.clip(
+        view[movers, AgentState.POS] + rng.integers(-1, 2, (agents, 2)), 1, size - 2
+    )
+    blocked = rng.random(agents) < 0.1
+    goal = np.zeros(agents, dtype=np.bool_)
+
+    def call():
+        view[...] = start
+        return list(env._resolve_moves(movers, targets, blocked, goal))
+
+    return call
+
+
+def _distances(backend: KernelBackend) -> Callable[[], object]:
+    agent_pos = np.random.default_rng(0).random((200, 2)) * 500
+    return lambda: pairwise_distances(agent_pos, backend)
+
+
+KERNEL_CASES = [
+    KernelCase("OHE of a 30x30 grid", _ohe),
+    KernelCase("agent views, 100 agents, 7x7", _agent_views),
+    KernelCase("vis mask, 100 agents, 7x7", _vis_mask),
+    KernelCase("batched moves, 100 agents", _moves),
+    KernelCase("swarm pairwise distances, 200 agents", _distances),
+]
+
+
+def run_kernel_cases(
+    cases: List[KernelCase] = KERNEL_CASES, calls: int = 20
+) -> Dict[str, Dict[str, float]]:
+    """
+    Measure the time per call of every kernel with the NumPy and Numba backends.
+
+    Each backend is called once before timing, so the Numba times do not include
+    the compilation.
+
+    Parameters
+    ----------
+    calls : int
+        Timed calls per kernel and backend
+
+    Returns
+    -------
+    Dict[str, Dict[str, float]]
+        Milliseconds per call by backend name, by case name. Without Numba only
+        the NumPy times are measured
+    """
+    backends = [KernelBackend.numpy]
+    if NUMBA_AVAILABLE:
+        backends.append(KernelBackend.numba)
+
+    results = {}
+    for case in cases:
+        results[case.name] = {}
+        for backend in backends:
+            call = case.setup(backend)
+            call()
+            start = time.perf_counter()
+            for _ in range(calls):
+                call()
+            elapsed = time.perf_counter() - start
+            results[case.name][backend.value] = elapsed / calls * 1000
+    return results
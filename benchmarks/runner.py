@@ -0,0 +1,119 @@
+import logging
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.cases import BenchmarkCase
+from multiworld.core.position import Position
+
+
+def run_case(
+    case: BenchmarkCase,
+    steps: int = 500,
+    warmup: int = 50,
+    repeats: int = 3,
+    seed: int = 0,
+) -> Dict[str, float | str]:
+    """
+    Measure the steps per second of an environment with uniformly random actions.
+
+    The actions are sampled before timing, so only ``env.step`` (and
+    ``env.render`` when the case renders) is measured. Episodes that end are
+    reset, and the reset is part of the measurement.
+
+    Parameters
+    ----------
+    case : BenchmarkCase
+        Environment configuration to measure
+    steps : int
+        Number of timed steps per repeat
+    warmup : int
+        Number of untimed steps before the first repeat
+    repeats : int
+        Number of timed repeats
+    seed : int
+        Seed for the environment and the sampled actions
+
+    Returns
+    -------
+    Dict[str, float | str]
+        The median, min and max steps per second over the repeats, and the
+        Position objects created per step if the case counts them, or the
+        error if the environment failed
+    """
+    try:
+        np.random.seed(seed)
+        env = case.build()
+        env.reset()
+        action_space = env.action_space
+        action_space.seed(seed)
+        actions = [action_space.sample() for _ in range(warmup + steps * repeats)]
+
+        _step(env, actions[:warmup], case.render)
+        steps_per_sec = []
+        for i in range(repeats):
+            start = warmup + i * steps
+            elapsed = _step(env, actions[start : start + steps], case.render)
+            steps_per_sec.append(steps / elapsed)
+
+        result = {
+            "steps_per_sec": float(np.median(steps_per_sec)),
+            "min": float(np.min(steps_per_sec)),
+            "max": float(np.max(steps_per_sec)),
+        }
+        if case.count_positions:
+            created = _count_positions(
+                env, actions[warmup : warmup + steps], case.render
+            )
+            result["positions_per_step"] = created / steps
+        env.close()
+    except Exception as e:
+        logging.warning(f"Benchmark {case.name} failed: {e!r}")
+        return {"error": repr(e)}
+
+    return result
+
+
+def run_cases(
+    cases: List[BenchmarkCase], **kwargs
+) -> Dict[str, Dict[str, float | str]]:
+    """
+    Run every case, see :func:`run_case` for the keyword arguments.
+    """
+    results = {}
+    for i, case in enumerate(cases):
+        logging.info(f"[{i + 1}/{len(cases)}] {case.name}")
+        results[case.name] = run_case(case, **kwargs)
+    return results
+
+
+def _step(env, actions: List[Dict], render: bool) -> float:
+    start = time.perf_counter()
+    for action in actions:
+        _, _, terminations, truncations, _ = env.step(action)
+        if render:
+            env.render()
+        if all(terminations.values()) or all(truncations.values()):
+            env.reset()
+    return time.perf_counter() - start
+
+
+def _count_positions(env, actions: List[Dict], render: bool) -> int:
+    """
+    Number of Position objects created while stepping through the actions.
+    """
+    created = 0
+    init = Position.__init__
+
+    def counting_init(self, *args, **kwargs):
+        nonlocal created
+        created += 1
+        init(self, *args, **kwargs)
+
+    Position.__init__ = counting_init
+    try:
+        _step(env, actions, render)
+    finally:
+        Position.__init__ = init
+    return created
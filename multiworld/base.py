@@ -357,7 +357,7 @@ class MultiWorldEnv(gym.Env, RandomMixin, ABC):
                 continue
 
             # Don't place the object where agents are
-            if np.array(self.agent_states.pos == pos).any():
+            if self.agent_states.at(pos).any():
                 continue
 
             # Check if there is a filtering criterion
@@ -1,26 +1,44 @@
 import math
+from collections import Counter
 from functools import partial
-from typing import Dict, List, Literal, Optional, SupportsFloat, Tuple
+from typing import Dict, Iterator, List, Literal, Optional, SupportsFloat, Tuple
 
 import numpy as np
 from numpy.typing import NDArray
 
 from multiworld.base import MultiWorldEnv
 from multiworld.core.position import Position
-from multiworld.multigrid.core.action import Action
+from multiworld.multigrid.core.action import NAVIGATION_ACTIONS, Action
 from multiworld.multigrid.core.agent import Agent, AgentState
-from multiworld.multigrid.core.constants import TILE_PIXELS, WorldObjectType
+from multiworld.multigrid.core.constants import (
+    DIR_TO_VEC,
+    TILE_PIXELS,
+    WorldObjectType,
+)
 from multiworld.multigrid.core.grid import Grid
 from multiworld.multigrid.core.world_object import Container, WorldObject
 from multiworld.multigrid.utils.decoder import decode_observation
+from multiworld.multigrid.utils.kernels import resolve_moves_kernel
 from multiworld.multigrid.utils.observation import gen_obs_grid_encoding
-from multiworld.multigrid.utils.ohe import ohe_direction
+from multiworld.multigrid.utils.observation_cache import ObservationCache
+from multiworld.multigrid.utils.ohe import ohe_directions
 from multiworld.multigrid.utils.preprocessing import PreprocessingEnum
+from multiworld.utils.jit import KernelBackend, resolve_kernel_backend
 from multiworld.utils.typing import AgentID, ObsType
 from utils.common.callbacks import RenderingCallback, empty_rendering_callback
 
+# Actions that can be executed for all agents at once (see `batched_actions`)
+BATCHED_ACTIONS = frozenset((Action.left, Action.right, Action.forward))
+DIR_VECTORS = np.array(DIR_TO_VEC)
+EMPTY_TYPES = np.array(
+    [WorldObjectType.empty.to_index(), WorldObjectType.unseen.to_index()]
+)
+
 
 class MultiGridEnv(MultiWorldEnv):
+    # Size of the action space of the agents, the first actions of Action
+    actions = len(NAVIGATION_ACTIONS)
+
     def __init__(
         self,
         agents: int = 1,
@@ -40,7 +58,24 @@ class MultiGridEnv(MultiWorldEnv):
         success_termination_mode: Literal["all", "any"] = "all",
         failure_termination_mode: Literal["all", "any"] = "any",
         caption: str = "MultiGrid",
+        batched_actions: bool = False,
+        incremental_observations: bool = False,
+        kernel_backend: KernelBackend | str = KernelBackend.numpy,
     ):
+        """
+        Parameters
+        ----------
+        batched_actions : bool
+            Execute left/right/forward actions for all agents at once instead
+            of one agent at a time. The result is identical to the sequential
+            path; steps containing any other action fall back to it.
+        incremental_observations : bool
+            Only regenerate the observations of agents whose view changed since
+            the previous step (see :class:`ObservationCache`).
+        kernel_backend : KernelBackend | str
+            Implementation of the observation and collision kernels. ``numba``
+            falls back to ``numpy`` when Numba is not installed.
+        """
         if screen_size is None:
             screen_size = (width * tile_size, height * tile_size)
         elif isinstance(screen_size, int):
@@ -63,6 +98,8 @@ class MultiGridEnv(MultiWorldEnv):
         )
         self.metadata["name"] = "multigrid"
         self._preprocessing = preprocessing
+        self._batched_actions = batched_actions
+        self._kernel_backend = resolve_kernel_backend(kernel_backend)
         self._highlight = highlight
         self._tile_size = tile_size
         self._render_size = None
@@ -76,10 +113,24 @@ class MultiGridEnv(MultiWorldEnv):
         self._agents: List[Agent] = []
         for i in range(self._num_agents):
             agent = Agent(
-                i, agent_view_size or self._width, see_through_walls, preprocessing
+                i,
+                agent_view_size or self._width,
+                see_through_walls,
+                preprocessing,
+                self.actions,
             )
             self._agents.append(agent)
         self._world = Grid(width, height)
+        self._observation_cache = (
+            ObservationCache(
+                agent_view_size,
+                see_through_walls,
+                preprocessing,
+                self._kernel_backend,
+            )
+            if incremental_observations and agent_view_size is not None
+            else None
+        )
 
     def update_from_numpy(self, observation: NDArray):
         grid: NDArray[np.int_] = observation[0]
@@ -105,7 +156,9 @@ class MultiGridEnv(MultiWorldEnv):
                         self._agents[-1].index if len(self._agents) > 0 else 0
                     )
                     agent = Agent(
-                        previous_agent_idx, self._agent_view_size or self._width
+                        previous_agent_idx,
+                        self._agent_view_size or self._width,
+                        actions=self.actions,
                     )
                     agent.state.dir = self._rand_int(0, 4)
                     agent.pos = pos
@@ -142,6 +195,145 @@ class MultiGridEnv(MultiWorldEnv):
     def world(self) -> Grid:
         return self._world
 
+    def _handle_actions(
+        self, actions: Dict[AgentID, Action | int]
+    ) -> Dict[AgentID, SupportsFloat]:
+        if not self._batched_actions or not BATCHED_ACTIONS.issuperset(
+            actions.values()
+        ):
+            return super()._handle_actions(actions)
+        return self._handle_actions_batched(actions)
+
+    def _handle_actions_batched(
+        self, actions: Dict[AgentID, Action | int]
+    ) -> Dict[AgentID, SupportsFloat]:
+        """
+        Execute left, right and forward actions for all agents at once.
+
+        Rotations and forward targets are computed as arrays. Moves are then
+        resolved in the same random permutation order as the sequential path,
+        so an agent can step into a cell vacated earlier in the same step, and
+        the first agent in the order wins a contested cell.
+        """
+        rewards: Dict[AgentID, SupportsFloat] = {
+            agent_index: 0 for agent_index in range(self._num_agents)
+        }
+
+        order = self._rand_perm(list(range(self._num_agents)))
+
+        state = self._agent_states._view
+        terminated = self._agent_states._terminated
+
+        agent_ids = np.array([i for i in order if i in actions], dtype=np.int_)
+        acts = np.array([actions[i] for i in agent_ids], dtype=np.int_)
+        active = ~terminated[agent_ids]
+        agent_ids, acts = agent_ids[active], acts[active]
+
+        # Rank (position in the execution order) at which each agent was
+        # terminated during this step; later actions of that agent are ignored
+        stop_rank = np.full(self._num_agents, len(agent_ids))
+
+        # Forward targets
+        forward = np.flatnonzero(acts == Action.forward)
+        movers = agent_ids[forward]
+        targets = (
+            state[movers, AgentState.POS] + DIR_VECTORS[state[movers, AgentState.DIR]]
+        )
+        in_bounds = (
+            (targets[:, 0] >= 0)
+            & (targets[:, 0] < self._world.width)
+            & (targets[:, 1] >= 0)
+            & (targets[:, 1] < self._world.height)
+        )
+        forward, movers, targets = (
+            forward[in_bounds],
+            movers[in_bounds],
+            targets[in_bounds],
+        )
+        has_object = ~np.isin(
+            self._world.state[targets[:, 0], targets[:, 1], WorldObject.TYPE],
+            EMPTY_TYPES,
+        )
+
+        # The grid does not change during these actions, so the targets can be
+        # checked for blocking objects and goals up front
+        blocked = np.zeros(len(movers), dtype=np.bool_)
+        goal = np.zeros(len(movers), dtype=np.bool_)
+        for n in np.flatnonzero(has_object).tolist():
+            fwd_obj = self._world._get(*targets[n].tolist())
+            blocked[n] = fwd_obj is not None and not fwd_obj.can_overlap()
+            goal[n] = fwd_obj is not None and fwd_obj.type == WorldObjectType.goal
+
+        for n in self._resolve_moves(movers, targets, blocked, goal):
+            terminated_before = terminated.copy()
+            self.on_success(self._agents[movers[n]], rewards, {})
+            stop_rank[terminated & ~terminated_before] = forward[n]
+
+        # Rotations
+        turning = np.flatnonzero(acts != Action.forward)
+        turning = turning[turning < stop_rank[agent_ids[turning]]]
+        turners = agent_ids[turning]
+        rotation = np.where(acts[turning] == Action.left, -1, 1)
+        state[turners, AgentState.DIR] = (state[turners, AgentState.DIR] + rotation) % 4
+
+        return rewards
+
+    def _resolve_moves(
+        self,
+        movers: NDArray[np.int_],
+        targets: NDArray[np.int_],
+        blocked: NDArray[np.bool_],
+        goal: NDArray[np.bool_],
+    ) -> Iterator[int]:
+        """
+        Move agents forward in execution order, skipping moves into blocked or
+        occupied cells. Yields the index of every mover that steps onto a goal,
+        so the caller can run the success callback before the remaining moves.
+        """
+        state = self._agent_states._view
+        terminated = self._agent_states._terminated
+
+        if self._kernel_backend == KernelBackend.numba:
+            agent_pos = state[:, AgentState.POS]
+            occupancy = np.zeros((self._world.width, self._world.height), dtype=np.int_)
+            in_bounds = (
+                (agent_pos[:, 0] >= 0)
+                & (agent_pos[:, 0] < self._world.width)
+                & (agent_pos[:, 1] >= 0)
+                & (agent_pos[:, 1] < self._world.height)
+            )
+            np.add.at(occupancy, tuple(agent_pos[in_bounds].T), 1)
+            n = resolve_moves_kernel(
+                agent_pos, occupancy, movers, targets, blocked, goal, terminated, 0
+            )
+            while n < len(movers):
+                yield n
+                n = resolve_moves_kernel(
+                    agent_pos,
+                    occupancy,
+                    movers,
+                    targets,
+                    blocked,
+                    goal,
+                    terminated,
+                    n + 1,
+                )
+            return
+
+        occupancy = Counter(map(tuple, state[:, AgentState.POS].tolist()))
+        for n, (agent_index, (x, y)) in enumerate(
+            zip(movers.tolist(), targets.tolist())
+        ):
+            if terminated[agent_index] or blocked[n] or occupancy[x, y] > 0:
+                continue
+
+            occupancy[tuple(state[agent_index, AgentState.POS].tolist())] -= 1
+            occupancy[x, y] += 1
+            state[agent_index, AgentState.POS] = (x, y)
+
+            if goal[n]:
+                yield n
+
     def _execute_action(
         self, agent: Agent, action: Action | int, rewards: Dict[AgentID, SupportsFloat]
     ) -> None:
@@ -167,7 +359,7 @@ class MultiGridEnv(MultiWorldEnv):
             if fwd_obj is not None and not fwd_obj.can_overlap():
                 return
 
-            agent_present = np.array(self._agent_states.pos == fwd_pos).any()
+            agent_present = self._agent_states.at(fwd_pos).any()
             if agent_present:
                 return
 
@@ -209,7 +401,7 @@ class MultiGridEnv(MultiWorldEnv):
             if not self._world.in_bounds(fwd_pos):
                 return
 
-            agent_present = np.array(self._agent_states.pos == fwd_pos).any()
+            agent_present = self._agent_states.at(fwd_pos).any()
             if agent_present:
                 return
 
@@ -241,19 +433,25 @@ class MultiGridEnv(MultiWorldEnv):
 
     def _gen_obs(self) -> Dict[AgentID, ObsType]:
         directions = self._agent_states.dir
-        image = gen_obs_grid_encoding(
-            self._world.state,
-            self._agent_states,
-            self._agent_view_size,
-            self._agent_see_through_walls,
-            self._preprocessing,
-        )
+        if self._observation_cache is not None:
+            image = self._observation_cache.update(
+                self._world.state, self._agent_states
+            )
+        else:
+            image = gen_obs_grid_encoding(
+                self._world.state,
+                self._agent_states,
+                self._agent_view_size,
+                self._agent_see_through_walls,
+                self._preprocessing,
+                self._kernel_backend,
+            )
+        ohe_dirs = ohe_directions(directions)
         observations = {}
         for i in range(self._num_agents):
-            ohe_dir = ohe_direction(directions[i])
             observations[i] = {
                 "observation": image[i],
-                "direction": ohe_dir,
+                "direction": ohe_dirs[i],
             }
 
         return observations
@@ -301,6 +499,8 @@ class MultiGridEnv(MultiWorldEnv):
         return img
 
     def _reset_agents(self):
+        if self._observation_cache is not None:
+            self._observation_cache.reset()
         self._agent_states = AgentState(self._num_agents)
         for agent in self._agents:
             agent.reset()
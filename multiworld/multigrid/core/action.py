@@ -12,12 +12,17 @@ class Action(enum.IntEnum):
     left = 0  #: Turn left
     right = enum.auto()  #: Turn right
     forward = enum.auto()  #: Move forward
-    # pickup = enum.auto()  #: Pick up an object
-    # drop = enum.auto()  #: Drop an object
+    pickup = enum.auto()  #: Pick up an object
+    drop = enum.auto()  #: Drop an object
     # toggle = enum.auto()  #: Toggle / activate an object
     # done = enum.auto()  #: Done completing task
 
 
+# Actions of the agents in environments without objects to carry, the first ones
+# of Action
+NAVIGATION_ACTIONS = (Action.left, Action.right, Action.forward)
+
+
 def int_to_action(actions: Dict[AgentID, Action | int]) -> Dict[AgentID, Action]:
     """
     Convert integer action to Action.
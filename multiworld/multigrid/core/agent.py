@@ -4,7 +4,7 @@ from numpy.typing import NDArray as ndarray
 
 from multiworld.core.constants import Color
 from multiworld.core.position import Position
-from multiworld.multigrid.core.action import Action
+from multiworld.multigrid.core.action import NAVIGATION_ACTIONS
 from multiworld.multigrid.core.constants import Direction, WorldObjectType
 from multiworld.multigrid.core.world_object import WorldObject
 from multiworld.multigrid.utils.misc import front_pos
@@ -12,7 +12,10 @@ from multiworld.multigrid.utils.ohe import (
     OHE_GRID_OBJECT_DIM,
     OHE_GRID_OBJECT_DIM_MINIMAL,
 )
-from multiworld.multigrid.utils.preprocessing import PreprocessingEnum
+from multiworld.multigrid.utils.preprocessing import (
+    OBSERVATION_DTYPE,
+    PreprocessingEnum,
+)
 from multiworld.utils.misc import PropertyAlias
 from multiworld.utils.rendering import (
     fill_coords,
@@ -28,7 +31,14 @@ class Agent:
         view_size: int = 7,
         see_through_walls: bool = False,
         preprocessing: PreprocessingEnum = PreprocessingEnum.none,
+        actions: int = len(NAVIGATION_ACTIONS),
     ):
+        """
+        Parameters
+        ----------
+        actions : int
+            Size of the action space, the first actions of Action
+        """
         self.index = index
         # assert view_size % 2 == 1, "View size must be odd for agent observation."
         assert view_size > 0, "View size must be greater than 1 for agent observation."
@@ -48,12 +58,12 @@ class Agent:
                     low=0,
                     high=255,
                     shape=(view_size, view_size, dim),
-                    dtype=np.int_,
+                    dtype=OBSERVATION_DTYPE,
                 ),
                 "direction": spaces.Discrete(len(Direction)),
             }
         )
-        self.action_space = spaces.Discrete(len(Action))
+        self.action_space = spaces.Discrete(actions)
 
     def reset(self):
         self.state.pos = (-1, -1)
@@ -74,9 +84,8 @@ class Agent:
     @property
     def front_pos(self) -> Position:
         agent_dir = self.state._view[AgentState.DIR]
-        agent_pos = self.state._view[AgentState.POS]
-        fwd_pos = front_pos(*agent_pos, agent_dir)
-        return Position(*fwd_pos)
+        agent_x, agent_y = self.state._view[AgentState.POS].tolist()
+        return front_pos(agent_x, agent_y, int(agent_dir))
 
     def render(self, img: ndarray[np.uint8]):
         """
@@ -116,9 +125,18 @@ class AgentState(np.ndarray):
         obj._view = obj.view(
             np.ndarray
         )  # View of the underlying array (faster indexing)
+        obj._agent_views = {}  # Per-agent views, created once on first access
         return obj
 
     def __getitem__(self, idx):
+        agent_views = getattr(self, "_agent_views", None)
+        if agent_views is not None and type(idx) is int:
+            if idx not in agent_views:
+                agent_views[idx] = self._getitem(idx)
+            return agent_views[idx]
+        return self._getitem(idx)
+
+    def _getitem(self, idx):
         out = super().__getitem__(idx)
 
         if isinstance(out, AgentState):
@@ -161,7 +179,7 @@ class AgentState(np.ndarray):
         """
         out = self._view[..., AgentState.POS]
         if out.ndim == 1:
-            return Position(*out)
+            return Position(*out.tolist())
         pos = Position.from_list(out)
         return (pos) if pos.ndim == 1 else pos
 
@@ -171,8 +189,15 @@ class AgentState(np.ndarray):
         Set the agent's (x, y) position.
         """
         if isinstance(value, Position):
-            value = list(value())
-        self[..., AgentState.POS] = value
+            value = (value.x, value.y)
+        self._view[..., AgentState.POS] = value
+
+    def at(self, pos: Position) -> ndarray[np.bool_]:
+        """
+        Return a boolean mask of the agents located at the given position.
+        """
+        agent_pos = self._view[..., AgentState.POS]
+        return (agent_pos[..., 0] == pos.x) & (agent_pos[..., 1] == pos.y)
 
     @property
     def terminated(self) -> bool | ndarray[np.bool]:
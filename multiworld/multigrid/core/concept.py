@@ -1,154 +1,64 @@
-from typing import Callable, Dict, List
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Literal
 
 import numpy as np
 from numpy.typing import NDArray
 
 from multiworld.multigrid.core.constants import WorldObjectType
 from multiworld.multigrid.core.world_object import WorldObject
+from multiworld.multigrid.utils.ohe import N_TYPES
+from multiworld.multigrid.utils.preprocessing import PreprocessingEnum
 
+# Part of the view a concept looks at, relative to the agent in the bottom middle
+Region = Literal["view", "left", "right", "front"]
 
-def _random_observation_concept(_: NDArray[np.int_]) -> bool:
-    rand_float = np.random.uniform()
-    if rand_float < 0.1:
-        return True
-    return False
 
+@dataclass(frozen=True)
+class RandomConcept:
+    """
+    Concept present in a random fraction of the observations.
+    """
+
+    probability: float
+
+    def detect(self, object_types: NDArray[np.int_]) -> NDArray[np.bool_]:
+        return np.random.uniform(size=len(object_types)) < self.probability
 
-def _random_negative_observation_concept(_: NDArray[np.int_]) -> bool:
-    rand_float = np.random.uniform()
-    if rand_float < 0.1:
-        return True
-    return False
+    def __call__(self, view: Dict[str, NDArray[np.int_]]) -> bool:
+        return bool(self.detect(_view_object_types(view))[0])
+
+
+@dataclass(frozen=True)
+class ObjectConcept:
+    """
+    Concept present when an object of a type is in a region of the view.
+    """
 
+    object_type: WorldObjectType
+    region: Region
 
-@staticmethod
-def _goal_in_view_concept(view: Dict[str, NDArray[np.int_]]) -> bool:
-    observation = view["observation"]
-    dir = view["direction"]
-
-    for row in observation:
-        for cell in row:
-            type_idx = cell[WorldObject.TYPE]
-            if type_idx == WorldObjectType.goal.to_index():
-                return True
-    return False
-
-
-@staticmethod
-def _goal_to_right_concept(view: Dict[str, NDArray[np.int_]]) -> bool:
-    observation = view["observation"]
-    dir = view["direction"]
+    def detect(self, object_types: NDArray[np.int_]) -> NDArray[np.bool_]:
+        mask = _region_masks(object_types.shape[1:], (self.region,))[0]
+        return ((object_types == self.object_type.to_index()) & mask).any(axis=(1, 2))
 
-    for row in observation:
-        for cell in row[row.shape[0] // 2 + 1 :]:
-            type_idx = cell[WorldObject.TYPE]
-            if type_idx == WorldObjectType.goal.to_index():
-                return True
-    return False
-
-
-@staticmethod
-def _goal_to_left_concept(view: Dict[str, NDArray[np.int_]]) -> bool:
-    observation = view["observation"]
-    dir = view["direction"]
-
-    for row in observation:
-        for cell in row[0 : row.shape[0] // 2]:
-            type_idx = cell[WorldObject.TYPE]
-            if type_idx == WorldObjectType.goal.to_index():
-                return True
-    return False
-
-
-@staticmethod
-def _goal_in_front_concept(view: Dict[str, NDArray[np.int_]]) -> bool:
-    observation = view["observation"]
-    dir = view["direction"]
-
-    for row in observation[1:]:
-        cell = row[row.shape[0] // 2]
-        type_idx = cell[WorldObject.TYPE]
-        if type_idx == WorldObjectType.goal.to_index():
-            return True
-    return False
-
-
-@staticmethod
-def _agent_in_view_concept(view: Dict[str, NDArray[np.int_]]) -> bool:
-    observation = view["observation"]
-    dir = view["direction"]
-
-    for row in observation:
-        for cell in row:
-            type_idx = cell[WorldObject.TYPE]
-            if type_idx == WorldObjectType.agent.to_index():
-                return True
-    return False
-
-
-@staticmethod
-def _wall_in_view_concept(view: Dict[str, NDArray[np.int_]]) -> bool:
-    observation = view["observation"]
-    dir = view["direction"]
-
-    for row in observation:
-        for cell in row:
-            type_idx = cell[WorldObject.TYPE]
-            if type_idx == WorldObjectType.wall.to_index():
-                return True
-    return False
-
-
-@staticmethod
-def _agent_to_right_concept(view: Dict[str, NDArray[np.int_]]) -> bool:
-    observation = view["observation"]
-    dir = view["direction"]
-
-    for row in observation:
-        for cell in row[row.shape[0] // 2 + 1 :]:
-            type_idx = cell[WorldObject.TYPE]
-            if type_idx == WorldObjectType.agent.to_index():
-                return True
-    return False
-
-
-@staticmethod
-def _agent_to_left_concept(view: Dict[str, NDArray[np.int_]]) -> bool:
-    observation = view["observation"]
-    dir = view["direction"]
-
-    for row in observation:
-        for cell in row[0 : row.shape[0] // 2]:
-            type_idx = cell[WorldObject.TYPE]
-            if type_idx == WorldObjectType.agent.to_index():
-                return True
-    return False
-
-
-@staticmethod
-def _agent_in_front_concept(view: Dict[str, NDArray[np.int_]]) -> bool:
-    observation = view["observation"]
-    dir = view["direction"]
-
-    for row in observation[1:]:
-        cell = row[row.shape[0] // 2]
-        type_idx = cell[WorldObject.TYPE]
-        if type_idx == WorldObjectType.agent.to_index():
-            return True
-    return False
-
-
-concept_checks: Dict[str, Callable] = {
-    "random": _random_observation_concept,
-    "goal_in_view": _goal_in_view_concept,
-    "goal_to_right": _goal_to_right_concept,
-    "goal_to_left": _goal_to_left_concept,
-    "goal_in_front": _goal_in_front_concept,
-    "agent_in_view": _agent_in_view_concept,
-    "wall_in_view": _wall_in_view_concept,
-    "agent_to_right": _agent_to_right_concept,
-    "agent_to_left": _agent_to_left_concept,
-    "agent_in_front": _agent_in_front_concept,
+    def __call__(self, view: Dict[str, NDArray[np.int_]]) -> bool:
+        return bool(self.detect(_view_object_types(view))[0])
+
+
+Concept = RandomConcept | ObjectConcept
+
+concept_checks: Dict[str, Concept] = {
+    "random": RandomConcept(0.1),
+    "goal_in_view": ObjectConcept(WorldObjectType.goal, "view"),
+    "goal_to_right": ObjectConcept(WorldObjectType.goal, "right"),
+    "goal_to_left": ObjectConcept(WorldObjectType.goal, "left"),
+    "goal_in_front": ObjectConcept(WorldObjectType.goal, "front"),
+    "agent_in_view": ObjectConcept(WorldObjectType.agent, "view"),
+    "wall_in_view": ObjectConcept(WorldObjectType.wall, "view"),
+    "agent_to_right": ObjectConcept(WorldObjectType.agent, "right"),
+    "agent_to_left": ObjectConcept(WorldObjectType.agent, "left"),
+    "agent_in_front": ObjectConcept(WorldObjectType.agent, "front"),
 }
 
 
@@ -160,7 +70,125 @@ def get_concept_checks(concepts: list[str] | None):
     )
 
 
-def get_concept_values(states: List[Dict[str, Dict[str, NDArray]]]) -> List[List[int]]:
+class ConceptDetector:
+    """
+    Detect concepts in the observations of many agents at once.
+
+    The object types of a batch of views are decoded once, and all object concepts
+    are evaluated together as one mask reduction over the (batch x height x width)
+    grid, instead of a Python loop over the cells per concept per view.
+    """
+
+    def __init__(
+        self,
+        concepts: list[str] | None = None,
+        preprocessing: PreprocessingEnum = PreprocessingEnum.none,
+    ):
+        """
+        Parameters
+        ----------
+        concepts : list[str] | None
+            Concepts to detect, all concepts if None
+        preprocessing : PreprocessingEnum
+            Preprocessing of the observations, to decode the object types
+        """
+        self._concepts = get_concept_checks(concepts)
+        self._preprocessing = preprocessing
+
+        self._object_columns = [
+            i
+            for i, concept in enumerate(self._concepts.values())
+            if isinstance(concept, ObjectConcept)
+        ]
+        object_concepts = [
+            concept
+            for concept in self._concepts.values()
+            if isinstance(concept, ObjectConcept)
+        ]
+        self._type_indices = np.array(
+            [concept.object_type.to_index() for concept in object_concepts],
+            dtype=np.int64,
+        )
+        self._regions = tuple(concept.region for concept in object_concepts)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._concepts.keys())
+
+    def detect(self, observations: NDArray) -> NDArray[np.bool_]:
+        """
+        Parameters
+        ----------
+        observations : NDArray
+            Stacked views of shape (batch, height, width, channels)
+
+        Returns
+        -------
+        NDArray[np.bool_]
+            Bitmap of shape (batch, concepts), in the order of names
+        """
+        object_types = decode_object_types(observations, self._preprocessing)
+        bitmap = np.zeros((len(object_types), len(self._concepts)), dtype=np.bool_)
+
+        if len(self._object_columns) != 0:
+            masks = _region_masks(object_types.shape[1:], self._regions)
+            hits = object_types[:, None] == self._type_indices[None, :, None, None]
+            hits &= masks[None]
+            bitmap[:, self._object_columns] = hits.any(axis=(2, 3))
+
+        for i, concept in enumerate(self._concepts.values()):
+            if isinstance(concept, RandomConcept):
+                bitmap[:, i] = concept.detect(object_types)
+        return bitmap
+
+    def __call__(self, views: List[Dict[str, NDArray]]) -> NDArray[np.bool_]:
+        if len(views) == 0:
+            return np.zeros((0, len(self._concepts)), dtype=np.bool_)
+        return self.detect(np.stack([view["observation"] for view in views]))
+
+
+def decode_object_types(
+    observations: NDArray, preprocessing: PreprocessingEnum
+) -> NDArray[np.int_]:
+    """
+    Object type of every cell of stacked views of shape (batch, height, width, channels).
+    """
+    if preprocessing == PreprocessingEnum.none:
+        return observations[..., WorldObject.TYPE].astype(np.int64)
+    return observations[..., :N_TYPES].argmax(axis=-1)
+
+
+@lru_cache(maxsize=None)
+def _region_masks(shape: tuple[int, int], regions: tuple[Region, ...]) -> NDArray:
+    height, width = shape
+    masks = np.zeros((len(regions), height, width), dtype=np.bool_)
+    middle = width // 2
+    for i, region in enumerate(regions):
+        if region == "view":
+            masks[i] = True
+        elif region == "right":
+            masks[i, :, middle + 1 :] = True
+        elif region == "left":
+            masks[i, :, :middle] = True
+        elif region == "front":
+            masks[i, 1:, middle] = True
+        else:
+            raise ValueError(f"Unknown concept region {region}")
+    masks.setflags(write=False)
+    return masks
+
+
+def _view_object_types(view: Dict[str, NDArray[np.int_]]) -> NDArray[np.int_]:
+    """
+    Object types of a single decoded view, as a batch of one.
+    """
+    return np.asarray(view["observation"])[None, ..., WorldObject.TYPE].astype(np.int64)
+
+
+def get_concept_values(
+    states: List[Dict[str, Dict[str, NDArray]]],
+    preprocessing: PreprocessingEnum = PreprocessingEnum.none,
+) -> List[List[int]]:
     """
     This function processes the next state observations and checks for the presence of each concept.
     It returns a bit map (list of 0 or 1) for each concept, indicating whether it's present in the given state.
@@ -168,42 +196,20 @@ def get_concept_values(states: List[Dict[str, Dict[str, NDArray]]]) -> List[List
     Args:
         state(List[Dict[str, Dict[str, NDArray]]]): List of state observations for multiple agents.
         batch size * num agents
+        preprocessing(PreprocessingEnum): Preprocessing of the observations.
 
     Returns:
         List[NDArray]: List of concept bit maps, each representing the presence (1) or absence (0) of concepts.
     """
-    # List to store the bit maps for each concept in the batch
-    concept_bitmaps = []
-
-    # Iterate over the states for each agent
-    for state in states:
-        concept_bitmaps.extend(_get_agent_concept_values(state))
-        # Initialize a list to store concept values (0 or 1) for the current state
-    # Return the list of concept bit maps
-
-    return concept_bitmaps
-
-
-def _get_agent_concept_values(state: Dict[str, Dict[str, NDArray]]) -> List:
-    concept_values = []
-
-    for agent_state in state.values():
-        # For each concept, check its presence (using concept checks, as defined in `get_concept_checks`)
-        concept_values.append(_get_concept_check_bitmap(agent_state))
-
-    return concept_values
-
-
-def _get_concept_check_bitmap(state: Dict[str, NDArray]) -> List[NDArray]:
-    if state is None:
-        return [0] * len(concept_checks)
-    concept_bitmap = []
-    for concept_check_name, concept_check in concept_checks.items():
-        # Apply the concept check to the state (assuming it returns True/False)
-        concept_present = concept_check(
-            state
-        )  # Will return True if concept is present, else False
-        concept_bitmap.append(1 if concept_present else 0)
-
-    # Convert the list of 0s and 1s to a numpy array for the current state concept_bit_maps.append(np.array(concept_values))
-    return concept_bitmap
+    agent_states = [agent_state for state in states for agent_state in state.values()]
+    present = [agent_state for agent_state in agent_states if agent_state is not None]
+
+    detector = ConceptDetector(preprocessing=preprocessing)
+    bitmap = detector(present).astype(int).tolist()
+
+    # Missing states have no concepts
+    present_bitmaps = iter(bitmap)
+    return [
+        next(present_bitmaps) if agent_state is not None else [0] * len(concept_checks)
+        for agent_state in agent_states
+    ]
@@ -29,8 +29,8 @@ class Grid:
         self._world_objects: dict[
             tuple[int, int], WorldObject
         ] = {}  # index by position
-        self.state: NDArray[np.int_] = np.zeros(
-            (width, height, WorldObject.dim), dtype=int
+        self.state: NDArray[np.uint8] = np.zeros(
+            (width, height, WorldObject.dim), dtype=np.uint8
         )
         self.state[...] = WorldObject.empty()
 
@@ -126,13 +126,12 @@ class Grid:
         # Render the grid
         for j in range(0, self.height):
             for i in range(0, self.width):
-                pos = Position(i, j)
                 assert highlight_mask is not None
-                cell = self.get(pos)
+                cell = self._get(i, j)
                 tile_img = Grid.render_tile(
                     cell,
-                    agent=location_to_agent.get(pos()),
-                    highlight=highlight_mask[*pos()],
+                    agent=location_to_agent.get((i, j)),
+                    highlight=highlight_mask[i, j],
                     tile_size=tile_size,
                 )
                 ymin = j * tile_size
@@ -153,10 +152,13 @@ class Grid:
     def get(self, pos: Position) -> WorldObject | None:
         if not self.in_bounds(pos):
             return None
-        if (pos.x, pos.y) not in self._world_objects:
-            obj = WorldObject.from_array(self.state[pos.x, pos.y])
-            self._world_objects[pos.x, pos.y] = obj
-        return self._world_objects[pos.x, pos.y]
+        return self._get(pos.x, pos.y)
+
+    def _get(self, x: int, y: int) -> WorldObject | None:
+        if (x, y) not in self._world_objects:
+            obj = WorldObject.from_array(self.state[x, y])
+            self._world_objects[x, y] = obj
+        return self._world_objects[x, y]
 
     def set(self, pos: Position, obj: WorldObject | None):
         if not self.in_bounds(pos):
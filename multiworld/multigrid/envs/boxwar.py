@@ -4,18 +4,26 @@ from typing import Any, List, SupportsFloat
 import numpy as np
 from numpy.typing import NDArray
 
-from multigrid.base import MultiGridEnv
-from multigrid.core.action import Action
-from multigrid.core.agent import Agent
-from multigrid.core.area import Area
-from multigrid.core.constants import Color
-from multigrid.core.grid import Grid
-from multigrid.core.world_object import Box, Container, Goal, Wall, WorldObject
-from multigrid.utils.position import Position
-from multigrid.utils.typing import AgentID, ObsType
+from multiworld.core.constants import Color
+from multiworld.core.position import Position
+from multiworld.multigrid.base import MultiGridEnv
+from multiworld.multigrid.core.action import Action
+from multiworld.multigrid.core.agent import Agent
+from multiworld.multigrid.core.area import Area
+from multiworld.multigrid.core.grid import Grid
+from multiworld.multigrid.core.world_object import (
+    Box,
+    Container,
+    Goal,
+    Wall,
+    WorldObject,
+)
+from multiworld.utils.typing import AgentID, ObsType
 
 
 class BoxWarEnv(MultiGridEnv):
+    actions = len(Action)
+
     def __init__(self, boxes: int, *args, **kwargs):
         self._num_boxes = boxes
         self._num_teams = 2
@@ -23,23 +31,27 @@ class BoxWarEnv(MultiGridEnv):
 
         self._team_score = {}
 
-    def _gen_grid(self, width: int, height: int):
-        self.grid = Grid(width, height)
+    @property
+    def env_name(self) -> str:
+        return "boxwar"
+
+    def _gen_world(self, width: int, height: int):
+        self._world = Grid(width, height)
 
         container_obj = lambda: Container(color=Color.blue)
         area_size = (self._width // 2 - 1, self._height)
         container_area = Area(area_size, container_obj)
-        container_area.place(self.grid, (0, 0))
+        container_area.place(self._world, (0, 0))
 
         container_obj = lambda: Container(color=Color.red)
         container_area = Area(area_size, container_obj)
-        container_area.place(self.grid, (self._width - area_size[0], 0))
+        container_area.place(self._world, (self._width - area_size[0], 0))
 
-        placeable_positions = self.grid.get_empty_positions(self._num_boxes)
+        placeable_positions = self._world.get_empty_positions(self._num_boxes)
         for pos in placeable_positions:
-            self.grid.set(pos, Box())
+            self._world.set(pos, Box())
 
-        placeable_positions = self.grid.get_empty_positions(len(self.agents))
+        placeable_positions = self._world.get_empty_positions(len(self.agents))
 
         team_split = len(self.agents) // self._num_teams
         team_colors = ["blue", "red"]
@@ -96,7 +108,7 @@ class BoxWarEnv(MultiGridEnv):
             return
 
         fwd_pos = agent.front_pos
-        fwd_obj = self.grid.get(fwd_pos)
+        fwd_obj = self._world.get(fwd_pos)
 
         if fwd_obj is None:
             return
@@ -107,7 +119,7 @@ class BoxWarEnv(MultiGridEnv):
         if fwd_obj.contains is None:
             return
 
-        agent_present = np.array(self._agent_states.pos == fwd_pos).any()
+        agent_present = self._agent_states.at(fwd_pos).any()
         if agent_present:
             return
 
@@ -133,7 +145,7 @@ class BoxWarEnv(MultiGridEnv):
             return
 
         fwd_pos = agent.front_pos
-        fwd_obj = self.grid.get(fwd_pos)
+        fwd_obj = self._world.get(fwd_pos)
 
         if fwd_obj is None:
             return
@@ -144,7 +156,7 @@ class BoxWarEnv(MultiGridEnv):
         if fwd_obj.contains is not None:
             return
 
-        agent_present = np.array(self._agent_states.pos == fwd_pos).any()
+        agent_present = self._agent_states.at(fwd_pos).any()
         if agent_present:
             return
 
@@ -3,16 +3,18 @@ from typing import Any, SupportsFloat, Dict
 
 import numpy as np
 
-from multigrid.base import MultiGridEnv
-from multigrid.core.action import Action
-from multigrid.core.area import Area
-from multigrid.core.grid import Grid
-from multigrid.core.world_object import Box, Container
-from multigrid.utils.position import Position
-from multigrid.utils.typing import AgentID, ObsType
+from multiworld.core.position import Position
+from multiworld.multigrid.base import MultiGridEnv
+from multiworld.multigrid.core.action import Action
+from multiworld.multigrid.core.area import Area
+from multiworld.multigrid.core.grid import Grid
+from multiworld.multigrid.core.world_object import Box, Container
+from multiworld.utils.typing import AgentID, ObsType
 
 
 class CleanUpEnv(MultiGridEnv):
+    actions = len(Action)
+
     def __init__(self, boxes: int, *args, **kwargs):
         self._num_boxes = boxes
         super().__init__(*args, **kwargs)
@@ -20,8 +22,12 @@ class CleanUpEnv(MultiGridEnv):
         self._success_move_box = 0
         self._area = 0
 
-    def _gen_grid(self, width: int, height: int):
-        self.grid = Grid(width, height)
+    @property
+    def env_name(self) -> str:
+        return "cleanup"
+
+    def _gen_world(self, width: int, height: int):
+        self._world = Grid(width, height)
 
         container_obj = lambda: Container()
         area_sizes = [(1, 1), (2, 2)]
@@ -31,19 +37,19 @@ class CleanUpEnv(MultiGridEnv):
         self._area = 0
         for _ in range(num_areas):
             area_size = self._rand_elem(area_sizes)
-            placeable_areas = self.grid.get_empty_areas(area_size)
+            placeable_areas = self._world.get_empty_areas(area_size)
             if len(placeable_areas) == 0:
                 continue
             pos: Position = self._rand_elem(placeable_areas)
             container_area = Area(area_size, container_obj)
-            container_area.place(self.grid, pos())
+            container_area.place(self._world, pos())
             self._area += area_size[0] * area_size[1]
 
-        placeable_positions = self.grid.get_empty_positions(self._num_boxes)
+        placeable_positions = self._world.get_empty_positions(self._num_boxes)
         for pos in placeable_positions:
-            self.grid.set(pos, Box())
+            self._world.set(pos, Box())
 
-        placeable_positions = self.grid.get_empty_positions(len(self.agents))
+        placeable_positions = self._world.get_empty_positions(len(self.agents))
         for agent, pos in zip(self.agents, placeable_positions):
             agent.state.pos = pos
 
@@ -78,7 +84,7 @@ class CleanUpEnv(MultiGridEnv):
                     continue
 
                 fwd_pos = agent.front_pos
-                fwd_obj = self.grid.get(fwd_pos)
+                fwd_obj = self._world.get(fwd_pos)
 
                 if fwd_obj is None:
                     continue
@@ -89,7 +95,7 @@ class CleanUpEnv(MultiGridEnv):
                 if fwd_obj.contains is not None:
                     continue
 
-                agent_present = np.array(self._agent_states.pos == fwd_pos).any()
+                agent_present = self._agent_states.at(fwd_pos).any()
                 if agent_present:
                     continue
 
@@ -111,7 +117,7 @@ class CleanUpEnv(MultiGridEnv):
                     continue
 
                 fwd_pos = agent.front_pos
-                fwd_obj = self.grid.get(fwd_pos)
+                fwd_obj = self._world.get(fwd_pos)
 
                 if fwd_obj is None:
                     continue
@@ -122,7 +128,7 @@ class CleanUpEnv(MultiGridEnv):
                 if fwd_obj.contains is None:
                     continue
 
-                agent_present = np.array(self._agent_states.pos == fwd_pos)
+                agent_present = self._agent_states.at(fwd_pos).any()
                 if agent_present:
                     continue
 
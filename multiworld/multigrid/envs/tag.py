@@ -14,10 +14,14 @@ class TagEnv(MultiGridEnv):
         self._runner_color = "green"
         self._tagger_color = "red"
 
+    @property
+    def env_name(self) -> str:
+        return "tag"
+
     def _gen_world(self, width: int, height: int):
-        self.grid = Grid(width, height)
+        self._world = Grid(width, height)
 
-        placeable_positions = self.grid.get_empty_positions(len(self.agents))
+        placeable_positions = self._world.get_empty_positions(len(self.agents))
         for agent, pos in zip(self.agents, placeable_positions):
             agent.state.pos = pos
             agent.color = self._runner_color
@@ -53,7 +57,7 @@ class TagEnv(MultiGridEnv):
 
             fwd_pos = agent.front_pos
 
-            agent_present = np.where(np.array(self._agent_states.pos == fwd_pos))[0]
+            agent_present = np.where(self._agent_states.at(fwd_pos))[0]
             assert len(agent_present) <= 1
 
             if len(agent_present) == 0:
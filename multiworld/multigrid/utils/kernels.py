@@ -0,0 +1,162 @@
+"""
+Compiled (Numba) versions of the innermost multigrid kernels.
+
+Every kernel mirrors a NumPy/Python implementation and produces identical
+results. They are only called when the environment is created with
+``kernel_backend=KernelBackend.numba``.
+"""
+
+import numpy as np
+from numpy.typing import NDArray as ndarray
+
+from multiworld.utils.jit import njit
+
+
+@njit
+def agent_views_kernel(
+    grid_encoding: ndarray[np.int_],
+    wall_encoding: ndarray[np.int_],
+    top_x: ndarray[np.int_],
+    top_y: ndarray[np.int_],
+    num_left_rotations: ndarray[np.int_],
+    view_size: int,
+) -> ndarray[np.int_]:
+    """
+    Cut each agent's rotated view out of the grid encoding.
+    See :func:`multiworld.multigrid.utils.observation.gen_agent_views`.
+    """
+    num_agents = top_x.shape[0]
+    width, height, dim = grid_encoding.shape
+    obs_grid = np.empty(
+        (num_agents, view_size, view_size, dim), dtype=grid_encoding.dtype
+    )
+    for agent in range(num_agents):
+        rotation = num_left_rotations[agent]
+        for j in range(view_size):
+            for i in range(view_size):
+                x, y = top_x[agent] + i, top_y[agent] + j
+                if rotation == 0:
+                    i_rot, j_rot = i, j
+                elif rotation == 1:
+                    i_rot, j_rot = j, view_size - 1 - i
+                elif rotation == 2:
+                    i_rot, j_rot = view_size - 1 - i, view_size - 1 - j
+                else:
+                    i_rot, j_rot = view_size - 1 - j, i
+
+                if 0 <= x < width and 0 <= y < height:
+                    for d in range(dim):
+                        obs_grid[agent, j_rot, i_rot, d] = grid_encoding[x, y, d]
+                else:
+                    for d in range(dim):
+                        obs_grid[agent, j_rot, i_rot, d] = wall_encoding[d]
+    return obs_grid
+
+
+@njit
+def vis_mask_kernel(
+    obs_grid: ndarray[np.int_], type_idx: int, wall: int
+) -> ndarray[np.bool_]:
+    """
+    Propagate visibility from the agent outwards, stopping at walls.
+    See :func:`multiworld.multigrid.utils.observation.get_vis_mask`.
+    """
+    num_agents, height, width = obs_grid.shape[:3]
+    vis_mask = np.zeros((num_agents, width, height), dtype=np.bool_)
+
+    for agent in range(num_agents):
+        vis_mask[agent, height - 1, width // 2] = True  # agent relative position
+        for j in range(height - 1, -1, -1):
+            # Row above; wraps around at the top like the NumPy indexing does
+            above = (j - 1) % height
+            # Right propegate
+            for i in range(width // 2, width):
+                if not vis_mask[agent, j, i] or obs_grid[agent, j, i, type_idx] == wall:
+                    continue
+                vis_mask[agent, above, i] = True
+                if i + 1 < width:
+                    vis_mask[agent, above, i + 1] = True
+                    vis_mask[agent, j, i + 1] = True
+            # Left propegate
+            for i in range(width // 2, -1, -1):
+                if not vis_mask[agent, j, i] or obs_grid[agent, j, i, type_idx] == wall:
+                    continue
+                vis_mask[agent, above, i] = True
+                if i - 1 >= 0:
+                    vis_mask[agent, above, i - 1] = True
+                    vis_mask[agent, j, i - 1] = True
+
+    return vis_mask
+
+
+@njit
+def ohe_objects_kernel(
+    objects: ndarray[np.int_],
+    minimal: bool,
+    agent: int,
+    n_types: int,
+    n_colors: int,
+    n_states: int,
+) -> ndarray[np.int_]:
+    """
+    One-hot encode a batch of (type, color, state) object encodings.
+    See :func:`multiworld.multigrid.utils.ohe.ohe_grid_object`.
+    """
+    dim = n_types if minimal else n_types + n_colors + n_states
+    out = np.zeros((objects.shape[0], dim), dtype=np.uint8)
+    for n in range(objects.shape[0]):
+        type_, color, state = objects[n, 0], objects[n, 1], objects[n, 2]
+        if type_ >= n_types or color >= n_colors:
+            raise ValueError("The OHE doesn't support such large numbers.")
+        out[n, type_ % n_types] = 1
+        if minimal:
+            continue
+        out[n, n_types + color % n_colors] = 1
+        if type_ == agent:
+            # Agents encode their direction, which is all zeros when unset
+            if 0 <= state < n_states:
+                out[n, n_types + n_colors + state] = 1
+        else:
+            if state >= n_states:
+                raise ValueError("The OHE doesn't support such large numbers.")
+            out[n, n_types + n_colors + state % n_states] = 1
+    return out
+
+
+@njit
+def resolve_moves_kernel(
+    agent_pos: ndarray[np.int_],
+    occupancy: ndarray[np.int_],
+    movers: ndarray[np.int_],
+    targets: ndarray[np.int_],
+    blocked: ndarray[np.bool_],
+    goal: ndarray[np.bool_],
+    terminated: ndarray[np.bool_],
+    start: int,
+) -> int:
+    """
+    Move agents forward in execution order, starting from mover ``start``.
+
+    A move fails if the agent is terminated, the target is blocked by an
+    object, or another agent occupies the target at that point in the order.
+    ``agent_pos`` and ``occupancy`` are updated in place.
+
+    Returns the index of the first mover that stepped onto a goal, so the
+    caller can run the success callback before resuming, or ``len(movers)``.
+    """
+    width, height = occupancy.shape
+    for n in range(start, movers.shape[0]):
+        agent = movers[n]
+        x, y = targets[n, 0], targets[n, 1]
+        if terminated[agent] or blocked[n] or occupancy[x, y] > 0:
+            continue
+
+        old_x, old_y = agent_pos[agent, 0], agent_pos[agent, 1]
+        if 0 <= old_x < width and 0 <= old_y < height:
+            occupancy[old_x, old_y] -= 1
+        occupancy[x, y] += 1
+        agent_pos[agent, 0], agent_pos[agent, 1] = x, y
+
+        if goal[n]:
+            return n
+    return movers.shape[0]
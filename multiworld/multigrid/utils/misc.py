@@ -1,11 +1,16 @@
 import functools
+
+from multiworld.core.position import Position
+
 from ..core.constants import Direction
 
 
 @functools.cache
-def front_pos(agent_x: int, agent_y: int, agent_dir: int):
+def front_pos(agent_x: int, agent_y: int, agent_dir: int) -> Position:
     """
     Get the position in front of an agent.
+
+    The result is cached, so repeated calls return the same ``Position``.
     """
     dx, dy = Direction(agent_dir).to_vec()
-    return (agent_x + dx, agent_y + dy)
+    return Position(agent_x + int(dx), agent_y + int(dy))
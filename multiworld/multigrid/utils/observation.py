@@ -8,12 +8,18 @@ from multiworld.core.position import Position
 from multiworld.multigrid.core.agent import Agent, AgentState
 from multiworld.multigrid.core.constants import Direction, State, WorldObjectType
 from multiworld.multigrid.core.world_object import Wall, WorldObject
+from multiworld.multigrid.utils.kernels import agent_views_kernel, vis_mask_kernel
 from multiworld.multigrid.utils.ohe import (
     OHE_GRID_OBJECT_DIM,
     OHE_GRID_OBJECT_DIM_MINIMAL,
     ohe_grid_object,
+    ohe_grid_objects,
 )
-from multiworld.multigrid.utils.preprocessing import PreprocessingEnum
+from multiworld.multigrid.utils.preprocessing import (
+    OBSERVATION_DTYPE,
+    PreprocessingEnum,
+)
+from multiworld.utils.jit import KernelBackend
 
 WALL_ENCODING = Wall().encode()
 UNSEEN_ENCODING = WorldObject(WorldObjectType.unseen, Color.from_index(0)).encode()
@@ -83,20 +89,39 @@ def gen_obs_grid_encoding(
     agent_view_size: int | None,
     see_through_walls: bool,
     preprocessing: PreprocessingEnum,
+    backend: KernelBackend = KernelBackend.numpy,
 ) -> ndarray[np.int_]:
-    num_agents = len(agent_state)
-    obs_grid = gen_obs_grid(grid_state, agent_state, agent_view_size, preprocessing)
+    obs_grid = gen_obs_grid(
+        grid_state, agent_state, agent_view_size, preprocessing, backend
+    )
     if agent_view_size is None:
         return obs_grid
-    # Generate and apply visability mask
-    vis_mask = get_vis_mask(obs_grid)
+    return apply_vis_mask(obs_grid, see_through_walls, backend)
+
+
+def apply_vis_mask(
+    obs_grid: ndarray[np.int_],
+    see_through_walls: bool,
+    backend: KernelBackend = KernelBackend.numpy,
+) -> ndarray[np.int_]:
+    """
+    Replace the cells the agents cannot see with the unseen encoding (in place).
+
+    Parameters
+    ----------
+    obs_grid : ndarray[int] of shape (num_agents, view_size, view_size, dim)
+        Observation grid for each agent
+    see_through_walls : bool
+        Whether the agents can see through walls
+    backend : KernelBackend
+        Implementation of the visibility kernel
+    """
     if see_through_walls:
         return obs_grid
-    for agent in range(num_agents):
-        for i in range(agent_view_size):
-            for j in range(agent_view_size):
-                if not vis_mask[agent, i, j]:
-                    obs_grid[agent, i, j] = UNSEEN_ENCODING
+    # Generate and apply visability mask
+    vis_mask = get_vis_mask(obs_grid, backend)
+    if not vis_mask.all():
+        obs_grid[~vis_mask] = UNSEEN_ENCODING
     return obs_grid
 
 
@@ -105,55 +130,169 @@ def gen_obs_grid(
     agent_state: ndarray[np.int_],
     agent_view_size: int | None,
     preprocessing: PreprocessingEnum,
+    backend: KernelBackend = KernelBackend.numpy,
+) -> ndarray[np.int_]:
+    num_agents = len(agent_state)
+
+    grid_encoding = gen_grid_encoding(grid_state, agent_state, preprocessing, backend)
+
+    if agent_view_size is None:
+        width = grid_state.shape[0]
+        height = grid_state.shape[1]
+        obs_grid = np.empty(
+            (num_agents, height, width, grid_encoding.shape[-1]),
+            dtype=OBSERVATION_DTYPE,
+        )
+        for agent in range(num_agents):
+            obs_grid[agent, ...] = grid_encoding.copy()
+        return obs_grid
+
+    return gen_agent_views(
+        grid_encoding, agent_state, agent_view_size, preprocessing, backend
+    )
+
+
+def gen_grid_encoding(
+    grid_state: ndarray[np.int_],
+    agent_state: ndarray[np.int_],
+    preprocessing: PreprocessingEnum,
+    backend: KernelBackend = KernelBackend.numpy,
+) -> ndarray[np.int_]:
+    """
+    Encode the whole grid, with the (non-terminated) agents drawn on top of it.
+
+    Returns
+    -------
+    grid_encoding : ndarray[int] of shape (width, height, dim)
+        Grid encoding, one-hot encoded according to the preprocessing
+    """
+    grid_encoding = insert_agents(grid_state, agent_state)
+    return ohe_grid_encoding(grid_encoding, preprocessing, backend=backend)
+
+
+def insert_agents(
+    grid_state: ndarray[np.int_], agent_state: ndarray[np.int_]
 ) -> ndarray[np.int_]:
+    """
+    Return the raw grid encoding with the (non-terminated) agents drawn on top of it.
+    """
     num_agents = len(agent_state)
+    if num_agents == 0:
+        return grid_state[..., GRID_ENCODING_IDX].astype(OBSERVATION_DTYPE)
 
-    # Process agent states
     agent_grid = agent_state[..., AGENT_ENCODING_IDX]
-    agent_dir = agent_state[..., AGENT_DIR_IDX]
     agent_pos = agent_state[..., AGENT_POS_IDX]
     agent_terminated = agent_state[..., AGENT_TERMINATED_IDX]
-    agent_carrying = agent_state[..., AGENT_CARRYING_IDX]
 
-    if num_agents > 0:
-        grid_encoding = np.empty((*grid_state.shape[:-1], ENCODE_DIM), dtype=np.int_)
-        grid_encoding[...] = grid_state[..., GRID_ENCODING_IDX]
+    grid_encoding = np.empty(
+        (*grid_state.shape[:-1], ENCODE_DIM), dtype=OBSERVATION_DTYPE
+    )
+    grid_encoding[...] = grid_state[..., GRID_ENCODING_IDX]
 
-        # Insert agent grid encodings
-        for agent in range(num_agents):
-            if agent_terminated[agent]:
-                continue
-            x, y = agent_pos[agent]
-            grid_encoding[x, y, GRID_ENCODING_IDX] = agent_grid[agent]
-    else:
-        grid_encoding = grid_state[..., GRID_ENCODING_IDX]
+    # Insert agent grid encodings
+    for agent in range(num_agents):
+        if agent_terminated[agent]:
+            continue
+        x, y = agent_pos[agent]
+        grid_encoding[x, y, GRID_ENCODING_IDX] = agent_grid[agent]
+    return grid_encoding
+
+
+def ohe_grid_encoding_dim(preprocessing: PreprocessingEnum) -> int | None:
+    """
+    Return the one-hot encoding dimension of a grid cell, or None if the
+    preprocessing does not one-hot encode.
+    """
+    if preprocessing == PreprocessingEnum.ohe:
+        return OHE_GRID_OBJECT_DIM
+    if preprocessing == PreprocessingEnum.ohe_minimal:
+        return OHE_GRID_OBJECT_DIM_MINIMAL
+    return None
+
+
+def ohe_grid_encoding(
+    grid_encoding: ndarray[np.int_],
+    preprocessing: PreprocessingEnum,
+    out: ndarray[np.int_] | None = None,
+    mask: ndarray[np.bool_] | None = None,
+    backend: KernelBackend = KernelBackend.numpy,
+) -> ndarray[np.int_]:
+    """
+    One-hot encode a raw grid encoding according to the preprocessing.
+
+    Parameters
+    ----------
+    grid_encoding : ndarray[int] of shape (width, height, ENCODE_DIM)
+        Raw grid encoding
+    preprocessing : PreprocessingEnum
+        Preprocessing to apply
+    out : ndarray[int] of shape (width, height, dim), optional
+        Previous encoding to update in place
+    mask : ndarray[bool] of shape (width, height), optional
+        Only encode these cells (requires ``out``)
+    backend : KernelBackend
+        Implementation of the one-hot encoding kernel
+    """
+    ohe_dim = ohe_grid_encoding_dim(preprocessing)
+    if ohe_dim is None:
+        return grid_encoding
 
     ohe_minimal = preprocessing == PreprocessingEnum.ohe_minimal
-    ohe = preprocessing == PreprocessingEnum.ohe
-    ohe_grid_encoding_dim = None
+    if out is None:
+        out = np.empty((*grid_encoding.shape[:-1], ohe_dim), dtype=OBSERVATION_DTYPE)
+    if backend == KernelBackend.numba:
+        if mask is None:
+            cells = grid_encoding.reshape(-1, ENCODE_DIM)
+            out[...] = ohe_grid_objects(cells, ohe_minimal).reshape(out.shape)
+        else:
+            out[mask] = ohe_grid_objects(grid_encoding[mask], ohe_minimal)
+        return out
+    if mask is None:
+        cells = (
+            (x, y)
+            for y in range(grid_encoding.shape[1])
+            for x in range(grid_encoding.shape[0])
+        )
+    else:
+        cells = zip(*np.nonzero(mask))
+    for x, y in cells:
+        out[x, y] = ohe_grid_object(grid_encoding[x, y], ohe_minimal)
+    return out
 
-    if ohe:
-        ohe_grid_encoding_dim = OHE_GRID_OBJECT_DIM
-    elif ohe_minimal:
-        ohe_grid_encoding_dim = OHE_GRID_OBJECT_DIM_MINIMAL
 
-    if ohe_grid_encoding_dim is not None:
-        ohe_grid_encoding = np.empty(
-            (*grid_state.shape[:-1], ohe_grid_encoding_dim), dtype=np.int_
+def gen_agent_views(
+    grid_encoding: ndarray[np.int_],
+    agent_state: ndarray[np.int_],
+    agent_view_size: int,
+    preprocessing: PreprocessingEnum,
+    backend: KernelBackend = KernelBackend.numpy,
+) -> ndarray[np.int_]:
+    """
+    Cut each agent's (rotated) view out of the grid encoding.
+
+    Parameters
+    ----------
+    grid_encoding : ndarray[int] of shape (width, height, dim)
+        Grid encoding from :func:`gen_grid_encoding`
+    agent_state : ndarray[int] of shape (num_agents, AgentState.dim)
+        State of the agents to generate views for
+    backend : KernelBackend
+        Implementation of the view kernel
+    """
+    if backend == KernelBackend.numba:
+        return _gen_agent_views_numba(
+            grid_encoding, np.asarray(agent_state), agent_view_size, preprocessing
         )
-        for y in range(grid_encoding.shape[1]):
-            for x in range(grid_encoding.shape[0]):
-                ohe_grid_obj = ohe_grid_object(grid_encoding[x, y], ohe_minimal)
-                ohe_grid_encoding[x, y] = ohe_grid_obj
-        grid_encoding = ohe_grid_encoding
 
-    if agent_view_size is None:
-        width = grid_state.shape[0]
-        height = grid_state.shape[1]
-        obs_grid = np.empty((num_agents, height, width, ENCODE_DIM), dtype=np.int_)
-        for agent in range(num_agents):
-            obs_grid[agent, ...] = grid_encoding.copy()
-        return obs_grid
+    num_agents = len(agent_state)
+
+    agent_dir = agent_state[..., AGENT_DIR_IDX]
+    agent_pos = agent_state[..., AGENT_POS_IDX]
+    agent_carrying = agent_state[..., AGENT_CARRYING_IDX]
+
+    ohe_minimal = preprocessing == PreprocessingEnum.ohe_minimal
+    ohe = preprocessing == PreprocessingEnum.ohe
+    ohe_dim = ohe_grid_encoding_dim(preprocessing)
 
     obs_width, obs_height = agent_view_size, agent_view_size
 
@@ -161,19 +300,10 @@ def gen_obs_grid(
     topX, topY = top_left[:, 0], top_left[:, 1]
 
     num_left_rotations = (agent_dir + 1) % 4
-    if ohe:
-        obs_grid = np.empty(
-            (num_agents, obs_height, obs_width, OHE_GRID_OBJECT_DIM), dtype=np.int_
-        )
-    elif ohe_minimal:
-        obs_grid = np.empty(
-            (num_agents, obs_height, obs_width, OHE_GRID_OBJECT_DIM_MINIMAL),
-            dtype=np.int_,
-        )
-    else:
-        obs_grid = np.empty(
-            (num_agents, obs_height, obs_width, ENCODE_DIM), dtype=np.int_
-        )
+    obs_grid = np.empty(
+        (num_agents, obs_height, obs_width, grid_encoding.shape[-1]),
+        dtype=OBSERVATION_DTYPE,
+    )
 
     for agent in range(num_agents):
         for j in range(obs_height):
@@ -192,7 +322,7 @@ def gen_obs_grid(
                     raise ValueError("Invalid rotation")
 
                 # Set observation grid
-                if 0 <= x < grid_state.shape[0] and 0 <= y < grid_state.shape[1]:
+                if 0 <= x < grid_encoding.shape[0] and 0 <= y < grid_encoding.shape[1]:
                     obs_grid[agent, j_rot, i_rot] = grid_encoding[x, y]
                 else:
                     if ohe or ohe_minimal:
@@ -203,10 +333,10 @@ def gen_obs_grid(
                         obs_grid[agent, j_rot, i_rot] = WALL_ENCODING
 
     # Make it so the agent sees what it is carrying
-    if ohe_grid_encoding_dim is not None:
+    if ohe_dim is not None:
         ohe_agent_carrying = np.zeros(
-            (num_agents, ohe_grid_encoding_dim),
-            dtype=np.int_,
+            (num_agents, ohe_dim),
+            dtype=OBSERVATION_DTYPE,
         )
         for agent in range(num_agents):
             carrying = ohe_grid_object(agent_carrying[agent], ohe_minimal)
@@ -216,6 +346,37 @@ def gen_obs_grid(
     return obs_grid
 
 
+def _gen_agent_views_numba(
+    grid_encoding: ndarray[np.int_],
+    agent_state: ndarray[np.int_],
+    agent_view_size: int,
+    preprocessing: PreprocessingEnum,
+) -> ndarray[np.int_]:
+    agent_dir = agent_state[..., AGENT_DIR_IDX]
+    agent_pos = agent_state[..., AGENT_POS_IDX]
+    agent_carrying = agent_state[..., AGENT_CARRYING_IDX]
+
+    ohe_minimal = preprocessing == PreprocessingEnum.ohe_minimal
+    wall_encoding = np.array(WALL_ENCODING, dtype=OBSERVATION_DTYPE)
+    if ohe_grid_encoding_dim(preprocessing) is not None:
+        wall_encoding = ohe_grid_objects(wall_encoding[None], ohe_minimal)[0]
+        agent_carrying = ohe_grid_objects(agent_carrying, ohe_minimal)
+
+    top_left = get_view_exts(agent_dir, agent_pos, agent_view_size)
+    obs_grid = agent_views_kernel(
+        np.ascontiguousarray(grid_encoding, dtype=OBSERVATION_DTYPE),
+        wall_encoding,
+        top_left[:, 0],
+        top_left[:, 1],
+        (agent_dir + 1) % 4,
+        agent_view_size,
+    )
+
+    # Make it so the agent sees what it is carrying
+    obs_grid[:, agent_view_size - 1, agent_view_size // 2] = agent_carrying
+    return obs_grid
+
+
 def see_behind(world_object: ndarray[np.int_] | None) -> bool:
     """
     Can an agent see behind this object?
@@ -257,7 +418,9 @@ def get_see_behind_mask(grid_array: ndarray[np.int_]) -> ndarray[np.bool_]:
     return see_behind_mask
 
 
-def get_vis_mask(obs_grid: ndarray[np.int_]) -> ndarray[np.bool_]:
+def get_vis_mask(
+    obs_grid: ndarray[np.int_], backend: KernelBackend = KernelBackend.numpy
+) -> ndarray[np.bool_]:
     """
     Generate a boolean mask indicating which grid locations are visible to each agent.
 
@@ -265,12 +428,17 @@ def get_vis_mask(obs_grid: ndarray[np.int_]) -> ndarray[np.bool_]:
     ----------
     obs_grid : ndarray[int] of shape (num_agents, width, height, dim)
         Grid object array for each agent observation
+    backend : KernelBackend
+        Implementation of the visibility kernel
 
     Returns
     -------
     vis_mask : ndarray[bool] of shape (num_agents, width, height)
         Boolean visibility mask for each agent
     """
+    if backend == KernelBackend.numba:
+        return vis_mask_kernel(np.ascontiguousarray(obs_grid), TYPE, WALL)
+
     num_agents, height, width = obs_grid.shape[:3]
     see_behind_mask = get_see_behind_mask(obs_grid)
     vis_mask = np.zeros((num_agents, width, height), dtype=np.bool_)
@@ -0,0 +1,138 @@
+from typing import List
+
+import numpy as np
+from numpy.typing import NDArray as ndarray
+
+from multiworld.multigrid.utils.observation import (
+    AGENT_DIR_IDX,
+    AGENT_POS_IDX,
+    apply_vis_mask,
+    gen_agent_views,
+    get_view_exts,
+    insert_agents,
+    ohe_grid_encoding,
+)
+from multiworld.multigrid.utils.preprocessing import PreprocessingEnum
+from multiworld.utils.jit import KernelBackend
+
+
+class ObservationCache:
+    """
+    Dirty-tracking cache of the agents' grid observations.
+
+    Every update, the raw grid encoding (with the agents drawn on top) is diffed
+    against the previous one. Only the views of agents whose own state changed
+    (moved, turned, picked something up, ...) or whose view window contains a
+    changed cell are regenerated. All other agents keep their previous
+    observation arrays, which are never modified in place.
+
+    The result is identical to :func:`gen_obs_grid_encoding`.
+    """
+
+    def __init__(
+        self,
+        agent_view_size: int,
+        see_through_walls: bool,
+        preprocessing: PreprocessingEnum,
+        backend: KernelBackend = KernelBackend.numpy,
+    ):
+        self._agent_view_size = agent_view_size
+        self._see_through_walls = see_through_walls
+        self._preprocessing = preprocessing
+        self._backend = backend
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the cached observations, forcing a full regeneration on the next update.
+        """
+        self._raw_encoding: ndarray[np.int_] | None = None
+        self._grid_encoding: ndarray[np.int_] | None = None
+        self._agent_state: ndarray[np.int_] | None = None
+        self._observations: List[ndarray[np.int_]] = []
+
+    def update(
+        self, grid_state: ndarray[np.int_], agent_state: ndarray[np.int_]
+    ) -> List[ndarray[np.int_]]:
+        """
+        Return the observation of every agent, regenerating only the stale ones.
+
+        Parameters
+        ----------
+        grid_state : ndarray[int] of shape (width, height, dim)
+            Grid state
+        agent_state : ndarray[int] of shape (num_agents, AgentState.dim)
+            Agent states
+
+        Returns
+        -------
+        observations : list[ndarray[int]] of length num_agents
+            Observation grid for each agent
+        """
+        agent_state = np.asarray(agent_state)
+        raw_encoding = insert_agents(grid_state, agent_state)
+
+        if (
+            self._raw_encoding is None
+            or self._raw_encoding.shape != raw_encoding.shape
+            or self._agent_state.shape != agent_state.shape
+        ):
+            self._grid_encoding = ohe_grid_encoding(
+                raw_encoding, self._preprocessing, backend=self._backend
+            )
+            self._observations = [None] * len(agent_state)
+            agents = np.arange(len(agent_state))
+        else:
+            dirty = np.any(raw_encoding != self._raw_encoding, axis=-1)
+            if dirty.any():
+                self._grid_encoding = ohe_grid_encoding(
+                    raw_encoding,
+                    self._preprocessing,
+                    out=self._grid_encoding,
+                    mask=dirty,
+                    backend=self._backend,
+                )
+            changed = np.any(agent_state != self._agent_state, axis=-1)
+            agents = np.flatnonzero(changed | self._sees_any(agent_state, dirty))
+
+        if len(agents) > 0:
+            views = gen_agent_views(
+                self._grid_encoding,
+                agent_state[agents],
+                self._agent_view_size,
+                self._preprocessing,
+                self._backend,
+            )
+            views = apply_vis_mask(views, self._see_through_walls, self._backend)
+            for agent, view in zip(agents, views):
+                self._observations[agent] = view
+
+        self._raw_encoding = raw_encoding.copy()
+        self._agent_state = agent_state.copy()
+        return list(self._observations)
+
+    def _sees_any(
+        self, agent_state: ndarray[np.int_], mask: ndarray[np.bool_]
+    ) -> ndarray[np.bool_]:
+        """
+        Return whether each agent's view window contains any cell set in the mask.
+        """
+        if not mask.any():
+            return np.zeros(len(agent_state), dtype=np.bool_)
+
+        width, height = mask.shape
+        top_left = get_view_exts(
+            agent_state[..., AGENT_DIR_IDX],
+            agent_state[..., AGENT_POS_IDX],
+            self._agent_view_size,
+        )
+        x0 = np.clip(top_left[:, 0], 0, width)
+        y0 = np.clip(top_left[:, 1], 0, height)
+        x1 = np.clip(top_left[:, 0] + self._agent_view_size, 0, width)
+        y1 = np.clip(top_left[:, 1] + self._agent_view_size, 0, height)
+
+        # Summed-area table, so each window is counted in constant time
+        table = np.zeros((width + 1, height + 1), dtype=np.int_)
+        table[1:, 1:] = mask.cumsum(axis=0).cumsum(axis=1)
+        counts = table[x1, y1] - table[x0, y1] - table[x1, y0] + table[x0, y0]
+        return counts > 0
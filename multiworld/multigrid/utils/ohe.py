@@ -2,6 +2,8 @@ import numpy as np
 
 from multiworld.core.constants import COLORS
 from multiworld.multigrid.core.constants import Direction
+from multiworld.multigrid.utils.kernels import ohe_objects_kernel
+from multiworld.multigrid.utils.preprocessing import OBSERVATION_DTYPE
 from multiworld.swarm.core.constants import WorldObjectType
 from multiworld.swarm.core.world_object import WorldObject
 
@@ -13,12 +15,22 @@ N_STATES = 4
 OHE_GRID_OBJECT_DIM = N_TYPES + N_COLORS + N_STATES
 OHE_GRID_OBJECT_DIM_MINIMAL = N_TYPES
 
+AGENT = WorldObjectType.agent.to_index()
+
 
 def ohe_direction(direction: int) -> np.ndarray:
-    result = np.array([direction == d for d in Direction], dtype=np.float32)
+    result = np.array([direction == d for d in Direction], dtype=OBSERVATION_DTYPE)
     return result
 
 
+def ohe_directions(directions: np.ndarray) -> np.ndarray:
+    """
+    One-hot encode the directions of all agents at once.
+    Equivalent to stacking ``ohe_direction`` for every direction.
+    """
+    return (directions[:, None] == np.arange(len(Direction))).astype(OBSERVATION_DTYPE)
+
+
 def ohe_agent(obj: np.ndarray, minimal: bool) -> np.ndarray:
     type_ = obj[WorldObject.TYPE]
     color = obj[WorldObject.COLOR]
@@ -37,7 +49,7 @@ def ohe_int(num: int, max: int) -> np.ndarray:
         num <= max
     ), f"The OHE doesn't support such large numbers {num}. Maximum is {max}."
 
-    ohe = np.zeros(max, dtype=np.int_)
+    ohe = np.zeros(max, dtype=OBSERVATION_DTYPE)
     ohe[num] = 1
     return ohe
 
@@ -59,6 +71,15 @@ def ohe_grid_object(obj: np.ndarray, minimal: bool) -> np.ndarray:
     return np.concatenate((ohe_type, ohe_color, ohe_state))
 
 
+def ohe_grid_objects(objs: np.ndarray, minimal: bool) -> np.ndarray:
+    """
+    One-hot encode a batch of grid objects of shape (n, ENCODE_DIM) at once
+    with the compiled kernel. Equivalent to ``ohe_grid_object`` per row.
+    """
+    objs = np.ascontiguousarray(objs)
+    return ohe_objects_kernel(objs, minimal, AGENT, N_TYPES, N_COLORS, N_STATES)
+
+
 def decode_ohe(obj: np.ndarray, minimal: bool) -> np.ndarray:
     type_ = np.argmax(obj[:N_TYPES])
     if minimal:
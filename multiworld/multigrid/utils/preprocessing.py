@@ -1,5 +1,11 @@
 from enum import Enum
 
+import numpy as np
+
+# Every multigrid observation, raw or one-hot encoded, fits in a byte.
+# Networks convert observations to float themselves, inside their forward pass.
+OBSERVATION_DTYPE = np.uint8
+
 
 class PreprocessingEnum(Enum):
     none = "none"
@@ -1,8 +1,12 @@
 import json
 from typing import List, Literal
 
+import numpy as np
+from numpy.typing import NDArray
+
 from multiworld.multigrid.base import MultiGridEnv
-from multiworld.multigrid.core.concept import get_concept_checks
+from multiworld.multigrid.core.concept import ConceptDetector, get_concept_checks
+from multiworld.utils.typing import ObsType
 from multiworld.utils.wrappers import ConceptObsWrapper
 from utils.common.numpy_collections import NumpyEncoder
 
@@ -30,6 +34,10 @@ class MultiGridConceptObsWrapper(ConceptObsWrapper):
             concept_checks=get_concept_checks,
             result_save_dir=results_dir,
         )
+        self._detector = ConceptDetector(concepts, env._preprocessing)
+
+    def _detect_concepts(self, observations: List[ObsType]) -> NDArray[np.bool_]:
+        return self._detector(observations)
 
     @property
     def encoder(self) -> json.JSONEncoder:
@@ -10,6 +10,7 @@ from multiworld.swarm.core.agent import Agent, AgentState
 from multiworld.swarm.core.constants import OBJECT_SIZE, WorldObjectType
 from multiworld.swarm.core.world import World
 from multiworld.swarm.utils.observation import gen_obs_grid_encoding
+from multiworld.utils.jit import KernelBackend, resolve_kernel_backend
 from multiworld.utils.typing import AgentID, ObsType
 from utils.common.callbacks import RenderingCallback, empty_rendering_callback
 
@@ -33,6 +34,7 @@ class SwarmEnv(MultiWorldEnv):
         success_termination_mode: Literal["all", "any"] = "all",
         failure_termination_mode: Literal["all", "any"] = "any",
         continuous_action_space: bool = False,
+        kernel_backend: KernelBackend | str = KernelBackend.numpy,
     ):
         super().__init__(
             agents,
@@ -63,6 +65,7 @@ class SwarmEnv(MultiWorldEnv):
         self._world = World(width, height, object_size)
 
         self._continuous_action_space = continuous_action_space
+        self._kernel_backend = resolve_kernel_backend(kernel_backend)
 
     def place_agent(
         self, agent: Agent, top=None, size=None, rand_dir=True, max_tries=math.inf
@@ -109,7 +112,7 @@ class SwarmEnv(MultiWorldEnv):
             if fwd_obj is not None and not fwd_obj.can_overlap():
                 return
 
-            agent_present = np.array(self._agent_states.pos == fwd_pos).any()
+            agent_present = self._agent_states.at(fwd_pos).any()
             if agent_present:
                 return
 
@@ -155,6 +158,7 @@ class SwarmEnv(MultiWorldEnv):
             self._agents[0].view_size,
             self._agents[0].observations,
             world_size=(self._width, self._height),
+            backend=self._kernel_backend,
         )
         observations = {}
         for i in range(self._num_agents):
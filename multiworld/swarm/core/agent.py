@@ -66,9 +66,8 @@ class Agent:
     @property
     def front_pos(self) -> Position:
         agent_dir = self.state._view[AgentState.DIR]
-        agent_pos = self.state._view[AgentState.POS]
-        fwd_pos = front_pos(*agent_pos, agent_dir)
-        return Position(*fwd_pos)
+        agent_x, agent_y = self.state._view[AgentState.POS].tolist()
+        return front_pos(agent_x, agent_y, int(agent_dir))
 
     def render(self, img: ndarray[np.uint8]):
         """
@@ -106,9 +105,18 @@ class AgentState(np.ndarray):
         obj._view = obj.view(
             np.ndarray
         )  # View of the underlying array (faster indexing)
+        obj._agent_views = {}  # Per-agent views, created once on first access
         return obj
 
     def __getitem__(self, idx):
+        agent_views = getattr(self, "_agent_views", None)
+        if agent_views is not None and type(idx) is int:
+            if idx not in agent_views:
+                agent_views[idx] = self._getitem(idx)
+            return agent_views[idx]
+        return self._getitem(idx)
+
+    def _getitem(self, idx):
         out = super().__getitem__(idx)
         if out.shape and out.shape[-1] == self.dim:
             if not hasattr(self, "_view"):
@@ -148,7 +156,7 @@ class AgentState(np.ndarray):
         """
         out = self._view[..., AgentState.POS]
         if out.ndim == 1:
-            return Position(*out)
+            return Position(*out.tolist())
         pos = Position.from_list(out)
         return (pos) if pos.ndim == 1 else pos
 
@@ -158,8 +166,15 @@ class AgentState(np.ndarray):
         Set the agent's (x, y) position.
         """
         if isinstance(value, Position):
-            value = list(value())
-        self[..., AgentState.POS] = value
+            value = (value.x, value.y)
+        self._view[..., AgentState.POS] = value
+
+    def at(self, pos: Position) -> ndarray[np.bool_]:
+        """
+        Return a boolean mask of the agents located at the given position.
+        """
+        agent_pos = self._view[..., AgentState.POS]
+        return (agent_pos[..., 0] == pos.x) & (agent_pos[..., 1] == pos.y)
 
     @property
     def terminated(self) -> bool | ndarray[np.bool]:
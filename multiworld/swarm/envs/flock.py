@@ -30,6 +30,10 @@ class FlockEnv(SwarmEnv):
         self._max_predator_angle_change = max_predator_angle_change
         self._num_active_agents = self._num_agents - predators
 
+    @property
+    def env_name(self) -> str:
+        return "flock"
+
     def _gen_world(self, width: int, height: int):
         self._world = World(width, height, self._object_size)
 
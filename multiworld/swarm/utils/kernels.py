@@ -0,0 +1,29 @@
+"""
+Compiled (Numba) versions of the innermost swarm kernels.
+
+They are only called when the environment is created with
+``kernel_backend=KernelBackend.numba``.
+"""
+
+import math
+
+import numpy as np
+from numpy.typing import NDArray as ndarray
+
+from multiworld.utils.jit import njit
+
+
+@njit
+def pairwise_distances_kernel(agent_pos: ndarray[np.float64]) -> ndarray[np.float64]:
+    """
+    Euclidean distance between every pair of agents.
+    Equivalent to ``np.linalg.norm(agent_pos[:, None] - agent_pos[None], axis=-1)``.
+    """
+    num_agents = agent_pos.shape[0]
+    distances = np.empty((num_agents, num_agents), dtype=np.float64)
+    for i in range(num_agents):
+        for j in range(num_agents):
+            dx = agent_pos[i, 0] - agent_pos[j, 0]
+            dy = agent_pos[i, 1] - agent_pos[j, 1]
+            distances[i, j] = math.sqrt(dx * dx + dy * dy)
+    return distances
@@ -3,6 +3,8 @@ import math
 
 from typing import Tuple
 
+from multiworld.core.position import Position
+
 
 def are_within_radius(tuple0: Tuple[int, int], tuple1: Tuple[int, int], radius: float):
     distance = math.sqrt(sum((a - b) ** 2 for a, b in zip(tuple0, tuple1)))
@@ -10,9 +12,11 @@ def are_within_radius(tuple0: Tuple[int, int], tuple1: Tuple[int, int], radius:
 
 
 @functools.cache
-def front_pos(agent_x: int, agent_y: int, agent_dir: int):
+def front_pos(agent_x: int, agent_y: int, agent_dir: int) -> Position:
     """
     Get the position in front of an agent.
+
+    The result is cached, so repeated calls return the same ``Position``.
     """
     direction_radians = math.radians(agent_dir)
 
@@ -22,4 +26,4 @@ def front_pos(agent_x: int, agent_y: int, agent_dir: int):
     new_x = agent_x + round(delta_x)
     new_y = agent_y + round(delta_y)
 
-    return new_x, new_y
+    return Position(new_x, new_y)
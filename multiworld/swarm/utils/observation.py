@@ -8,6 +8,8 @@ from multiworld.core.position import Position
 from multiworld.swarm.core.agent import Agent, AgentState
 from multiworld.swarm.core.constants import WorldObjectType
 from multiworld.swarm.core.world_object import Wall, WorldObject
+from multiworld.swarm.utils.kernels import pairwise_distances_kernel
+from multiworld.utils.jit import KernelBackend
 
 WALL_ENCODING = Wall().encode()
 UNSEEN_ENCODING = WorldObject(WorldObjectType.unseen, Color.from_index(0)).encode()
@@ -34,6 +36,7 @@ def gen_obs_grid_encoding(
     agent_view_size: int,
     max_observations: int,
     world_size: Tuple[int, int],
+    backend: KernelBackend = KernelBackend.numpy,
 ) -> np.ndarray:
     """
     This function returns the encoded agents that are within a certain radius of the observing agent.
@@ -48,16 +51,13 @@ def gen_obs_grid_encoding(
     obs = np.zeros(
         (num_agents, 1, max_observations, AGENT_ENCODE_DIM), dtype=np.float32
     )
+    all_distances = pairwise_distances(agent_pos, backend)
 
     for agent in range(num_agents):
         if agent_terminated[agent]:
             continue
 
-        pos = agent_pos[agent]
-        distances = np.array(
-            [wrapped_distance(other_pos, pos, world_size) for other_pos in agent_pos]
-        )
-        distances = np.linalg.norm(agent_pos - pos, axis=1)
+        distances = all_distances[agent]
 
         valid_mask = (distances <= agent_view_size) & (~agent_terminated)
         valid_agents = np.where(valid_mask)[0]
@@ -83,6 +83,19 @@ def gen_obs_grid_encoding(
     return obs
 
 
+def pairwise_distances(
+    agent_pos: ndarray[np.int_], backend: KernelBackend = KernelBackend.numpy
+) -> ndarray[np.float64]:
+    """
+    Euclidean distance between every pair of agents, of shape (num_agents, num_agents).
+    """
+    if backend == KernelBackend.numba:
+        return pairwise_distances_kernel(
+            np.ascontiguousarray(agent_pos, dtype=np.float64)
+        )
+    return np.linalg.norm(agent_pos[:, None] - agent_pos[None], axis=-1)
+
+
 def wrapped_distance(
     pos1: ndarray[np.int_], pos2: ndarray[np.int_], world_size: Tuple[int, int]
 ):
@@ -0,0 +1,39 @@
+import logging
+from enum import Enum
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+NUMBA_AVAILABLE = numba is not None
+
+
+class KernelBackend(Enum):
+    """
+    Implementation used for the innermost environment kernels.
+    """
+
+    numpy = "numpy"
+    numba = "numba"
+
+
+def njit(fn):
+    """
+    Compile the function with ``numba.njit`` when Numba is installed.
+    Without Numba the function is returned unchanged.
+    """
+    if numba is None:
+        return fn
+    return numba.njit(cache=True)(fn)
+
+
+def resolve_kernel_backend(backend: KernelBackend | str) -> KernelBackend:
+    """
+    Return the requested backend, falling back to NumPy if Numba is unavailable.
+    """
+    backend = KernelBackend(backend)
+    if backend == KernelBackend.numba and not NUMBA_AVAILABLE:
+        logging.warning("Numba is not installed, falling back to the NumPy kernels.")
+        return KernelBackend.numpy
+    return backend
@@ -14,6 +14,17 @@ def serialize_observation(obs_dict: ObsType):
 
 def deserialize_observation(data: Dict[str, Any]) -> ObsType:
     return {
-        "observation": np.array(data["observation"]),
-        "direction": np.array(data["direction"]),
+        "observation": _compact(np.array(data["observation"])),
+        "direction": _compact(np.array(data["direction"])),
     }
+
+
+def _compact(array: np.ndarray) -> np.ndarray:
+    """
+    Store integer observations that fit in a byte as uint8, like the environments emit them.
+    """
+    if array.size == 0 or not np.issubdtype(array.dtype, np.integer):
+        return array
+    if array.min() < 0 or array.max() > np.iinfo(np.uint8).max:
+        return array
+    return array.astype(np.uint8)
@@ -216,7 +216,10 @@ class ConceptObsWrapper(gym.Wrapper):
 
         observations, rewards, terminations, truncations, info = super().step(actions)
 
-        for concept, check_fn in self._concept_checks.items():
+        agent_ids = list(observations.keys())
+        detected = self._detect_concepts([observations[key] for key in agent_ids])
+
+        for column, concept in enumerate(self._concept_checks.keys()):
             negative_concept = "negative_" + concept
             if all(self._concepts_filled.values()):
                 self._write_concepts()
@@ -228,12 +231,12 @@ class ConceptObsWrapper(gym.Wrapper):
             ):
                 continue
 
-            for agent_id, obs in observations.items():
-                decoded_obs = self._decoder(obs.copy())
+            for row, agent_id in enumerate(agent_ids):
+                obs = observations[agent_id]
                 if not self._concepts_filled[concept]:
                     self._sample_efficiency[concept] += 1
 
-                if not check_fn(decoded_obs):
+                if not detected[row, column]:
                     if self._concepts_filled[negative_concept]:
                         continue
                     rand_float = np.random.uniform()
@@ -259,6 +262,21 @@ class ConceptObsWrapper(gym.Wrapper):
 
         return observations, rewards, terminations, truncations, info
 
+    def _detect_concepts(self, observations: List[ObsType]) -> ndarray[np.bool_]:
+        """
+        Bitmap of shape (agents, concepts) of the concepts present in the observations
+        of one step, with the concepts in the order of the concept checks.
+        Decodes every observation once, then applies each check to it.
+        """
+        detected = np.zeros(
+            (len(observations), len(self._concept_checks)), dtype=np.bool_
+        )
+        for row, obs in enumerate(observations):
+            decoded_obs = self._decoder(obs.copy())
+            for column, check_fn in enumerate(self._concept_checks.values()):
+                detected[row, column] = check_fn(decoded_obs)
+        return detected
+
     def _write_concepts(self) -> None:
         logging.info("Writing concept observations to disk...")
         for concept, observations in self._concepts.items():
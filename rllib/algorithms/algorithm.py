@@ -1,8 +1,11 @@
+import logging
 from abc import ABC, abstractmethod
+from contextlib import nullcontext
 from itertools import count
 from typing import Any, Dict, Mapping, SupportsFloat
 
 import numpy as np
+import torch
 import torch.nn as nn
 
 from multiworld.utils.typing import AgentID, ObsType
@@ -24,6 +27,10 @@ class Algorithm(Environment, WandB, ABC):
             self._config._wandb_log_interval,
             self._config._wandb_tags,
             self._config._wandb_dir,
+            backend=self._config._wandb_backend,
+            max_frames=self._config._max_frames,
+            frame_stride=self._config._frame_stride,
+            frame_downscale=self._config._frame_downscale,
         )
         self._config = config
         self._build_environment()
@@ -32,16 +39,22 @@ class Algorithm(Environment, WandB, ABC):
         self._episodes_done = 0
 
     def learn(self, steps: float = np.inf):
-        for i in count():
-            self.collect_rollouts()
+        # Anomaly detection is process-wide, restore the previous mode after learning
+        with (
+            torch.autograd.set_detect_anomaly(True)
+            if self._config._detect_anomaly
+            else nullcontext()
+        ):
+            for i in count():
+                self.collect_rollouts()
 
-            self.log_episode()
-            self.commit_log()
+                self.log_episode()
+                self.commit_log()
 
-            self._episodes_done += 1
+                self._episodes_done += 1
 
-            if self._steps_done >= steps:
-                break
+                if self._steps_done >= steps:
+                    break
 
     def log_episode(self):
         self.add_log("steps_done", self._steps_done)
@@ -49,6 +62,8 @@ class Algorithm(Environment, WandB, ABC):
 
     def collect_rollouts(self):
         observations, _ = self._env.reset()
+        rewards_sum = dict.fromkeys(observations.keys(), 0.0)
+        last_infos = {}
 
         for t in count():
             self._steps_done += 1
@@ -67,26 +82,49 @@ class Algorithm(Environment, WandB, ABC):
                 infos,
             )
 
-            for agent_id in observations.keys():
-                self.add_log(
-                    "total_rewards",
-                    float(rewards[agent_id]),
-                    method=LogMethod.CUMULATIVE,
-                )
-                self.add_log(
-                    f"rewards_{agent_id}",
-                    float(rewards[agent_id]),
-                    method=LogMethod.CUMULATIVE,
-                )
-
-            for agent_id, value in infos.items():
-                for key, value in value.items():
-                    self.add_log(key + str(agent_id), value)
+            if self.logging_enabled:
+                for agent_id in observations.keys():
+                    rewards_sum[agent_id] += float(rewards[agent_id])
+                for agent_id, agent_infos in infos.items():
+                    last_infos.setdefault(agent_id, {}).update(agent_infos)
 
             observations = next_observations
             if all(terminations.values()) or all(truncations.values()):
                 break
 
+        if not self.logging_enabled:
+            return
+        # Logged once per episode, the info values overwrite each other anyway
+        self.add_log("total_rewards", sum(rewards_sum.values()), LogMethod.CUMULATIVE)
+        for agent_id, value in rewards_sum.items():
+            self.add_log(f"rewards_{agent_id}", value, LogMethod.CUMULATIVE)
+        for agent_id, agent_infos in last_infos.items():
+            for key, value in agent_infos.items():
+                self.add_log(key + str(agent_id), value)
+
+    def _is_valid_loss(self, loss: torch.Tensor) -> bool:
+        """
+        Return whether the optimizer should step on the loss, always True unless
+        the NaN guard is enabled.
+        """
+        if not self._config._nan_guard:
+            return True
+        if torch.isfinite(loss):
+            return True
+        logging.warning(f"Skipping optimizer step, the loss is {loss.item()}")
+        return False
+
+    def _log_gradients(self, network: nn.Module):
+        if not self._config._log_gradients:
+            return
+        for name, param in network.named_parameters():
+            if param.grad is None:
+                logging.info(f"Parameter {name} has no gradient")
+                continue
+            norm = param.grad.norm().item()
+            logging.debug(f"Parameter {name} gradient norm: {norm}")
+            self.add_log(f"grad_norm/{name}", norm)
+
     @abstractmethod
     def train_step(
         self,
@@ -113,9 +151,12 @@ class Algorithm(Environment, WandB, ABC):
         Dict[AgentID, Dict[str, Any]],
     ]:
         observation, rewards, terminations, truncations, infos = self._env.step(actions)
-        rgb_array = self._render()
-        rgb_array = self._config._rendering_callback(rgb_array, observation)
-        self.log_frame(rgb_array, self._episodes_done)
+        if self.capture_frame(self._episodes_done):
+            rgb_array = self._render()
+            rgb_array = self._config._rendering_callback(rgb_array, observation)
+            self.log_frame(rgb_array, self._episodes_done)
+        elif self._env.render_mode == "human":
+            self._render()
 
         return observation, rewards, terminations, truncations, infos
 
@@ -6,6 +6,7 @@ from typing import Literal, Optional, Tuple
 import gymnasium as gym
 
 from rllib.core.network.network import NetworkType
+from rllib.core.torch.inference_server import InferenceClient
 from utils.common.callbacks import RenderingCallback, empty_rendering_callback
 
 
@@ -19,14 +20,22 @@ class AlgorithmConfig(ABC):
         self._wandb_reinit = None
         self._wandb_tags = None
         self._wandb_dir = None
+        self._wandb_backend = "wandb"
 
         self._wandb_log_interval = 1
         self._rendering_callback = empty_rendering_callback
+        self._max_frames = 256
+        self._frame_stride = 1
+        self._frame_downscale = 1
 
         self._training = False
         self._model_path = None
         self.network(network_type=NetworkType.FEED_FORWARD)
         self._eval = False
+        self._inference_backend = "eager"
+        self._inference_quantize = False
+        self._inference_client = None
+        self._inference_weights_interval = 1000
 
         self.conv_layers: Tuple[int, ...] = tuple(
             (32, 64, 64),
@@ -37,6 +46,11 @@ class AlgorithmConfig(ABC):
 
         self._lr_scheduler = None
 
+        self._debugging = None
+        self._detect_anomaly = False
+        self._nan_guard = False
+        self._log_gradients = False
+
     def network(
         self,
         network_type: NetworkType | None = None,
@@ -78,12 +92,66 @@ class AlgorithmConfig(ABC):
         self._scheduler_gamma = gamma
         return self
 
+    def inference(
+        self,
+        backend: Literal["eager", "script", "compile"] = "eager",
+        quantize: bool = False,
+        client: InferenceClient | None = None,
+        weights_interval: int = 1000,
+    ):
+        """
+        Configure the inference network used to act in eval mode, that is when
+        evaluating or when the policy is not trained.
+
+        Parameters
+        ----------
+        backend : Literal["eager", "script", "compile"]
+            Run the inference network eagerly, as TorchScript or through torch.compile
+        quantize : bool
+            Use dynamically quantized int8 linear layers (CPU only). Ignored
+            while the policy is trained, as the quantized copy would go stale
+        client : InferenceClient | None
+            Always act through an InferenceServer instead of a local network,
+            also while training. The learner pushes its weights to the server
+        weights_interval : int
+            Steps between the weights pushed to the server of the client while
+            training
+        """
+        self._inference_backend = backend
+        self._inference_quantize = quantize
+        self._inference_client = client
+        self._inference_weights_interval = weights_interval
+        return self
+
     def debugging(
         self,
         log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
         | None = None,
+        debug: bool = False,
+        detect_anomaly: bool = False,
+        nan_guard: bool = False,
+        log_gradients: bool = False,
     ):
+        """
+        Parameters
+        ----------
+        log_level : str | None
+            Logging level passed to logging.basicConfig
+        debug : bool
+            Enable every check below. They all slow down training, so they
+            are off by default.
+        detect_anomaly : bool
+            Enable torch.autograd anomaly detection while the algorithm learns
+        nan_guard : bool
+            Skip optimizer steps whose loss is NaN or infinite
+        log_gradients : bool
+            Log the gradient norm of every parameter after each backward pass,
+            and the parameters that did not receive a gradient
+        """
         self._debugging = log_level
+        self._detect_anomaly = debug or detect_anomaly
+        self._nan_guard = debug or nan_guard
+        self._log_gradients = debug or log_gradients
         logging.basicConfig(level=log_level)
         return self
 
@@ -91,9 +159,34 @@ class AlgorithmConfig(ABC):
         self,
         rendering: bool = True,
         callback: RenderingCallback = empty_rendering_callback,
+        max_frames: int = 256,
+        frame_stride: int = 1,
+        frame_downscale: int = 1,
     ):
+        """
+        Configure rendering and the frames logged as a GIF.
+
+        Frames are only rendered in episodes that are logged (see the
+        log_interval of wandb), so rendering costs nothing with logging disabled.
+
+        Parameters
+        ----------
+        rendering : bool
+            Whether rendering is enabled
+        callback : RenderingCallback
+            Applied to every logged frame
+        max_frames : int
+            Number of frames kept per logged episode, the last ones are kept
+        frame_stride : int
+            Capture every frame_stride-th step
+        frame_downscale : int
+            Keep every frame_downscale-th pixel along each axis
+        """
         self._rendering = rendering
         self._rendering_callback = callback
+        self._max_frames = max_frames
+        self._frame_stride = frame_stride
+        self._frame_downscale = frame_downscale
         return self
 
     def wandb(
@@ -104,13 +197,36 @@ class AlgorithmConfig(ABC):
         log_interval: int = 1,
         tags: list[str] = [],
         dir: str = ".",
+        backend: Literal["wandb", "local"] = "wandb",
     ):
+        """
+        Configure metric and model logging.
+
+        Parameters
+        ----------
+        project : str
+            Project name
+        run_name : str | None
+            Run name, the local backend uses a timestamp if None
+        reinit : bool
+            Whether to allow reinitializing a run in the same process
+        log_interval : int
+            Only log frames and models every log_interval episodes
+        tags : list[str]
+            Run tags
+        dir : str
+            Root directory for logged files
+        backend : Literal["wandb", "local"]
+            "wandb" logs to Weights & Biases. "local" works offline, writing
+            metrics as JSONL and models as artifacts under dir/runs/project/run_name
+        """
         self._wandb_project = project
         self._wandb_run_name = run_name
         self._wandb_reinit = reinit
         self._wandb_tags = tags
         self._wandb_dir = dir
         self._wandb_log_interval = log_interval
+        self._wandb_backend = backend
         return self
 
     def build(self) -> "AlgorithmConfig":
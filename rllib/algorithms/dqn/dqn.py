@@ -15,9 +15,12 @@ from rllib.core.memory.prioritized_replay_memory import (
     compute_td_errors,
 )
 from rllib.core.network.network import Network
+from rllib.core.torch.inference import inference_network
+from rllib.core.torch.inference_server import InferenceClient
 from rllib.core.torch.module import TorchModule
 from rllib.utils.dqn.misc import get_non_final_mask
 from rllib.utils.dqn.preprocessing import preprocess_next_observations
+from rllib.utils.network.network import hard_update, network_tensors, soft_update
 from rllib.utils.torch.processing import (
     observation_to_torch_unsqueeze,
     observations_seperate_to_torch,
@@ -51,12 +54,18 @@ class DQN(Algorithm):
         if self._config._model_path is not None:
             ModelLoader.load_model_from_path(self._config._model_path, self._policy_net)
         self._target_net.load_state_dict(self._policy_net.state_dict())
-        self._optimizer = torch.optim.AdamW(
-            self._policy_net.parameters(), lr=config.learning_rate, amsgrad=True
-        )
-        self._scheduler = self._gen_scheduler()
+        self._build_optimizer()
         self._eps_threshold = np.inf
 
+        self._inference_net: nn.Module | InferenceClient | None = None
+        self._weights_pushed_at = 0
+        if (
+            self._config._inference_client is not None
+            or self._config._eval
+            or not self._config._training
+        ):
+            self._build_inference_net()
+
     def train_step(
         self,
         observations: Dict[AgentID, ObsType],
@@ -74,22 +83,27 @@ class DQN(Algorithm):
             next_observations, terminations, truncations
         )
 
-        priority = {key: 1.0 for key in next_obs.keys()}
-
-        self._memory.add_dict(
-            keys=observations.keys(),
-            action=actions,
-            state=observations,
-            next_state=next_obs,
-            reward=rewards,
-            priority=priority,
+        keys = list(observations.keys())
+        self._memory.add_batch(
+            state=[observations[key] for key in keys],
+            action=[actions[key] for key in keys],
+            next_state=[next_obs[key] for key in keys],
+            reward=[rewards[key] for key in keys],
+            priority=[1.0] * len(keys),
         )
 
         if self._config.update_method == "soft":
             self._soft_update_target()
         else:
             self._hard_update_target()
-        self._optimize_model()
+
+        if self._steps_done < self._config.learning_starts:
+            return
+        if self._steps_done % self._config.train_frequency != 0:
+            return
+        for _ in range(self._config.gradient_steps):
+            self._optimize_model()
+        self._push_inference_weights()
 
     def log_episode(self):
         super().log_episode()
@@ -131,48 +145,106 @@ class DQN(Algorithm):
         self.add_log("learning_rate", learning_rate)
 
     def predict(self, observation: dict[AgentID, ObsType]) -> dict[AgentID, int]:
-        self._eps_threshold = self._config.eps_end + (
-            self._config.eps_start - self._config.eps_end
-        ) * np.exp(-1.0 * self._steps_done / self._config.eps_decay)
-
-        actions = self._get_policy_actions(observation)
-        for key, _ in actions.items():
-            if np.random.rand() < self._eps_threshold:
-                actions[key] = self._get_random_action()
-        return actions
+        self._update_eps_threshold()
+        return self._epsilon_greedy(self._get_policy_actions(observation))
 
     def load_model(self, model: Mapping[str, Any]):
         self._policy_net.load_state_dict(model)
         self._target_net.load_state_dict(self._policy_net.state_dict())
         self._policy_net.eval()
         self._target_net.eval()
+        if self._inference_net is not None:
+            self._build_inference_net()
 
     @property
     def model(self) -> nn.Module:
         return self._policy_net
 
-    def _gen_scheduler(self) -> torch.optim.lr_scheduler.LRScheduler | None:
+    def _build_optimizer(self):
+        """
+        Build the optimizer and scheduler for the current policy network parameters.
+        Must be called again if the parameters of the networks are replaced.
+        """
+        self._policy_tensors = network_tensors(self._policy_net)
+        self._target_tensors = network_tensors(self._target_net)
+        self._optimizer = torch.optim.AdamW(
+            self._policy_net.parameters(), lr=self._config.learning_rate, amsgrad=True
+        )
+        self._scheduler = self._gen_scheduler(self._optimizer)
+
+    def _build_inference_net(self):
+        """
+        Build the network used to act in eval mode. It shares the policy network's
+        parameters, except when quantized, then it must be rebuilt on changes.
+        """
+        if self._config._inference_client is not None:
+            self._inference_net = self._config._inference_client
+            if self._config._training:
+                # The server starts with the weights it was given, not the learner's
+                self._inference_net.update_weights(self._policy_net.state_dict())
+                self._weights_pushed_at = self._steps_done
+            return
+        quantize = self._config._inference_quantize
+        if quantize and self._config._training:
+            logging.warning("Not quantizing the inference network while training")
+            quantize = False
+        self._inference_net = inference_network(
+            self._policy_net, self._config._inference_backend, quantize
+        )
+
+    def _push_inference_weights(self):
+        """
+        Push the policy weights to the inference server of the client, every
+        weights_interval steps.
+        """
+        if self._config._inference_client is None:
+            return
+        if (
+            self._steps_done - self._weights_pushed_at
+            < self._config._inference_weights_interval
+        ):
+            return
+        self._config._inference_client.update_weights(self._policy_net.state_dict())
+        self._weights_pushed_at = self._steps_done
+
+    def _gen_scheduler(
+        self, optimizer: torch.optim.Optimizer
+    ) -> torch.optim.lr_scheduler.LRScheduler | None:
         if self._config._lr_scheduler is None:
             return
         if self._config._lr_scheduler == "cyclic":
             return torch.optim.lr_scheduler.CyclicLR(
-                self._optimizer,
+                optimizer,
                 base_lr=self._config._base_lr,
                 max_lr=self._config._max_lr,
             )
         if self._config._lr_scheduler == "step":
             return torch.optim.lr_scheduler.StepLR(
-                self._optimizer,
+                optimizer,
                 step_size=self._config._scheduler_step_size,
                 gamma=self._config._scheduler_gamma,
             )
 
+    def _update_eps_threshold(self):
+        self._eps_threshold = self._config.eps_end + (
+            self._config.eps_start - self._config.eps_end
+        ) * np.exp(-1.0 * self._steps_done / self._config.eps_decay)
+
+    def _epsilon_greedy(self, actions: Dict[AgentID, int]) -> Dict[AgentID, int]:
+        for key, _ in actions.items():
+            if np.random.rand() < self._eps_threshold:
+                actions[key] = self._get_random_action()
+        return actions
+
     def _get_policy_actions(
         self, observations: Dict[AgentID, ObsType]
     ) -> Dict[AgentID, int]:
         torch_observations = observations_seperate_to_torch(list(observations.values()))
-        with torch.no_grad():
-            pred_actions = self._policy_net(*torch_observations)
+        network = (
+            self._inference_net if self._inference_net is not None else self._policy_net
+        )
+        with torch.inference_mode():
+            pred_actions = network(*torch_observations)
 
         actions = {}
         for key, action in zip(observations.keys(), pred_actions):
@@ -224,8 +296,12 @@ class DQN(Algorithm):
 
         self.add_log("loss", loss.item())
 
+        if not self._is_valid_loss(loss):
+            return loss.item()
+
         self._optimizer.zero_grad()
         loss.backward()
+        self._log_gradients(self._policy_net)
         self._optimizer.step()
 
         if self._scheduler is not None:
@@ -281,17 +357,13 @@ class DQN(Algorithm):
         ).mean()
 
     def _hard_update_target(self, network: nn.Module | None = None):
-        network = network or self._policy_net
         if self._steps_done % self._config.target_update != 0:
             return
-        self._target_net.load_state_dict(network.state_dict())
+        source = self._policy_tensors if network is None else network_tensors(network)
+        hard_update(self._target_tensors, source)
 
     def _soft_update_target(self, network: nn.Module | None = None):
-        network = network or self._policy_net
-        target_net_state_dict = self._target_net.state_dict()
-        policy_net_state_dict = network.state_dict()
-        for key in policy_net_state_dict:
-            target_net_state_dict[key] = policy_net_state_dict[
-                key
-            ] * 0.005 + target_net_state_dict[key] * (1 - 0.005)
-        self._target_net.load_state_dict(target_net_state_dict)
+        if self._steps_done % self._config.soft_update_interval != 0:
+            return
+        source = self._policy_tensors if network is None else network_tensors(network)
+        soft_update(self._target_tensors, source, self._config.tau)
@@ -15,6 +15,11 @@ class DQNConfig(AlgorithmConfig):
         eps_decay: int = 1000,
         update_method: Literal["hard", "soft"] = "hard",
         target_update: int = 1000,
+        tau: float = 0.005,
+        soft_update_interval: int = 1,
+        train_frequency: int = 1,
+        gradient_steps: int = 1,
+        learning_starts: int = 0,
     ):
         super().__init__("DQN")
         self.replay_buffer_size = replay_buffer_size
@@ -26,3 +31,8 @@ class DQNConfig(AlgorithmConfig):
         self.eps_decay = eps_decay
         self.update_method = update_method
         self.target_update = target_update
+        self.tau = tau
+        self.soft_update_interval = soft_update_interval
+        self.train_frequency = train_frequency
+        self.gradient_steps = gradient_steps
+        self.learning_starts = learning_starts
@@ -1,14 +1,20 @@
-from typing import Any, Dict, Mapping, SupportsFloat
+from typing import Any, Dict, List, Mapping, SupportsFloat
 
 import numpy as np
+import torch
 import torch.nn as nn
+import torch.nn.functional as F
 
 from multiworld.utils.typing import AgentID, ObsType
 from rllib.algorithms.algorithm import Algorithm
 from rllib.algorithms.algorithm_config import AlgorithmConfig
 from rllib.algorithms.dqn.dqn import DQN
 from rllib.algorithms.dqn.dqn_config import DQNConfig
+from rllib.core.memory.prioritized_replay_memory import Transition, compute_td_errors
+from rllib.core.torch.ensemble import ModuleEnsemble
+from rllib.utils.dqn.misc import get_non_final_mask
 from rllib.utils.dqn.preprocessing import preprocess_next_observations
+from rllib.utils.torch.processing import observations_seperate_to_torch
 
 
 class MDQN(Algorithm):
@@ -18,7 +24,26 @@ class MDQN(Algorithm):
         config: AlgorithmConfig,
         dqn_config: DQNConfig,
         multi_training: bool = False,
+        vectorized: bool = True,
     ):
+        """
+        Parameters
+        ----------
+        agents : int
+            Number of agents, each with its own DQN
+        config : AlgorithmConfig
+            Config of the multi-agent algorithm
+        dqn_config : DQNConfig
+            Config shared by every agent's DQN
+        multi_training : bool
+            Train every agent's network. Otherwise only the first agent is
+            trained and the others occasionally copy its weights as their target.
+        vectorized : bool
+            Stack the agents' networks into a vmapped ensemble, so acting (and
+            training, with multi_training) is one batched call for all agents.
+            The per-agent networks stay tied to the ensemble, so per-agent
+            checkpoints are saved and loaded as before.
+        """
         assert (
             dqn_config._wandb_project is None
         ), "Ups, we will only run one wandb project at a time:) So please deactivate wandb for the DQN Config and add it to the AlgorithmConfig, thank you!"
@@ -28,6 +53,10 @@ class MDQN(Algorithm):
         self._dqn_config = dqn_config
         self._dqns = {key: DQN(dqn_config) for key in range(agents)}
 
+        self._vectorized = vectorized
+        if vectorized:
+            self._build_ensemble()
+
     def train_step(
         self,
         observations: Dict[AgentID, ObsType],
@@ -57,7 +86,12 @@ class MDQN(Algorithm):
                 priority=priority,
             )
 
-        self._optimize_model()
+        if (
+            self._steps_done >= self._dqn_config.learning_starts
+            and self._steps_done % self._dqn_config.train_frequency == 0
+        ):
+            for _ in range(self._dqn_config.gradient_steps):
+                self._optimize_model()
         self._hard_update_target()
 
     def log_episode(self):
@@ -104,6 +138,9 @@ class MDQN(Algorithm):
             self.add_log(f"eps_threshold_{key}", self._dqns[key]._eps_threshold)
 
     def predict(self, observation: Dict[AgentID, ObsType]) -> Dict[AgentID, int]:
+        if self._vectorized:
+            return self._predict_ensemble(observation)
+
         actions = {}
         for key in self._dqns.keys():
             action = self._dqns[key].predict({key: observation[key]})
@@ -122,6 +159,10 @@ class MDQN(Algorithm):
         return self._dqns[key].model
 
     def _optimize_model(self):
+        if self._vectorized and self._multi_training:
+            self._optimize_ensemble()
+            return
+
         losses = {}
 
         if self._multi_training:
@@ -154,3 +195,115 @@ class MDQN(Algorithm):
     def _soft_update_target(self):
         for key in self._dqns.keys():
             self._dqns[key]._soft_update_target()
+
+    def _build_ensemble(self):
+        dqns = list(self._dqns.values())
+        self._policy_ensemble = ModuleEnsemble([dqn._policy_net for dqn in dqns])
+        self._target_ensemble = ModuleEnsemble([dqn._target_net for dqn in dqns])
+        # The networks' parameters are now views into the ensemble
+        for dqn in dqns:
+            dqn._build_optimizer()
+            if dqn._inference_net is not None:
+                dqn._build_inference_net()
+
+        self._optimizer = torch.optim.AdamW(
+            self._policy_ensemble.parameters(),
+            lr=self._dqn_config.learning_rate,
+            amsgrad=True,
+        )
+        self._scheduler = dqns[0]._gen_scheduler(self._optimizer)
+
+    def _predict_ensemble(
+        self, observation: Dict[AgentID, ObsType]
+    ) -> Dict[AgentID, int]:
+        keys = list(self._dqns.keys())
+        torch_observations = observations_seperate_to_torch(
+            [observation[key] for key in keys]
+        )
+        with torch.no_grad():
+            q_values = self._policy_ensemble(
+                *[obs.unsqueeze(1) for obs in torch_observations]
+            )
+        policy_actions = q_values.squeeze(1).argmax(-1).tolist()
+
+        actions = {}
+        for key, action in zip(keys, policy_actions):
+            self._dqns[key]._update_eps_threshold()
+            actions.update(self._dqns[key]._epsilon_greedy({key: action}))
+        return actions
+
+    def _optimize_ensemble(self):
+        batch_size = self._dqn_config.batch_size
+        dqns = list(self._dqns.values())
+        if any(len(dqn._memory) < batch_size for dqn in dqns):
+            return
+
+        samples = [dqn._memory.sample(batch_size) for dqn in dqns]
+        batches = [Transition(*zip(*transitions)) for transitions, _ in samples]
+
+        # Final next states are replaced by the current state and masked out,
+        # so every agent's batch has the same shape
+        non_final_mask = torch.tensor(
+            [get_non_final_mask(batch.next_state) for batch in batches]
+        )
+        next_states = [
+            [
+                next_state if next_state is not None else state
+                for state, next_state in zip(batch.state, batch.next_state)
+            ]
+            for batch in batches
+        ]
+        state_batch = self._stack_observations([batch.state for batch in batches])
+        next_state_batch = self._stack_observations(next_states)
+        action_batch = torch.tensor([batch.action for batch in batches]).unsqueeze(-1)
+        reward_batch = torch.tensor(
+            [batch.reward for batch in batches], dtype=torch.float32
+        )
+
+        state_action_values = self._policy_ensemble(*state_batch).gather(
+            2, action_batch
+        )
+        with torch.no_grad():
+            next_state_actions = self._policy_ensemble(*next_state_batch).argmax(
+                2, keepdim=True
+            )
+            next_state_values = (
+                self._target_ensemble(*next_state_batch)
+                .gather(2, next_state_actions)
+                .squeeze(2)
+            )
+        next_state_values = next_state_values * non_final_mask
+        expected_state_action_values = (
+            next_state_values * self._dqn_config.gamma + reward_batch
+        )
+
+        losses = F.smooth_l1_loss(
+            state_action_values,
+            expected_state_action_values.unsqueeze(2),
+            reduction="none",
+        ).mean(dim=(1, 2))
+        loss = losses.sum()
+
+        if not self._is_valid_loss(loss):
+            return
+
+        self._optimizer.zero_grad()
+        loss.backward()
+        self._optimizer.step()
+
+        if self._scheduler is not None:
+            self._scheduler.step()
+
+        for (_, indices), dqn, agent_loss in zip(samples, dqns, losses.tolist()):
+            dqn._memory.update_priorities(
+                indices=indices, priorities=compute_td_errors(agent_loss, batch_size)
+            )
+
+    def _stack_observations(
+        self, observations: List[List[ObsType]]
+    ) -> List[torch.Tensor]:
+        """
+        Stack a batch of observations per agent into tensors of shape (agents, batch, ...).
+        """
+        per_agent = [observations_seperate_to_torch(obs) for obs in observations]
+        return [torch.stack(tensors) for tensors in zip(*per_agent)]
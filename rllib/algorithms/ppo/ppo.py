@@ -1,4 +1,4 @@
-import logging
+import itertools
 from typing import Any, Dict, List, Mapping, SupportsFloat, Tuple
 
 import torch
@@ -8,25 +8,18 @@ from multiworld.utils.typing import AgentID, ObsType
 from rllib.algorithms.algorithm import Algorithm
 from rllib.algorithms.ppo.ppo_config import PPOConfig
 from rllib.core.algorithms.gae import GAE
-from rllib.core.memory.trajectory_buffer import Trajectory, TrajectoryBuffer
+from rllib.core.memory.rollout_buffer import RolloutBuffer
 from rllib.core.network.network import Network
 from rllib.core.torch.module import TorchModule
 from rllib.utils.ppo.calculations import compute_log_probs, compute_returns, ppo_loss
 from rllib.utils.spaces import DiscreteActionSpace
-from rllib.utils.torch.processing import (
-    leaf_value_to_torch,
-    observations_seperate_to_torch,
-    torch_stack_inner_list,
-)
-from utils.common.collections import zip_dict_list
+from rllib.utils.torch.processing import observations_seperate_to_torch
 from utils.core.wandb import LogMethod
 
 """
 PPO Paper: https://arxiv.org/abs/1707.06347
 """
 
-torch.autograd.set_detect_anomaly(True)
-
 
 class PPO(Algorithm):
     _actor_net: TorchModule
@@ -52,17 +45,18 @@ class PPO(Algorithm):
         self._actor_net = actor_network()
         self._critic_net = critic_network()
 
-        # NOTE: Remove when debug is resolved
-        for name, param in self._actor_net.named_parameters():
-            if not param.requires_grad:
-                logging.info(f"Parameter {name} requires grad: {param.requires_grad}")
-
-        self._action_logits = {}
-        self._values = {}
-        self._trajectory_buffer = TrajectoryBuffer(self._config.batch_size)
+        self._rollout_step = None
+        self._rollout_buffer = RolloutBuffer(self._config.batch_size)
+        self._gae = GAE(self._config.gamma, self._config.lambda_)
 
+        # One optimizer for both networks, the loss trains the critic through the
+        # value loss
         self._optimizer = torch.optim.AdamW(
-            self._actor_net.parameters(), lr=config.learning_rate, amsgrad=True
+            itertools.chain(
+                self._actor_net.parameters(), self._critic_net.parameters()
+            ),
+            lr=config.learning_rate,
+            amsgrad=True,
         )
 
     def train_step(
@@ -76,27 +70,23 @@ class PPO(Algorithm):
         step: int,
         infos: dict[AgentID, dict[str, Any]],
     ):
-        dones = {}
-        for key in terminations.keys():
-            dones[key] = terminations[key] or truncations[key]
-        assert len(self._values) != 0
-        assert len(self._action_logits) != 0
-
-        self._trajectory_buffer.add(
-            states=observations,
-            actions=actions,
-            action_probs={
-                key: value.clone() for key, value in self._action_logits.copy().items()
-            },
-            values={key: value.clone() for key, value in self._values.copy().items()},
-            rewards=rewards,
-            dones=dones,
-            step=step,
+        assert self._rollout_step is not None
+        torch_observations, torch_actions, log_probs, values = self._rollout_step
+        self._rollout_step = None
+
+        keys = observations.keys()
+        self._rollout_buffer.add(
+            observations=torch_observations,
+            actions=torch_actions,
+            log_probs=log_probs,
+            values=values,
+            rewards=torch.tensor([float(rewards[key]) for key in keys]),
+            dones=torch.tensor(
+                [bool(terminations[key] or truncations[key]) for key in keys]
+            ),
         )
-        self._values.clear()
-        self._action_logits.clear()
 
-        self._optimize_model()
+        self._optimize_model(next_observations)
 
     def log_episode(self):
         super().log_episode()
@@ -108,32 +98,27 @@ class PPO(Algorithm):
         )
 
     def predict(self, observation: Dict[AgentID, ObsType]) -> Dict[AgentID, int]:
-        actions, action_logits, values = self._predict(observation, requires_grad=False)
-        self._action_logits = {
-            key: value.detach() for key, value in action_logits.items()
-        }
-        self._values = {key: value.clone() for key, value in values.items()}
-        return actions
-
-    def _predict(
-        self, observation: Dict[AgentID, ObsType], requires_grad: bool = False
-    ) -> Tuple[
-        Dict[AgentID, int],
-        Dict[AgentID, torch.Tensor],
-        Dict[AgentID, torch.Tensor],
-    ]:
-        action_probabilities, policy_values = self._get_policy_values(
-            list(observation.values()), requires_grad=requires_grad
+        torch_observations = observations_seperate_to_torch(list(observation.values()))
+        action_logits, values = self._get_policy_values(torch_observations)
+
+        actions = []
+        for action_logit in action_logits:
+            action, _ = self._get_action(action_logit)
+            actions.append(action.reshape(()))
+        torch_actions = torch.stack(actions)
+        log_probs = compute_log_probs(
+            torch_actions, action_logits, continuous=self._config.continuous
+        )
+
+        self._rollout_step = (
+            torch_observations,
+            torch_actions,
+            log_probs,
+            values.view(-1),
         )
-        actions = {}
-        action_logits = {}
-        values = {}
-        for key, action_logit in zip(observation.keys(), action_probabilities):
-            action, log_prob = self._get_action(action_logit)
-            action_logits[key] = action_logit
-            actions[key] = action.item()
-            values[key] = policy_values[key]
-        return actions, action_logits, values
+        return {
+            key: action.item() for key, action in zip(observation.keys(), torch_actions)
+        }
 
     def load_model(self, models: Tuple[Mapping[str, Any], Mapping[str, Any]]):
         self._actor_net.load_state_dict(models[0])
@@ -175,9 +160,8 @@ class PPO(Algorithm):
         return action_logits, log_prob
 
     def _get_policy_values(
-        self, observations: List[ObsType], requires_grad: bool = False
-    ) -> List[Tuple[torch.Tensor, torch.Tensor]]:
-        torch_observations = observations_seperate_to_torch(observations)
+        self, torch_observations: List[torch.Tensor], requires_grad: bool = False
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
         if requires_grad:
             return self._actor_net(*torch_observations), self._critic_net(
                 *torch_observations
@@ -187,98 +171,68 @@ class PPO(Algorithm):
                 *torch_observations
             )
 
-    def _optimize_model(self):
-        if len(self._trajectory_buffer) != self._trajectory_buffer.maxlen:
+    def _optimize_model(self, next_observations: Dict[AgentID, ObsType]):
+        if not self._rollout_buffer.full:
             return
 
-        for epoch in range(self._config.epochs):
-            self._optimize_model_batch()
-        self._trajectory_buffer.clear()
-
-    def _optimize_model_batch(self):
-        mini_batch_size = self._config.mini_batch_size
-        buffer_list = list(self._trajectory_buffer)
-        self._optimize_model_minibatch(buffer_list)
-        return
-        for i in range(0, len(buffer_list), mini_batch_size):
-            batch = buffer_list[i : i + mini_batch_size]
-            self._optimize_model_minibatch(batch)
-
-    def _optimize_model_minibatch(self, trajectories: List[Trajectory]) -> float:
-        loss = 0
-        buff = []
-        for traj in trajectories:
-            if traj.step == 0:
-                if len(buff) > 1:
-                    loss += self._optimize_model_minibatch_episode(buff)
-                buff = []
-            buff.append(traj)
-        return loss
-        if len(buff) > 1:
-            loss += self._optimize_model_minibatch_episode(buff)
-        return loss
-
-    def _optimize_model_minibatch_episode(
-        self, trajectories: List[Trajectory]
-    ) -> float:
-        batch = Trajectory(*zip(*trajectories))
-
-        num_agents = len(batch.states[0].keys())
-        action_logits_batch = zip_dict_list(batch.action_probs)
-        state_batch = zip_dict_list(batch.states)
-        action_batch = zip_dict_list(batch.actions)
-        reward_batch = zip_dict_list(batch.rewards)
-        value_batch = zip_dict_list(batch.values)
-        dones = zip_dict_list(batch.dones)
-
-        # NOTE: The code is a bit confusing. So if there is an error or the algorithm doesn't work. Start here.
-        action_batch_torch = leaf_value_to_torch(action_batch)
-        log_probs = compute_log_probs(
-            torch_stack_inner_list(action_batch_torch),
-            torch_stack_inner_list(action_logits_batch),
-            continuous=self._config.continuous,
+        rollout = self._rollout_buffer.get()
+        _, last_values = self._get_policy_values(
+            observations_seperate_to_torch(list(next_observations.values()))
         )
+        last_values = last_values.view(-1)
 
-        # TODO: This can be more efficient by passing all the states at once.
-        new_action_logits = []
-        new_values = []
-        for state in batch.states:
-            _, action_logits, value = self._predict(state, requires_grad=True)
-            new_action_logits.append(action_logits)
-            new_values.append(value)
-
-        gae = GAE(
-            num_agents, len(state_batch[0]), self._config.gamma, self._config.lambda_
+        advantages = self._gae(
+            rollout.dones, rollout.rewards, rollout.values, last_values
         )
-
-        new_value_batch = zip_dict_list(new_values)
-        advantages = gae(dones, reward_batch, value_batch)
-        advantages_tensor = torch_stack_inner_list(advantages).detach()
-        normalized_advantages = (advantages_tensor - advantages_tensor.mean()) / (
-            advantages_tensor.std() + 1e-10
+        returns = compute_returns(
+            rollout.rewards, rollout.dones, self._config.gamma, last_values
+        )
+        self.add_log("advantages", float(advantages.mean()), LogMethod.AVERAGE)
+        advantages = (advantages - advantages.mean()) / (advantages.std() + 1e-10)
+
+        # Flatten (steps, agents, ...) to (steps * agents, ...)
+        observations = [o.flatten(0, 1) for o in rollout.observations]
+        actions = rollout.actions.flatten(0, 1)
+        log_probs = rollout.log_probs.flatten(0, 1)
+        advantages = advantages.flatten(0, 1)
+        returns = returns.flatten(0, 1)
+
+        num_samples = len(actions)
+        mini_batch_size = self._config.mini_batch_size or num_samples
+        for epoch in range(self._config.epochs):
+            permutation = torch.randperm(num_samples)
+            for start in range(0, num_samples, mini_batch_size):
+                indices = permutation[start : start + mini_batch_size]
+                self._optimize_model_minibatch(
+                    [o[indices] for o in observations],
+                    actions[indices],
+                    log_probs[indices],
+                    advantages[indices],
+                    returns[indices],
+                )
+        self._rollout_buffer.clear()
+
+    def _optimize_model_minibatch(
+        self,
+        observations: List[torch.Tensor],
+        actions: torch.Tensor,
+        log_probs: torch.Tensor,
+        advantages: torch.Tensor,
+        returns: torch.Tensor,
+    ) -> float:
+        action_logits, values = self._get_policy_values(
+            observations, requires_grad=True
         )
-
-        average_advantages = float(torch.mean(torch_stack_inner_list(advantages)))
-        self.add_log("advantages", average_advantages, LogMethod.AVERAGE)
-
-        new_action_logits_batch = zip_dict_list(new_action_logits)
         new_log_probs = compute_log_probs(
-            torch_stack_inner_list(action_batch_torch),
-            torch_stack_inner_list(new_action_logits_batch),
-            continuous=self._config.continuous,
+            actions, action_logits, continuous=self._config.continuous
         )
-        reward_batch = torch_stack_inner_list(leaf_value_to_torch(reward_batch))
-        new_value_batch = torch_stack_inner_list(new_value_batch)
-        value_batch = torch_stack_inner_list(value_batch)
-
-        returns = compute_returns(reward_batch, self._config.gamma)
 
         policy_loss, value_loss, entropy_loss = ppo_loss(
             log_probs,
             new_log_probs,
-            normalized_advantages,
-            new_value_batch.view(-1),
-            returns.view(-1),
+            advantages,
+            values.view(-1),
+            returns,
             self._config.epsilon,
         )
 
@@ -294,27 +248,13 @@ class PPO(Algorithm):
 
         self.add_log("loss", loss.item(), LogMethod.AVERAGE)
 
-        if torch.isinf(loss) or torch.isnan(loss):
-            logging.info(
-                "WOOOW the loss is really high (or nan)... I think we will skip this one for now. Please check this part of the code:)"
-            )
+        if not self._is_valid_loss(loss):
             return loss.item()
 
-        """
-        self._optimizer.zero_grad()
-        policy_loss.backward()
-        self._optimizer.step()
-
-        self._optimizer.zero_grad()
-        value_loss.backward()
-        self._optimizer.step()
-        """
-
         self._optimizer.zero_grad()
         loss.backward()
-        for name, param in self._actor_net.named_parameters():
-            if param.grad is None:
-                logging.info(f"{name}: {param.grad}")
+        self._log_gradients(self._actor_net)
+        self._log_gradients(self._critic_net)
         self._optimizer.step()
 
         return loss.item()
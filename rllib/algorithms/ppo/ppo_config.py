@@ -6,7 +6,7 @@ class PPOConfig(AlgorithmConfig):
     def __init__(
         self,
         batch_size: int = 32,
-        mini_batch_size: int = 10,  # Depricated
+        mini_batch_size: int | None = 10,
         epochs: int = 10,
         gamma: float = 0.99,
         lambda_: float = 0.95,
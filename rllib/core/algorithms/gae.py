@@ -2,42 +2,28 @@
 source: https://nn.labml.ai/rl/ppo/gae.html
 """
 
-from typing import List
-
 import torch
 
+from rllib.utils.ppo.calculations import reverse_discounted_scan
+
 
 class GAE:
-    def __init__(self, n_workers: int, worker_steps: int, gamma: float, lambda_: float):
-        self.n_workers = n_workers
-        self.worker_steps = worker_steps
+    def __init__(self, gamma: float, lambda_: float):
         self.gamma = gamma
         self.lambda_ = lambda_
 
     def __call__(
         self,
-        done: List[List[bool]],
-        rewards: List[List[float]],
-        values: List[List[torch.Tensor]],
-    ) -> List[List[torch.Tensor]]:
-        advantages = []
-        last_advantage: List[torch.Tensor] = [
-            torch.tensor(0.0) for _ in range(self.n_workers)
-        ]
-        mask = [1.0 - d[-1] for d in done]
-        last_value = [v[-1] * mask[i] for i, v in enumerate(values)]
-
-        for t in reversed(range(self.worker_steps)):
-            mask = [1.0 - d[t] for d in done]
-            delta = [
-                rewards[i][t] + self.gamma * last_value[i] - values[i][t]
-                for i in range(self.n_workers)
-            ]
-            for i in range(self.n_workers):
-                last_advantage[i] = (
-                    delta[i] + self.gamma * self.lambda_ * last_advantage[i]
-                )
-            advantages.append(last_advantage.copy())
-            last_value = [values[i][t].clone() * mask[i] for i in range(self.n_workers)]
-        advantages = list(zip(*reversed(advantages)))
-        return advantages
+        done: torch.Tensor,
+        rewards: torch.Tensor,
+        values: torch.Tensor,
+        last_value: torch.Tensor,
+    ) -> torch.Tensor:
+        """
+        Generalized advantage estimates for tensors of shape (steps, workers).
+        last_value is the value of the state after the last step, of shape (workers,).
+        """
+        mask = 1.0 - done.float()
+        next_values = torch.cat([values[1:], last_value.unsqueeze(0)])
+        delta = rewards + self.gamma * next_values * mask - values
+        return reverse_discounted_scan(delta, self.gamma * self.lambda_ * mask)
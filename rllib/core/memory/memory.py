@@ -34,9 +34,21 @@ class Memory(Generic[T], deque):
         :param kwargs: Dictionaries for each field required by the item type.
                        Each dictionary must have the same keys as the provided `keys` parameter.
         """
+        self.add_batch(
+            **{field: [kwargs[field][key] for key in keys] for field in kwargs}
+        )
+
+    def add_batch(self, **kwargs):
+        """
+        Add multiple items to the buffer in a single call.
+
+        The fields are validated once for the whole batch instead of once per item.
+
+        :param kwargs: Sequences of values for each field required by the item type.
+                       All sequences must have the same length.
+        """
         self._validate_fields(set(kwargs.keys()))
-        for key in keys:
-            self.add(**{field: kwargs[field][key] for field in kwargs})
+        self.extend(self._make_items(kwargs))
 
     def sample(self, batch_size: int) -> Tuple[List[T], List[int]]:
         """
@@ -58,6 +70,15 @@ class Memory(Generic[T], deque):
         """
         self.clear()
 
+    def _make_items(self, fields) -> List[T]:
+        """
+        Build items from sequences of field values.
+
+        :param fields: Dictionary mapping each field name to a sequence of values.
+        """
+        columns = [fields[field] for field in self._item_type._fields]
+        return [self._item_type._make(values) for values in zip(*columns)]
+
     def _validate_fields(self, provided_fields):
         """
         Validate that the provided fields match the expected fields of the item type.
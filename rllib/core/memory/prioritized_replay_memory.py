@@ -2,6 +2,8 @@ import random
 from collections import namedtuple
 from typing import List, Tuple
 
+import numpy as np
+
 from rllib.core.memory.memory import Memory
 
 Transition = namedtuple(
@@ -19,7 +21,7 @@ class PrioritizedReplayMemory(Memory[Transition]):
         """
         super().__init__(capacity, Transition)
         self.alpha = alpha
-        self.priorities = [1.0] * capacity
+        self.priorities = np.ones(capacity)
 
     def add(self, **kwargs):
         """
@@ -31,10 +33,28 @@ class PrioritizedReplayMemory(Memory[Transition]):
             super().add(**kwargs)
             self.priorities[len(self) - 1] = priority
         else:
-            min_priority_index = self.priorities.index(min(self.priorities))
+            min_priority_index = int(np.argmin(self.priorities))
             self[min_priority_index] = self._item_type(**kwargs)
             self.priorities[min_priority_index] = priority
 
+    def add_batch(self, **kwargs):
+        """
+        Add several transitions at once. Transitions that fit are appended,
+        the rest replace the lowest priority transitions like :meth:`add`.
+        """
+        self._validate_fields(set(kwargs.keys()))
+        items = self._make_items(kwargs)
+
+        free = len(items) if self.maxlen is None else self.maxlen - len(self)
+        start = len(self)
+        self.extend(items[:free])
+        self.priorities[start : len(self)] = [item.priority for item in items[:free]]
+
+        for item in items[free:]:
+            min_priority_index = int(np.argmin(self.priorities))
+            self[min_priority_index] = item
+            self.priorities[min_priority_index] = item.priority
+
     def sample(self, batch_size: int) -> Tuple[List[Transition], List[int]]:
         """
         Sample a batch of transitions based on priorities.
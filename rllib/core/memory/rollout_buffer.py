@@ -0,0 +1,88 @@
+from collections import namedtuple
+from typing import List
+
+import torch
+
+Rollout = namedtuple(
+    "Rollout",
+    ("observations", "actions", "log_probs", "values", "rewards", "dones"),
+)
+
+
+class RolloutBuffer:
+    def __init__(self, capacity: int):
+        """
+        Initialize the rollout buffer with a fixed capacity.
+
+        Every field is stored in a single preallocated tensor of shape
+        (capacity, agents, ...), allocated on the first add.
+
+        :param capacity: Maximum number of steps to store.
+        """
+        self._capacity = capacity
+        self._size = 0
+        self._observations: List[torch.Tensor] | None = None
+        self._fields: List[torch.Tensor] | None = None
+
+    def add(
+        self,
+        observations: List[torch.Tensor],
+        actions: torch.Tensor,
+        log_probs: torch.Tensor,
+        values: torch.Tensor,
+        rewards: torch.Tensor,
+        dones: torch.Tensor,
+    ):
+        """
+        Add a single step for all agents to the buffer.
+
+        :param observations: One tensor of shape (agents, ...) per observation key.
+        :param actions: Actions of shape (agents,).
+        :param log_probs: Log probabilities of the actions of shape (agents,).
+        :param values: Value estimates of shape (agents,).
+        :param rewards: Rewards of shape (agents,).
+        :param dones: Whether each agent is done after this step, of shape (agents,).
+        :raises ValueError: If the buffer is full.
+        """
+        if self.full:
+            raise ValueError("Rollout buffer is full")
+
+        fields = (actions, log_probs, values, rewards, dones.float())
+        if self._observations is None or self._fields is None:
+            self._observations = [self._allocate(o) for o in observations]
+            self._fields = [self._allocate(f) for f in fields]
+
+        for storage, value in zip(self._observations, observations):
+            storage[self._size] = value
+        for storage, value in zip(self._fields, fields):
+            storage[self._size] = value
+        self._size += 1
+
+    def get(self) -> Rollout:
+        """
+        Return views of the stored steps, each of shape (steps, agents, ...).
+        """
+        if self._observations is None or self._fields is None:
+            raise ValueError("Rollout buffer is empty")
+        return Rollout(
+            [o[: self._size] for o in self._observations],
+            *(f[: self._size] for f in self._fields),
+        )
+
+    def clear(self):
+        """
+        Empty the buffer, keeping the allocated storage.
+        """
+        self._size = 0
+
+    @property
+    def full(self) -> bool:
+        return self._size == self._capacity
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _allocate(self, value: torch.Tensor) -> torch.Tensor:
+        return torch.empty(
+            (self._capacity, *value.shape), dtype=value.dtype, device=value.device
+        )
@@ -47,8 +47,9 @@ class ActorCriticMultiInputNetwork(TorchModule):
     def forward(
         self, x0: torch.Tensor, x1: torch.Tensor
     ) -> tuple[torch.Tensor, torch.Tensor]:
+        x0 = x0.to(torch.float32)
+        x1 = x1.to(torch.float32)
         if self._conv0 is not None:
-            x0 = x0.to(torch.float32)
             x0 = x0.permute(0, 3, 1, 2)
             x0 = self._conv0(x0)
         x0 = x0.reshape(x0.size(0), -1)
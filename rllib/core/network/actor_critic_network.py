@@ -35,8 +35,8 @@ class ActorCriticNetwork(TorchModule):
         self._critic = FCProcessor(fc0_output_size, (), 1)
 
     def forward(self, x) -> tuple[torch.Tensor, torch.Tensor]:
+        x = x.to(torch.float32)
         if self._conv0 is not None:
-            x = x.to(torch.float32)
             x = x.permute(0, 3, 1, 2)
             x = self._conv0(x)
 
@@ -42,8 +42,8 @@ class FeedForwardNetwork(TorchModule):
         self._fc_final = FCProcessor(final_input_size, hidden_units, action_dim)
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
+        x = x.float()
         if self._conv0 is not None:
-            x = x.float()
             x = x.permute(0, 3, 1, 2)
             x = self._conv0(x)
         x = x.reshape(x.size(0), -1)
@@ -45,11 +45,10 @@ class MultiInputNetwork(TorchModule):
         self._fc_final = FCProcessor(final_input_size, hidden_units, action_dim)
 
     def forward(self, x0: torch.Tensor, x1: torch.Tensor) -> torch.Tensor:
-        x = x0.clone()
-        y = x1.clone()
+        x = x0.float()
+        y = x1.float()
 
         if self._conv0 is not None:
-            x = x.float()
             x = x.permute(0, 3, 1, 2)
             x = self._conv0(x)
         x = x.reshape(x.size(0), -1)
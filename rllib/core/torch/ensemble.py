@@ -0,0 +1,62 @@
+import copy
+from typing import Dict, List
+
+import torch
+import torch.nn as nn
+
+
+class ModuleEnsemble:
+    """
+    Modules with the same architecture, evaluated together in one vmapped call.
+
+    The parameters and buffers of the modules are stacked along a new leading
+    dimension. Each module is then tied to its slice of the stacked tensors, so
+    the modules stay usable on their own: updating a module (load_state_dict,
+    an optimizer step, a target update) updates the ensemble and vice versa.
+    """
+
+    def __init__(self, modules: List[nn.Module]):
+        self._params, self._buffers = torch.func.stack_module_state(modules)
+        self._base = copy.deepcopy(modules[0]).to("meta")
+        for index, module in enumerate(modules):
+            self._tie(module, index)
+        self._size = len(modules)
+
+    def __call__(self, *inputs: torch.Tensor) -> torch.Tensor:
+        """
+        Evaluate every module on its own inputs.
+
+        Parameters
+        ----------
+        *inputs : torch.Tensor
+            Inputs of shape (ensemble size, batch, ...), where inputs[i][j] is
+            passed to module j
+
+        Returns
+        -------
+        torch.Tensor
+            Outputs of shape (ensemble size, batch, ...)
+        """
+        return torch.vmap(self._functional_call)(self._params, self._buffers, *inputs)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def parameters(self) -> List[torch.Tensor]:
+        return list(self._params.values())
+
+    def _functional_call(
+        self,
+        params: Dict[str, torch.Tensor],
+        buffers: Dict[str, torch.Tensor],
+        *inputs: torch.Tensor,
+    ) -> torch.Tensor:
+        return torch.func.functional_call(self._base, (params, buffers), inputs)
+
+    def _tie(self, module: nn.Module, index: int):
+        for name, stacked in self._params.items():
+            owner, _, attr = name.rpartition(".")
+            setattr(module.get_submodule(owner), attr, nn.Parameter(stacked[index]))
+        for name, stacked in self._buffers.items():
+            owner, _, attr = name.rpartition(".")
+            module.get_submodule(owner).register_buffer(attr, stacked[index])
@@ -0,0 +1,132 @@
+import logging
+from typing import Literal, Optional, Tuple
+
+import torch
+import torch.nn as nn
+
+from rllib.core.network.actor_critic_multi_input_network import (
+    ActorCriticMultiInputNetwork,
+)
+from rllib.core.network.feed_forward_network import FeedForwardNetwork
+from rllib.core.network.multi_input_network import MultiInputNetwork
+
+InferenceBackend = Literal["eager", "script", "compile"]
+
+
+class _GridEncoder(nn.Module):
+    """
+    Encode a batch of (batch, height, width, channels) grids into (batch, features),
+    with the convolutions of the network if it has any.
+    """
+
+    def __init__(self, conv: Optional[nn.Module]):
+        super().__init__()
+        self._has_conv = conv is not None
+        self._conv = conv if conv is not None else nn.Identity()
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        x = x.float()
+        if self._has_conv:
+            x = self._conv(x.permute(0, 3, 1, 2))
+        return x.flatten(1)
+
+
+class _FeedForwardInference(nn.Module):
+    def __init__(self, network: FeedForwardNetwork):
+        super().__init__()
+        self._grid = _GridEncoder(network._conv0)
+        self._fc0 = network._fc0
+        self._fc_final = network._fc_final
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self._fc_final(self._fc0(self._grid(x)))
+
+
+class _MultiInputInference(nn.Module):
+    def __init__(self, network: MultiInputNetwork):
+        super().__init__()
+        self._grid = _GridEncoder(network._conv0)
+        self._fc0 = network._fc0
+        self._fc_final = network._fc_final
+
+    def forward(self, x0: torch.Tensor, x1: torch.Tensor) -> torch.Tensor:
+        y = self._fc0(x1.flatten(1).float())
+        return self._fc_final(torch.cat([self._grid(x0), y], dim=1))
+
+
+class _ActorCriticMultiInputInference(nn.Module):
+    def __init__(self, network: ActorCriticMultiInputNetwork):
+        super().__init__()
+        self._grid = _GridEncoder(network._conv0)
+        self._fc0 = network._fc0
+        self._fc1 = network._fc1
+        self._actor = network._actor
+        self._critic = network._critic
+
+    def forward(
+        self, x0: torch.Tensor, x1: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        y = self._fc0(x1.flatten(1).float())
+        x = self._fc1(torch.cat([self._grid(x0), y], dim=1))
+        return self._actor(x), self._critic(x)
+
+
+_INFERENCE_MODULES = {
+    FeedForwardNetwork: _FeedForwardInference,
+    MultiInputNetwork: _MultiInputInference,
+    ActorCriticMultiInputNetwork: _ActorCriticMultiInputInference,
+}
+
+
+def inference_network(
+    network: nn.Module,
+    backend: InferenceBackend = "eager",
+    quantize: bool = False,
+) -> nn.Module:
+    """
+    Build an inference-only version of a policy network.
+
+    The result computes the same outputs as the network without autograd
+    bookkeeping. Unless quantized, it shares the network's parameters, so it
+    stays in sync with load_state_dict on the network.
+
+    Parameters
+    ----------
+    network : nn.Module
+        Policy network, left in its mode. Networks without a dedicated
+        inference module are compiled as they are
+    backend : InferenceBackend
+        "eager" runs the module as is, "script" compiles it with TorchScript and
+        "compile" with torch.compile. TorchScript is deprecated in recent torch
+        versions, so eager is the default. Falls back to eager if scripting fails,
+        torch.compile only fails on the first call
+    quantize : bool
+        Replace the linear layers of a copy of the network by dynamically
+        quantized int8 layers. CPU only, and the copy does not follow later
+        changes to the network
+
+    Returns
+    -------
+    nn.Module
+        Module with the same call signature as the network
+    """
+    inference_module = _INFERENCE_MODULES.get(type(network))
+    module = inference_module(network) if inference_module is not None else network
+
+    if quantize:
+        module = torch.ao.quantization.quantize_dynamic(
+            module, {nn.Linear}, dtype=torch.qint8
+        )
+        module.eval()
+    elif module is not network:
+        # Not module.eval(), the layers are shared with the caller's network
+        module.training = False
+
+    try:
+        if backend == "script":
+            module = torch.jit.script(module)
+        elif backend == "compile":
+            module = torch.compile(module, dynamic=False)
+    except Exception as e:
+        logging.warning(f"Could not compile the network with {backend}: {e}")
+    return module
@@ -0,0 +1,293 @@
+import logging
+import multiprocessing as mp
+import os
+import queue
+import time
+from multiprocessing.connection import Connection
+from typing import Dict, List, Mapping, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from multiworld.utils.typing import AgentID, ObsType
+from rllib.core.torch.inference import InferenceBackend, inference_network
+
+
+class InferenceClient:
+    """
+    Handle used by an environment worker to request forward passes from an
+    InferenceServer. Called like the network itself, so it can stand in for
+    it (see AlgorithmConfig.inference). A client must only be used by one
+    worker at a time.
+    """
+
+    def __init__(
+        self,
+        index: int,
+        requests: mp.Queue,
+        responses: Connection,
+        control: mp.Queue,
+    ):
+        self._index = index
+        self._requests = requests
+        self._responses = responses
+        self._control = control
+        self._request_id = 0
+        self.weights_version = 0
+
+    def __call__(
+        self, *inputs: torch.Tensor
+    ) -> torch.Tensor | Tuple[torch.Tensor, ...]:
+        outputs = self.forward([np.asarray(x) for x in inputs])
+        tensors = tuple(torch.from_numpy(output) for output in outputs)
+        return tensors[0] if len(tensors) == 1 else tensors
+
+    def forward(self, inputs: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Run the served network on a batch of inputs, each of shape (batch, ...).
+        Blocks until the server answers, and raises the error of the server if
+        the forward pass failed.
+        """
+        self._request_id += 1
+        self._requests.put((self._index, self._request_id, inputs))
+        request_id, version, outputs = self._responses.recv()
+        assert request_id == self._request_id, "Out of order inference response"
+        self.weights_version = version
+        if isinstance(outputs, Exception):
+            raise outputs
+        return outputs
+
+    def update_weights(self, state_dict: Mapping[str, torch.Tensor]):
+        """
+        Swap the weights served to all clients, like InferenceServer.update_weights.
+        Used by a learner that only holds a client.
+        """
+        _put_weights(self._control, state_dict)
+
+    def predict(self, observations: Dict[AgentID, ObsType]) -> Dict[AgentID, int]:
+        """
+        Greedy actions for the observations of every agent.
+        """
+        keys = list(observations.keys())
+        inputs = [
+            np.stack([observations[key][field] for key in keys])
+            for field in observations[keys[0]].keys()
+        ]
+        q_values = self.forward(inputs)[0]
+        return dict(zip(keys, q_values.argmax(axis=1).tolist()))
+
+
+class InferenceServer:
+    """
+    Serves a policy network to many environment workers from a single process.
+
+    Requests from all clients are batched dynamically: a batch is run as soon as
+    it holds max_batch_size rows, or max_latency seconds after its first request
+    arrived. The weights can be swapped while serving, with update_weights.
+    """
+
+    def __init__(
+        self,
+        network: nn.Module,
+        clients: int,
+        max_batch_size: int = 256,
+        max_latency: float = 0.002,
+        backend: InferenceBackend = "eager",
+        quantize: bool = False,
+        num_threads: int | None = None,
+        start_method: str | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        network : nn.Module
+            Policy network to serve, copied to the server process
+        clients : int
+            Number of clients, one per environment worker
+        max_batch_size : int
+            Maximum number of rows (agents) per forward pass
+        max_latency : float
+            Maximum time in seconds a request waits for others to batch with
+        backend : InferenceBackend
+            Backend of the inference network, see inference_network
+        quantize : bool
+            Serve a dynamically quantized int8 network
+        num_threads : int | None
+            Torch threads of the server, all cores if None
+        start_method : str | None
+            Multiprocessing start method, the platform default if None
+        """
+        context = mp.get_context(start_method)
+        self._requests = context.Queue()
+        self._control = context.Queue()
+        pipes = [context.Pipe(duplex=False) for _ in range(clients)]
+        self._clients = [
+            InferenceClient(index, self._requests, receiver, self._control)
+            for index, (receiver, _) in enumerate(pipes)
+        ]
+        self._process = context.Process(
+            target=_serve,
+            args=(
+                network,
+                self._requests,
+                self._control,
+                [sender for _, sender in pipes],
+                max_batch_size,
+                max_latency,
+                backend,
+                quantize,
+                num_threads or os.cpu_count() or 1,
+            ),
+            daemon=True,
+        )
+
+    def start(self) -> "InferenceServer":
+        self._process.start()
+        return self
+
+    def client(self, index: int) -> InferenceClient:
+        """
+        Return the client for a worker. Pass it to the worker when starting it.
+        """
+        return self._clients[index]
+
+    def update_weights(self, state_dict: Mapping[str, torch.Tensor]):
+        """
+        Swap the served weights. Batches already running finish on the old weights,
+        responses carry the version of the weights they were computed with.
+        """
+        _put_weights(self._control, state_dict)
+
+    def close(self):
+        """
+        Stop the server once it answered the requests sent before.
+        """
+        if not self._process.is_alive():
+            return
+        self._requests.put(None)
+        self._process.join()
+
+    def __enter__(self) -> "InferenceServer":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _serve(
+    network: nn.Module,
+    requests: mp.Queue,
+    control: mp.Queue,
+    responses: List[Connection],
+    max_batch_size: int,
+    max_latency: float,
+    backend: InferenceBackend,
+    quantize: bool,
+    num_threads: int,
+):
+    torch.set_num_threads(num_threads)
+    inference_net = inference_network(network, backend, quantize)
+    version = 0
+
+    stopping = False
+    while not stopping:
+        batch, stopping = _collect_batch(requests, max_batch_size, max_latency)
+
+        try:
+            while True:
+                state_dict = control.get_nowait()
+                if not _load_weights(network, state_dict):
+                    continue
+                if quantize:
+                    inference_net = inference_network(network, backend, quantize)
+                version += 1
+        except queue.Empty:
+            pass
+
+        if len(batch) == 0:
+            continue
+
+        try:
+            outputs = _forward(inference_net, [request[2] for request in batch])
+        except Exception:
+            # Run the requests one by one, so only the malformed ones fail
+            for index, request_id, request_inputs in batch:
+                try:
+                    result = _forward(inference_net, [request_inputs])
+                except Exception as e:
+                    logging.error(f"Inference request of client {index} failed: {e}")
+                    result = RuntimeError(f"Inference failed: {e!r}")
+                responses[index].send((request_id, version, result))
+            continue
+
+        start = 0
+        for index, request_id, request_inputs in batch:
+            end = start + len(request_inputs[0])
+            responses[index].send(
+                (request_id, version, [output[start:end] for output in outputs])
+            )
+            start = end
+        logging.debug(f"Served {len(batch)} requests with {start} rows")
+
+
+def _forward(
+    inference_net: nn.Module, request_inputs: List[List[np.ndarray]]
+) -> List[np.ndarray]:
+    """
+    Outputs of the concatenated inputs of the requests.
+    """
+    inputs = [
+        torch.from_numpy(np.concatenate(fields)) for fields in zip(*request_inputs)
+    ]
+    with torch.inference_mode():
+        outputs = inference_net(*inputs)
+    if isinstance(outputs, torch.Tensor):
+        outputs = (outputs,)
+    return [output.numpy() for output in outputs]
+
+
+def _load_weights(network: nn.Module, state_dict: Mapping[str, torch.Tensor]) -> bool:
+    """
+    Load the weights into the network, or keep the previous ones if they do not fit.
+    """
+    previous = {key: value.clone() for key, value in network.state_dict().items()}
+    try:
+        network.load_state_dict(state_dict)
+    except Exception as e:
+        network.load_state_dict(previous)
+        logging.error(f"Could not load the new weights, serving the previous: {e}")
+        return False
+    return True
+
+
+def _put_weights(control: mp.Queue, state_dict: Mapping[str, torch.Tensor]):
+    control.put({key: value.detach().cpu() for key, value in state_dict.items()})
+
+
+def _collect_batch(
+    requests: mp.Queue, max_batch_size: int, max_latency: float
+) -> Tuple[List[Tuple[int, int, List[np.ndarray]]], bool]:
+    """
+    Wait for a request, then gather more until the batch is full or the deadline passes.
+    A None request asks the server to stop, which is returned with the batch so far.
+    """
+    first = requests.get()
+    if first is None:
+        return [], True
+    batch = [first]
+    rows = len(first[2][0])
+    deadline = time.monotonic() + max_latency
+    while rows < max_batch_size:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            request = requests.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if request is None:
+            return batch, True
+        batch.append(request)
+        rows += len(request[2][0])
+    return batch, False
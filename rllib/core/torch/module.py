@@ -20,7 +20,7 @@ def build_conv_layers(
     conv_layers: tuple[int, ...],
 ) -> nn.Sequential:
     layers = []
-    channels = input_dim[-1]
+    channels = int(input_dim[-1])
     for hidden_dim in conv_layers:
         layers.append(
             nn.Conv2d(channels, hidden_dim, kernel_size=3, stride=1, padding=1)
@@ -35,6 +35,9 @@ def build_fc_layers(
     hidden_units: tuple[int, ...],
     output_dim: Optional[int] = None,
 ) -> nn.Sequential:
+    # Plain ints, numpy sizes from the spaces cannot be scripted
+    input_dim = int(input_dim)
+    output_dim = int(output_dim) if output_dim is not None else None
     if len(hidden_units) == 0:
         if output_dim is None:
             raise ValueError(
@@ -1,24 +1,28 @@
-from typing import List
+from typing import Iterator, List
 
 import numpy as np
 from PIL import Image
 
 
-def save_gif(frames: List[np.ndarray], file_path: str):
+def save_gif(frames: List[np.ndarray] | np.ndarray, file_path: str):
     """
-    Convert a list of frames to a gif file.
+    Convert a list of frames, or an array of shape (frames, height, width, 3), to a gif file.
+    The frames are converted to images one at a time while encoding.
     """
-    pil_images = [Image.fromarray(frame.transpose(1, 0, 2), "RGB") for frame in frames]
+    assert len(frames) > 0, "No frames to save."
 
-    assert len(pil_images) > 0, "No frames to save."
-    assert all(
-        isinstance(image, Image.Image) for image in pil_images
-    ), f"Images must be of type PIL.Image.Image, but got {pil_images}"
-
-    pil_images[0].save(
+    images = _to_images(frames)
+    first = next(images)
+    first.save(
         file_path,
         save_all=True,
-        append_images=pil_images[1:],
+        append_images=images,
         duration=100,  # Duration between frames in ms
         loop=0,  # Loop forever
     )
+
+
+def _to_images(frames: List[np.ndarray] | np.ndarray) -> Iterator[Image.Image]:
+    for frame in frames:
+        frame = np.ascontiguousarray(frame.transpose(1, 0, 2), dtype=np.uint8)
+        yield Image.fromarray(frame, "RGB")
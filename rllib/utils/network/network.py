@@ -1,3 +1,5 @@
+from typing import List
+
 import numpy as np
 import torch
 import torch.nn as nn
@@ -24,3 +26,28 @@ def action_space_check(action_space: ActionSpace):
     assert hasattr(
         action_space, "n"
     ), f"Action space must have attribute 'n', got {action_space}"
+
+
+def network_tensors(network: nn.Module) -> List[torch.Tensor]:
+    """
+    Floating point parameters and buffers of the network, in a stable order.
+    Networks with the same architecture return matching lists.
+    """
+    tensors = [*network.parameters(), *network.buffers()]
+    return [tensor for tensor in tensors if tensor.is_floating_point()]
+
+
+@torch.no_grad()
+def hard_update(target: List[torch.Tensor], source: List[torch.Tensor]):
+    """
+    Copy the source tensors into the target tensors in place.
+    """
+    torch._foreach_copy_(target, source)
+
+
+@torch.no_grad()
+def soft_update(target: List[torch.Tensor], source: List[torch.Tensor], tau: float):
+    """
+    Polyak update in place: target = tau * source + (1 - tau) * target.
+    """
+    torch._foreach_lerp_(target, source, tau)
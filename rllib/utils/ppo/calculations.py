@@ -33,13 +33,42 @@ def compute_log_probs(
         log_probs = dist.log_prob(actions.unsqueeze(-1)).sum(-1)
     else:
         dist = torch.distributions.Categorical(logits=action_logits)
-        log_probs = dist.log_prob(actions.unsqueeze(-1))
+        log_probs = dist.log_prob(actions)
     return log_probs
 
 
-def compute_returns(rewards: torch.Tensor, gamma: float) -> torch.Tensor:
-    returns = torch.zeros_like(rewards).float()
-    returns[:, -1] = rewards[:, -1]
-    for t in reversed(range(rewards.size(1) - 1)):
-        returns[:, t] = rewards[:, t] + gamma * returns[:, t + 1]
-    return returns
+def compute_returns(
+    rewards: torch.Tensor,
+    dones: torch.Tensor,
+    gamma: float,
+    last_value: torch.Tensor | None = None,
+) -> torch.Tensor:
+    """
+    Discounted returns of shape (steps, agents), reset after every done.
+    The return after the last step is bootstrapped with last_value, if given.
+    """
+    discounts = gamma * (1.0 - dones.float())
+    rewards = rewards.float().clone()
+    if last_value is not None:
+        rewards[-1] += discounts[-1] * last_value
+    return reverse_discounted_scan(rewards, discounts)
+
+
+def reverse_discounted_scan(
+    values: torch.Tensor, discounts: torch.Tensor
+) -> torch.Tensor:
+    """
+    Solve out[t] = values[t] + discounts[t] * out[t + 1] backwards over the first
+    dimension, with out[T] = 0.
+
+    The recurrence is associative, so it is evaluated as a parallel (Hillis-Steele)
+    scan. That takes log2(T) tensor operations instead of a Python loop over T.
+    """
+    out = values.clone()
+    discounts = discounts.clone()
+    offset = 1
+    while offset < out.shape[0]:
+        out[:-offset] = out[:-offset] + discounts[:-offset] * out[offset:]
+        discounts[:-offset] = discounts[:-offset] * discounts[offset:]
+        offset *= 2
+    return out
@@ -39,14 +39,23 @@ def observation_to_torch(
     requires_grad: bool = False,
 ) -> list[torch.Tensor]:
     """
-    Convert a dictionary of observations to a list of torch tensors
+    Convert a dictionary of observations to a list of torch tensors.
+    Integer observations keep their (compact) dtype, the networks convert them
+    to float. Floating observations, and observations requiring grad, are float32.
     """
     return [
-        torch.tensor(observation[key], dtype=torch.float32, requires_grad=requires_grad)
+        value_to_torch(observation[key], requires_grad=requires_grad)
         for key in observation.keys()
     ]
 
 
+def value_to_torch(value: Any, requires_grad: bool = False) -> torch.Tensor:
+    tensor = torch.as_tensor(value)
+    if requires_grad or tensor.is_floating_point():
+        return tensor.to(torch.float32).requires_grad_(requires_grad)
+    return tensor
+
+
 def observation_to_torch_unsqueeze(
     observation: ObsType,
 ) -> torch.Tensor:
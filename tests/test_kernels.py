@@ -0,0 +1,176 @@
+import numpy as np
+import pytest
+
+from multiworld.multigrid.envs.go_to_goal import GoToGoalEnv
+from multiworld.multigrid.envs.tag import TagEnv
+from multiworld.multigrid.utils.observation import (
+    WALL,
+    apply_vis_mask,
+    gen_agent_views,
+    gen_obs_grid_encoding,
+    get_vis_mask,
+    insert_agents,
+    ohe_grid_encoding,
+)
+from multiworld.multigrid.utils.ohe import N_COLORS, N_STATES, N_TYPES
+from multiworld.multigrid.utils.preprocessing import (
+    OBSERVATION_DTYPE,
+    PreprocessingEnum,
+)
+from multiworld.swarm.utils.observation import pairwise_distances
+from multiworld.utils.jit import KernelBackend
+
+numpy, numba = KernelBackend.numpy, KernelBackend.numba
+
+
+def _raw_encodings(rng: np.random.Generator, shape) -> np.ndarray:
+    """
+    Random (type, color, state) encodings the one-hot encoding supports.
+    """
+    return np.stack(
+        [
+            rng.integers(0, N_TYPES, shape),
+            rng.integers(0, N_COLORS, shape),
+            rng.integers(0, N_STATES, shape),
+        ],
+        axis=-1,
+    ).astype(OBSERVATION_DTYPE)
+
+
+def _agent_states(rng: np.random.Generator, agents: int, size: int) -> np.ndarray:
+    """
+    Random agent states, with positions on, next to and outside the grid.
+    """
+    env = GoToGoalEnv(agents=agents, width=size, height=size, render_mode="rgb_array")
+    state = np.asarray(env._agent_states).copy()
+    env.close()
+    state[:, 2] = rng.integers(0, 4, agents)
+    state[:, 3:5] = rng.integers(-3, size + 3, (agents, 2))
+    return state
+
+
+@pytest.mark.parametrize("preprocessing", list(PreprocessingEnum))
+def test_ohe_grid_encoding(preprocessing):
+    rng = np.random.default_rng(0)
+    grid = _raw_encodings(rng, (15, 11))
+    expected = ohe_grid_encoding(grid, preprocessing, backend=numpy)
+    np.testing.assert_array_equal(
+        ohe_grid_encoding(grid, preprocessing, backend=numba), expected
+    )
+
+    # Masked updates of a previous encoding
+    changed = _raw_encodings(rng, (15, 11))
+    mask = rng.random((15, 11)) < 0.3
+    grid[mask] = changed[mask]
+    outs = [
+        ohe_grid_encoding(
+            grid, preprocessing, out=expected.copy(), mask=mask, backend=b
+        )
+        for b in (numpy, numba)
+    ]
+    np.testing.assert_array_equal(outs[1], outs[0])
+
+
+@pytest.mark.parametrize("preprocessing", list(PreprocessingEnum))
+@pytest.mark.parametrize("view_size", [3, 5, 7])
+def test_agent_views(preprocessing, view_size):
+    rng = np.random.default_rng(view_size)
+    grid = ohe_grid_encoding(_raw_encodings(rng, (12, 9)), preprocessing)
+    state = _agent_states(rng, 32, 10)
+    np.testing.assert_array_equal(
+        gen_agent_views(grid, state, view_size, preprocessing, numba),
+        gen_agent_views(grid, state, view_size, preprocessing, numpy),
+    )
+
+
+@pytest.mark.parametrize("wall_rate", [0.0, 0.2, 0.5, 1.0])
+@pytest.mark.parametrize("view_size", [3, 5, 7])
+def test_vis_mask(wall_rate, view_size):
+    rng = np.random.default_rng(view_size)
+    views = _raw_encodings(rng, (32, view_size, view_size))
+    walls = rng.random((32, view_size, view_size)) < wall_rate
+    views[walls, 0] = WALL
+    np.testing.assert_array_equal(
+        get_vis_mask(views, numba), get_vis_mask(views, numpy)
+    )
+    np.testing.assert_array_equal(
+        apply_vis_mask(views.copy(), False, numba),
+        apply_vis_mask(views.copy(), False, numpy),
+    )
+
+
+@pytest.mark.parametrize("agents", [1, 2, 50])
+@pytest.mark.parametrize("dtype", [np.int_, np.float64])
+def test_pairwise_distances(agents, dtype):
+    rng = np.random.default_rng(agents)
+    agent_pos = (rng.random((agents, 2)) * 500).astype(dtype)
+    np.testing.assert_allclose(
+        pairwise_distances(agent_pos, numba),
+        pairwise_distances(agent_pos, numpy),
+        rtol=1e-12,
+    )
+
+
+@pytest.mark.parametrize("env_cls", [GoToGoalEnv, TagEnv])
+@pytest.mark.parametrize("preprocessing", list(PreprocessingEnum))
+def test_rollout(env_cls, preprocessing):
+    """
+    Along a random rollout with batched actions, the observations and the moves
+    of the Numba backend equal the NumPy ones for the same state.
+    """
+    env = env_cls(
+        agents=8,
+        width=10,
+        height=10,
+        agent_view_size=5,
+        preprocessing=preprocessing,
+        batched_actions=True,
+        render_mode="rgb_array",
+    )
+    resolve_moves = env._resolve_moves
+    resolved = []
+
+    def _resolve_moves(movers, targets, blocked, goal):
+        # Both backends from the same state, without the success callbacks
+        # between the moves, which the real call below runs
+        view = env._agent_states._view
+        before = view.copy()
+        results = []
+        for backend in (numpy, numba):
+            view[...] = before
+            env._kernel_backend = backend
+            goals = list(resolve_moves(movers, targets, blocked, goal))
+            results.append((goals, view.copy()))
+        view[...] = before
+        env._kernel_backend = numpy
+        assert results[1][0] == results[0][0]
+        np.testing.assert_array_equal(results[1][1], results[0][1])
+        resolved.append(len(movers))
+        yield from resolve_moves(movers, targets, blocked, goal)
+
+    env._resolve_moves = _resolve_moves
+    env.action_space.seed(0)
+    env.reset(seed=0)
+    for _ in range(200):
+        env.step(env.action_space.sample())
+        grid_state, agent_state = env._world.state, np.asarray(env._agent_states)
+        encodings = [
+            gen_obs_grid_encoding(
+                grid_state,
+                agent_state,
+                env._agent_view_size,
+                env._agent_see_through_walls,
+                preprocessing,
+                backend,
+            )
+            for backend in (numpy, numba)
+        ]
+        np.testing.assert_array_equal(encodings[1], encodings[0])
+        np.testing.assert_array_equal(
+            ohe_grid_encoding(insert_agents(grid_state, agent_state), preprocessing),
+            ohe_grid_encoding(
+                insert_agents(grid_state, agent_state), preprocessing, backend=numba
+            ),
+        )
+    env.close()
+    assert sum(resolved) > 0
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from multiworld.multigrid.envs.go_to_goal import GoToGoalEnv
+from multiworld.multigrid.envs.tag import TagEnv
+from multiworld.multigrid.utils.observation import gen_obs_grid_encoding
+from multiworld.multigrid.utils.preprocessing import PreprocessingEnum
+
+STEPS = 300
+
+
+def _full_observations(env) -> np.ndarray:
+    return gen_obs_grid_encoding(
+        env._world.state,
+        env._agent_states,
+        env._agent_view_size,
+        env._agent_see_through_walls,
+        env._preprocessing,
+    )
+
+
+def _check_observations(env) -> list:
+    """
+    Compare every observation the environment generates with a full regeneration
+    of the same state. Environments can change the state after generating the
+    observations of a step, like GoToGoalEnv removing the agents on a goal.
+    """
+    checked = []
+    gen_obs = env._gen_obs
+
+    def _gen_obs():
+        observations = gen_obs()
+        expected = _full_observations(env)
+        for agent, observation in observations.items():
+            np.testing.assert_array_equal(
+                observation["observation"],
+                expected[agent],
+                err_msg=f"observation {len(checked)}, agent {agent}",
+            )
+        checked.append(observations)
+        return observations
+
+    env._gen_obs = _gen_obs
+    return checked
+
+
+@pytest.mark.parametrize("env_cls", [GoToGoalEnv, TagEnv])
+@pytest.mark.parametrize("preprocessing", list(PreprocessingEnum))
+@pytest.mark.parametrize("see_through_walls", [False, True])
+@pytest.mark.parametrize("batched_actions", [False, True])
+def test_incremental_matches_full(
+    env_cls, preprocessing, see_through_walls, batched_actions
+):
+    """
+    The cached observations of a random rollout equal a full regeneration of the
+    same state, for every step and reset.
+    """
+    env = env_cls(
+        agents=4,
+        width=12,
+        height=12,
+        agent_view_size=5,
+        preprocessing=preprocessing,
+        see_through_walls=see_through_walls,
+        batched_actions=batched_actions,
+        incremental_observations=True,
+        render_mode="rgb_array",
+    )
+    assert env._observation_cache is not None
+    checked = _check_observations(env)
+    env.action_space.seed(0)
+
+    env.reset(seed=0)
+    for _ in range(STEPS):
+        _, _, terminations, truncations, _ = env.step(env.action_space.sample())
+        if all(terminations.values()) or all(truncations.values()):
+            env.reset()
+    env.close()
+    assert len(checked) > STEPS
+
+
+@pytest.mark.parametrize("preprocessing", list(PreprocessingEnum))
+def test_unchanged_observations_are_reused(preprocessing):
+    env = GoToGoalEnv(
+        agents=2,
+        width=12,
+        height=12,
+        agent_view_size=5,
+        preprocessing=preprocessing,
+        incremental_observations=True,
+        render_mode="rgb_array",
+    )
+    env.reset(seed=0)
+    first = env._observation_cache.update(env._world.state, env._agent_states)
+    second = env._observation_cache.update(env._world.state, env._agent_states)
+    for before, after in zip(first, second):
+        assert before is after
+    env.close()
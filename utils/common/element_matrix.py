@@ -1,94 +1,121 @@
-from collections import defaultdict
+from typing import Dict, Tuple
+
 import numpy as np
 from numpy.typing import NDArray
-from typing import Dict, List
 
 from utils.common.observation import Observation
 
 # TODO: Should this really be here? Or at least rename it or something.
 
+# Key of an element, its object type followed by a zero color and state
+ElementKey = Tuple[int, int, int]
+
 
 def image_to_element_matrix(
     image: NDArray, observation: NDArray, absolute: bool = False
-) -> Dict[List, NDArray]:
+) -> Dict[ElementKey, NDArray]:
     """
     Take in a image of values, and stores the corresponding value to the observation element.
+    Cells of other elements are nan.
     """
     assert (
-        image.shape == observation.shape
+        image.shape[:2] == observation.shape[:2]
     ), "Image and observation must have the same size, not {} and {}".format(
         image.shape, observation.shape
     )
-
-    width, height = image.shape[:2]
-    element_matrices = defaultdict(lambda: np.empty((width, height), dtype=object))
-
-    for y in range(height):
-        for x in range(width):
-            i = (y, x)
-            hashable_elem = tuple(observation[i])
-            hashable_elem = (hashable_elem[0], 0, 0)
-            element_matrices[hashable_elem][i] = image[i]
-            if absolute:
-                element_matrices[hashable_elem][i] = abs(image[i])
-
-    return element_matrices
+    matrices = images_to_element_matrix(
+        image[None], observation[None], average=False, absolute=absolute
+    )
+    return {key: value[0] for key, value in matrices.items()}
 
 
 def images_to_element_matrix(
     images: NDArray,
-    observations: Observation,
+    observations: Observation | NDArray,
     average: bool = True,
     absolute: bool = False,
-) -> Dict[List, NDArray]:
-    width, height, channels = images[0].shape
-    element_matrices = defaultdict(lambda: np.empty((width, height), dtype=object))
-
-    def update_dict(elems: Dict[List, NDArray]):
-        for key, value in elems.items():
-            for i, value in np.ndenumerate(value):
-                if value is None:
-                    continue
-                if element_matrices[key][i] is None:
-                    element_matrices[key][i] = list()
-                element_matrices[key][i].append(value)
-
-    for image, observation in zip(images, observations):
-        obs = np.array(observation.features[0]["image"])
-        elems = image_to_element_matrix(image, obs, absolute)
-        update_dict(elems)
-
-    def element_matrix_average(
-        element_matrices: Dict[List, NDArray],
-    ) -> Dict[List, NDArray]:
-        averaged_element_matrices = defaultdict(
-            lambda: np.full((width, height, channels), np.nan, dtype=np.float32)
-        )
-        for key in element_matrices:
-            for i, value in np.ndenumerate(element_matrices[key]):
-                if value is None:
-                    continue
-                averaged_element_matrices[key][i] = np.mean(
-                    value, axis=0, dtype=np.float32
-                )
+) -> Dict[ElementKey, NDArray]:
+    """
+    Group the values of images of shape (images, height, width, channels) by the
+    object type of the observed cells, as one grouped reduction over all images.
+
+    Parameters
+    ----------
+    observations : Observation | NDArray
+        Observations of the images, or their grids of shape (images, height, width, ...)
+        with the object type in the first channel
+    average : bool
+        Average the values of each element per cell, of shape (height, width,
+        channels). Otherwise, the values of every image, of shape (images, height,
+        width, channels)
+    absolute : bool
+        Use the absolute values
+
+    Returns
+    -------
+    Dict[ElementKey, NDArray]
+        Float32 arrays by element, nan in the cells without the element
+    """
+    images = np.asarray(images, dtype=np.float32)
+    if absolute:
+        images = np.abs(images)
+    _, height, width, channels = images.shape
 
-        return averaged_element_matrices
+    types = _observation_grids(observations)[..., 0].astype(np.int64)
+    assert (
+        types.shape == images.shape[:3]
+    ), f"Images and observations must have the same size, not {images.shape} and {types.shape}"
+    keys, elements = np.unique(types, return_inverse=True)
+    elements = elements.reshape(types.shape)
+
+    if not average:
+        matrices = {}
+        for element, key in enumerate(keys):
+            matrix = np.full(images.shape, np.nan, dtype=np.float32)
+            mask = elements == element
+            matrix[mask] = images[mask]
+            matrices[(int(key), 0, 0)] = matrix
+        return matrices
+
+    # Sums and counts of the cells of every (element, position), one bincount each
+    groups = (elements * height + np.arange(height)[:, None]) * width + np.arange(width)
+    groups = groups.reshape(-1)
+    size = len(keys) * height * width
+    counts = np.bincount(groups, minlength=size).astype(np.float32)
+    sums = np.stack(
+        [
+            np.bincount(groups, weights=images[..., c].reshape(-1), minlength=size)
+            for c in range(channels)
+        ],
+        axis=-1,
+    )
 
-    if average:
-        return element_matrix_average(element_matrices)
-    return element_matrices
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (sums / counts[:, None]).astype(np.float32)
+    means = means.reshape(len(keys), height, width, channels)
+    return {(int(key), 0, 0): means[element] for element, key in enumerate(keys)}
 
 
-def flatten_element_matrices(matrices: Dict[List, NDArray]) -> Dict[List, NDArray]:
+def flatten_element_matrices(
+    matrices: Dict[ElementKey, NDArray],
+) -> Dict[ElementKey, NDArray]:
     return {key: flatten_element_matrix(value) for key, value in matrices.items()}
 
 
 def flatten_element_matrix(matrix: NDArray) -> NDArray:
-    flat_list = []
-    for row in matrix:
-        for col in row:
-            if col is None:
-                flat_list.append(np.nan)
-                continue
-            flat_list.extend(col)
-    return np.array(flat_list, dtype=object)
+    """
+    Values of the cells with the element, of shape (values, channels).
+    """
+    values = matrix.reshape(-1, matrix.shape[-1])
+    return values[~np.isnan(values).all(axis=1)]
+
+
+def _observation_grids(observations: Observation | NDArray) -> NDArray:
+    if isinstance(observations, Observation):
+        return np.stack(
+            [
+                np.asarray(observation[0]["observation"])
+                for observation in observations[..., Observation.OBSERVATION]
+            ]
+        )
+    return np.asarray(observations)
@@ -11,3 +11,27 @@ def normalize_image(image: NDArray) -> NDArray:
 
     normalized_image = (image - min_value) / (max_value - min_value)
     return normalized_image
+
+
+# Colors of the first channels of one-hot encoded cells
+ONE_HOT_PALETTE = np.array(
+    [
+        [255, 0, 0],  # Red
+        [0, 255, 0],  # Green
+        [0, 0, 255],  # Blue
+        [255, 255, 0],  # Yellow
+        [0, 255, 255],  # Cyan
+    ],
+    dtype=np.uint8,
+)
+
+
+def one_hot_to_rgb(
+    observations: NDArray, palette: NDArray = ONE_HOT_PALETTE
+) -> NDArray:
+    """
+    RGB images of one-hot encoded observations of shape (..., height, width, channels),
+    coloring every cell by its largest channel. Channels beyond the palette reuse its
+    colors.
+    """
+    return palette[np.argmax(observations, axis=-1) % len(palette)]
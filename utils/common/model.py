@@ -1,6 +1,4 @@
-import logging
 import os
-import re
 from typing import Dict, Literal
 
 import torch.nn as nn
@@ -13,8 +11,8 @@ from rllib.algorithms.dqn.dqn import DQN
 from rllib.algorithms.dqn.dqn_config import DQNConfig
 from rllib.core.network.network import NetworkType
 from utils.common.model_artifact import ModelArtifact
-from utils.core.model_downloader import ModelDownloader
-from utils.core.model_loader import ModelLoader
+from utils.core.checkpoint_registry import CheckpointRegistry, checkpoint_step
+from utils.core.model_downloader import ModelDownloader, build_artifact_backend
 
 
 def get_models(
@@ -23,18 +21,19 @@ def get_models(
     env: MultiWorldEnv,
     eval: bool,
     artifact_path: str = "artifacts",
-):
-    model = create_model(artifact, model_type, artifact_path, env, eval)
-
-    models = ModelLoader.load_models_from_path("artifacts", model.model)
-    return models
+    max_resident: int = 8,
+) -> CheckpointRegistry:
+    """
+    Models of all checkpoints in artifact_path, loaded lazily when accessed.
+    The architecture of each model is read from the metadata of its checkpoint.
+    """
+    _check_model_type(model_type)
+    return CheckpointRegistry.from_env(artifact_path, env, max_resident, eval)
 
 
 def get_newest_model(path: str):
     model_dirs = os.listdir(path)
-    sorted_model_dirs = sorted(
-        model_dirs, key=lambda x: int(re.search(r"\d+", x).group())
-    )
+    sorted_model_dirs = sorted(model_dirs, key=checkpoint_step)
     latest_model_dir = sorted_model_dirs[-1]
     return latest_model_dir
 
@@ -46,10 +45,13 @@ def get_latest_model(
     env: MultiWorldEnv,
     eval: bool,
 ) -> nn.Module:
-    model = create_model(artifact, model_type, artifact_path, env, eval)
+    _check_model_type(model_type)
+    return CheckpointRegistry.from_env(artifact_path, env, 1, eval).latest
 
-    model = ModelLoader.load_latest_model_from_path("artifacts", model.model)
-    return model
+
+def _check_model_type(model_type: str):
+    if model_type != "dqn":
+        raise ValueError(f"Sorry but model type of {model_type} is not supported.")
 
 
 def create_model(
@@ -96,27 +98,28 @@ def download_models(
     wandb_project_folder: str,
     artifact_path: str = os.path.join("artifacts"),
     force_update: bool = False,
+    source: str = "wandb",
+    workers: int = 4,
 ):
+    """
+    Download the checkpoints model_name_i for i in range(low, high, step). Those
+    already in artifact_path are skipped, unless force_update.
+
+    Parameters
+    ----------
+    source : str
+        "wandb", or a local directory or file:// URL mirroring the artifacts
+    workers : int
+        Artifacts downloaded at the same time
+    """
     models = [f"{model_name}_{i}:v0" for i in range(low, high, step)]
 
-    if force_update is False:
-        try:
-            artifacts = [
-                model_name.split(":")[0] for model_name in os.listdir(artifact_path)
-            ]
-            model_names = [model_name.split(":")[0] for model_name in models]
-
-            if sorted(artifacts) == sorted(model_names):
-                logging.info(
-                    "Artifacts already exists, so we do not need to download them:)"
-                )
-                return
-        except FileNotFoundError:
-            pass
-
     model_downloader = ModelDownloader(
         project_folder=wandb_project_folder,
         models=models,
         model_folder=artifact_path,
+        backend=build_artifact_backend(source, wandb_project_folder),
+        workers=workers,
+        force_update=force_update,
     )
     model_downloader.download()
@@ -21,6 +21,8 @@ class NumpyEncoder(json.JSONEncoder):
     def default(self, o):
         if isinstance(o, np.ndarray):
             return o.tolist()
+        if isinstance(o, np.generic):
+            return o.item()
         return super().default(o)
 
 
@@ -31,6 +31,8 @@ class Observation(np.ndarray):
 
 
 def observation_from_file(path: str) -> Observation:
+    if path.endswith(".npz"):
+        return observation_from_dict(observation_dicts_from_npz(path))
     assert path.endswith(".json")
     json_data = json.load(open(path))
     return observation_from_dict(json_data)
@@ -48,6 +50,29 @@ def observation_to_file(observations: Observation, path: str):
         json.dump(observations, f, indent=4, cls=NumpyEncoder)
 
 
+def observation_dicts_to_npz(observations: List[ObsType], path: str):
+    """
+    Store observations as one stacked array per observation key.
+    Much smaller and faster to load than json for the uint8 observations.
+    """
+    assert path.endswith(".npz")
+    keys = observations[0].keys() if len(observations) != 0 else []
+    np.savez(
+        path, **{key: np.stack([obs[key] for obs in observations]) for key in keys}
+    )
+
+
+def observation_dicts_from_npz(path: str) -> List[ObsType]:
+    assert path.endswith(".npz")
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+    num_observations = len(next(iter(arrays.values()))) if len(arrays) != 0 else 0
+    return [
+        {key: value[i] for key, value in arrays.items()}
+        for i in range(num_observations)
+    ]
+
+
 def observations_from_dict(data: List[Dict]) -> Observation:
     observations = []
     labels = []
@@ -167,10 +192,19 @@ def zip_observation_data(observation: Observation) -> Tuple[List, List]:
     return zipped_torch_observation_data(data), labels
 
 
+def load_observation(
+    concept: str, concept_path=os.path.join("assets", "concepts")
+) -> Observation:
+    path = os.path.join(concept_path, concept + ".npz")
+    if not os.path.exists(path):
+        path = os.path.join(concept_path, concept + ".json")
+    return observation_from_file(path)
+
+
 def load_and_split_observation(
     concept: str, split_ratio=0.8, concept_path=os.path.join("assets", "concepts")
 ) -> Tuple[Observation, Observation]:
-    observation = observation_from_file(os.path.join(concept_path, concept + ".json"))
+    observation = load_observation(concept, concept_path)
     return split_observation(observation, split_ratio)
 
 
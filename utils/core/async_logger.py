@@ -0,0 +1,281 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Literal
+
+import numpy as np
+import torch
+
+import wandb
+from rllib.utils.image import save_gif
+
+
+class LogMethod(Enum):
+    OVERWRITE = "overwrite"
+    CUMULATIVE = "cumulative"
+    AVERAGE = "average"
+
+
+class MetricAggregator:
+    """
+    Aggregates scalar metrics between commits.
+
+    Every key gets a slot in preallocated arrays the first time it is logged,
+    so adding a value is a dictionary lookup and an array update.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self._index: Dict[str, int] = {}
+        self._average = np.zeros(capacity, dtype=np.bool_)
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._counts = np.zeros(capacity, dtype=np.int64)
+        self._other: Dict[str, Any] = {}
+
+    def add(self, key: str, value: Any, method: LogMethod = LogMethod.OVERWRITE):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            self._other[key] = value
+            return
+
+        index = self._index.get(key)
+        if index is None:
+            index = self._register(key)
+
+        if method == LogMethod.OVERWRITE:
+            self._values[index] = value
+            self._counts[index] = 1
+        elif method == LogMethod.CUMULATIVE or method == LogMethod.AVERAGE:
+            self._values[index] += value
+            self._counts[index] += 1
+            self._average[index] = method == LogMethod.AVERAGE
+        else:
+            raise ValueError(f"Method {method} not recognized.")
+
+    def commit(self) -> Dict[str, Any]:
+        """
+        Return the aggregated metrics logged since the last commit, and reset them.
+        """
+        metrics = dict(self._other)
+        for key, index in self._index.items():
+            count = self._counts[index]
+            if count == 0:
+                continue
+            value = self._values[index]
+            metrics[key] = float(value / count if self._average[index] else value)
+
+        self._values[:] = 0
+        self._counts[:] = 0
+        self._other.clear()
+        return metrics
+
+    def _register(self, key: str) -> int:
+        index = len(self._index)
+        if index == len(self._values):
+            self._average = np.concatenate(
+                [self._average, np.zeros_like(self._average)]
+            )
+            self._values = np.concatenate([self._values, np.zeros_like(self._values)])
+            self._counts = np.concatenate([self._counts, np.zeros_like(self._counts)])
+        self._index[key] = index
+        return index
+
+
+@dataclass
+class ModelCheckpoint:
+    name: str
+    state_dict: Dict[str, torch.Tensor]
+    metadata: Dict
+
+
+@dataclass
+class LogRecord:
+    metrics: Dict[str, Any]
+    frames: np.ndarray | None = None
+    models: List[ModelCheckpoint] = field(default_factory=list)
+
+
+class LoggingBackend(ABC):
+    @abstractmethod
+    def log_model(self, name: str, file_path: str, metadata: Dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def log(self, metrics: Dict[str, Any], gif_path: str | None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class WandBBackend(LoggingBackend):
+    def log_model(self, name: str, file_path: str, metadata: Dict):
+        artifact = wandb.Artifact(name, type="model")
+        artifact.metadata = metadata
+        artifact.add_file(file_path)
+        wandb.log_artifact(artifact)
+
+    def log(self, metrics: Dict[str, Any], gif_path: str | None):
+        if gif_path is not None:
+            try:
+                metrics["gif"] = wandb.Image(gif_path)
+            except Exception as e:
+                logging.error(f"Error: Could not save gif: {e}")
+        wandb.log(metrics)
+
+
+class LocalBackend(LoggingBackend):
+    """
+    Offline backend, writing everything under a local run directory:
+    metrics to metrics.jsonl, GIFs to media/ and models to artifacts/ in the
+    same layout as downloaded WandB artifacts, so ModelLoader can read them.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._step = 0
+        os.makedirs(os.path.join(path, "media"), exist_ok=True)
+        os.makedirs(os.path.join(path, "artifacts"), exist_ok=True)
+        self._metrics_file = open(os.path.join(path, "metrics.jsonl"), "a")
+
+    def log_model(self, name: str, file_path: str, metadata: Dict):
+        artifacts = os.path.join(self._path, "artifacts")
+        version = sum(1 for d in os.listdir(artifacts) if d.startswith(f"{name}:v"))
+        artifact_dir = os.path.join(artifacts, f"{name}:v{version}")
+        os.makedirs(artifact_dir)
+        shutil.copy(file_path, os.path.join(artifact_dir, f"{name}.pth"))
+        with open(os.path.join(artifact_dir, "metadata.json"), "w") as f:
+            json.dump(metadata, f, default=_to_json)
+
+    def log(self, metrics: Dict[str, Any], gif_path: str | None):
+        metrics = {"_step": self._step, **metrics}
+        if gif_path is not None:
+            media_path = os.path.join("media", f"gif_{self._step}.gif")
+            shutil.copy(gif_path, os.path.join(self._path, media_path))
+            metrics["gif"] = media_path
+        self._metrics_file.write(json.dumps(metrics, default=_to_json) + "\n")
+        self._metrics_file.flush()
+        self._step += 1
+
+    def close(self):
+        self._metrics_file.close()
+
+
+class AsyncLogger:
+    """
+    Hands log records to a background thread through a bounded queue.
+
+    The worker serializes checkpoints, encodes GIFs and calls the backend, so
+    the training thread never waits on I/O. If the queue is full the record is
+    dropped with a warning instead of blocking, and counted by its kind: models,
+    frames or metrics. The counts are logged again when the logger closes.
+    """
+
+    def __init__(self, backend: LoggingBackend, queue_size: int = 16):
+        self._backend = backend
+        self._queue: queue.Queue[LogRecord | None] = queue.Queue(maxsize=queue_size)
+        self._dropped: Dict[str, int] = defaultdict(int)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def dropped(self) -> Dict[str, int]:
+        """
+        Number of dropped records by kind.
+        """
+        return dict(self._dropped)
+
+    def submit(self, record: LogRecord):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            kind = _record_kind(record)
+            self._dropped[kind] += 1
+            logging.warning(
+                f"Logging queue is full, dropped {self._dropped[kind]} {kind} "
+                "record(s) so far"
+            )
+
+    def flush(self):
+        """
+        Block until every submitted record is processed.
+        """
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._backend.close()
+        if len(self._dropped) != 0:
+            dropped = ", ".join(f"{n} {kind}" for kind, n in self._dropped.items())
+            logging.warning(f"Logging queue was full, dropped records: {dropped}")
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            try:
+                if record is None:
+                    return
+                self._process(record)
+            except Exception as e:
+                logging.error(f"Error: Could not log record: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _process(self, record: LogRecord):
+        with tempfile.TemporaryDirectory() as tmp:
+            for model in record.models:
+                file_path = os.path.join(tmp, f"{model.name}.pth")
+                torch.save(model.state_dict, file_path)
+                self._backend.log_model(model.name, file_path, model.metadata)
+
+            gif_path = None
+            if record.frames is not None:
+                gif_path = os.path.join(tmp, "episode.gif")
+                save_gif(record.frames, gif_path)
+            self._backend.log(record.metrics, gif_path)
+
+
+def build_backend(
+    backend: Literal["wandb", "local"],
+    project: str,
+    run_name: str | None,
+    dir: str | None,
+) -> LoggingBackend:
+    if backend == "wandb":
+        return WandBBackend()
+    if backend == "local":
+        run_name = run_name or datetime.now().strftime("%Y%m%d-%H%M%S")
+        return LocalBackend(os.path.join(dir or ".", "runs", project, run_name))
+    raise ValueError(f"Backend {backend} not recognized.")
+
+
+def _record_kind(record: LogRecord) -> Literal["models", "frames", "metrics"]:
+    if len(record.models) != 0:
+        return "models"
+    if record.frames is not None:
+        return "frames"
+    return "metrics"
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
@@ -0,0 +1,175 @@
+import json
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Mapping
+
+import torch
+import torch.nn as nn
+
+from multiworld.base import MultiWorldEnv
+from rllib.core.network.network import Network, NetworkType
+from rllib.utils.spaces import (
+    ActionSpace,
+    ObservationSpace,
+    build_action_space,
+    build_observation_space,
+)
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+    name: str
+    step: int
+    weights_path: str
+    metadata: Dict[str, Any]
+
+
+def checkpoint_step(name: str) -> int:
+    """
+    Training step of a checkpoint, the first number in its name, like model_300:v0.
+    """
+    match = re.search(r"\d+", name)
+    return int(match.group()) if match is not None else -1
+
+
+class CheckpointRegistry(Mapping[str, nn.Module]):
+    """
+    Checkpoints of a directory of model artifacts, loaded lazily in training order.
+
+    The artifacts are indexed once. A network is built from the metadata of its
+    checkpoint, without building an Algorithm, and its weights are memory-mapped
+    when it is first accessed. At most max_resident models are kept, the least
+    recently used ones are dropped, so a sweep over many checkpoints only holds a
+    few of them in memory at a time.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        observation_space: ObservationSpace,
+        action_space: ActionSpace,
+        max_resident: int = 8,
+        eval: bool = True,
+    ):
+        """
+        Parameters
+        ----------
+        path : str
+            Directory with one directory per artifact, holding a .pth and a metadata.json
+        observation_space : ObservationSpace
+            Observation space of an agent, shared by all checkpoints
+        action_space : ActionSpace
+            Action space of an agent, shared by all checkpoints
+        max_resident : int
+            Models kept in memory
+        eval : bool
+            Put the models in eval mode
+        """
+        assert max_resident > 0, "At least one model must be resident"
+        self._observation_space = observation_space
+        self._action_space = action_space
+        self._max_resident = max_resident
+        self._eval = eval
+
+        self._checkpoints: Dict[str, Checkpoint] = {
+            checkpoint.name: checkpoint for checkpoint in _index_checkpoints(path)
+        }
+        self._resident: OrderedDict[str, nn.Module] = OrderedDict()
+
+    @classmethod
+    def from_env(
+        cls,
+        path: str,
+        env: MultiWorldEnv,
+        max_resident: int = 8,
+        eval: bool = True,
+    ) -> "CheckpointRegistry":
+        agent_id = next(iter(env.observation_space.keys()))
+        return cls(
+            path,
+            build_observation_space(env.observation_space[agent_id]),
+            build_action_space(env.action_space[agent_id]),
+            max_resident,
+            eval,
+        )
+
+    @property
+    def checkpoints(self) -> List[Checkpoint]:
+        return list(self._checkpoints.values())
+
+    @property
+    def latest(self) -> nn.Module:
+        if len(self._checkpoints) == 0:
+            raise KeyError("No checkpoints in the registry")
+        return self[next(reversed(self._checkpoints))]
+
+    def __getitem__(self, name: str) -> nn.Module:
+        if name in self._resident:
+            self._resident.move_to_end(name)
+            return self._resident[name]
+
+        model = self._load(self._checkpoints[name])
+        self._resident[name] = model
+        if len(self._resident) > self._max_resident:
+            self._resident.popitem(last=False)
+        return model
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._checkpoints)
+
+    def __len__(self) -> int:
+        return len(self._checkpoints)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The models are loaded again from the files, instead of being pickled
+        state = self.__dict__.copy()
+        state["_resident"] = OrderedDict()
+        return state
+
+    def _load(self, checkpoint: Checkpoint) -> nn.Module:
+        network_type = checkpoint.metadata.get("network_type") or "feed_forward"
+        network = Network(
+            NetworkType(network_type.lower()),
+            self._observation_space,
+            self._action_space,
+            checkpoint.metadata.get("conv_layers"),
+            checkpoint.metadata.get("hidden_units"),
+        )
+        # Built without memory, the parameters are the memory-mapped weights
+        with torch.device("meta"):
+            model = network()
+        weights = torch.load(checkpoint.weights_path, mmap=True, weights_only=True)
+        try:
+            model.load_state_dict(weights, assign=True)
+        except RuntimeError as e:
+            raise AttributeError(
+                f"Model class does not match network of {checkpoint.name}: {e}"
+            )
+        return model.eval() if self._eval else model
+
+
+def _index_checkpoints(path: str) -> List[Checkpoint]:
+    checkpoints = []
+    for name in os.listdir(path):
+        directory = os.path.join(path, name)
+        if not os.path.isdir(directory):
+            continue
+
+        weights_path = None
+        metadata_path = None
+        for file in os.listdir(directory):
+            if file.endswith(".pth"):
+                weights_path = os.path.join(directory, file)
+            elif file.endswith("metadata.json"):
+                metadata_path = os.path.join(directory, file)
+        if weights_path is None or metadata_path is None:
+            raise ValueError(f"Model and metadata files not found in {directory}")
+
+        with open(metadata_path, "r") as f:
+            metadata = json.load(f)
+        checkpoints.append(
+            Checkpoint(name, checkpoint_step(name), weights_path, metadata)
+        )
+    return sorted(checkpoints, key=lambda checkpoint: checkpoint.step)
@@ -0,0 +1,77 @@
+import numpy as np
+
+
+class FrameCapture:
+    """
+    Decides which environment frames to keep, before they are rendered, and
+    stores the kept frames in a preallocated ring buffer.
+
+    Frames are captured every `interval` episodes, every `stride` steps within
+    the episode. Only the last `max_frames` captured frames are kept, downscaled
+    by `downscale` and stored as uint8.
+    """
+
+    def __init__(
+        self,
+        interval: int | None = None,
+        max_frames: int = 256,
+        stride: int = 1,
+        downscale: int = 1,
+    ):
+        assert max_frames > 0, f"max_frames must be positive, but got {max_frames}"
+        assert stride > 0, f"stride must be positive, but got {stride}"
+        assert downscale > 0, f"downscale must be positive, but got {downscale}"
+        self._interval = interval
+        self._max_frames = max_frames
+        self._stride = stride
+        self._downscale = downscale
+
+        self._buffer: np.ndarray | None = None
+        self._offered = 0
+        self._captured = 0
+
+    def scheduled(self, episode: int) -> bool:
+        """
+        Whether frames are captured in the episode.
+        """
+        return self._interval is None or episode % self._interval == 0
+
+    def sample(self, episode: int) -> bool:
+        """
+        Whether the frame of the current step should be rendered and captured.
+        Called once per environment step.
+        """
+        if not self.scheduled(episode):
+            return False
+        due = self._offered % self._stride == 0
+        self._offered += 1
+        return due
+
+    def add(self, frame: np.ndarray):
+        frame = np.rot90(frame)[:: self._downscale, :: self._downscale]
+        if self._buffer is None or self._buffer.shape[1:] != frame.shape:
+            self._buffer = np.empty((self._max_frames, *frame.shape), dtype=np.uint8)
+            self._captured = 0
+        if frame.dtype != np.uint8:
+            frame = np.clip(frame, 0, 255)
+        self._buffer[self._captured % self._max_frames] = frame
+        self._captured += 1
+
+    def drain(self) -> np.ndarray | None:
+        """
+        Return the captured frames in order, of shape (frames, height, width, 3),
+        and start over. Returns None if no frames were captured.
+        """
+        self._offered = 0
+        if self._buffer is None or self._captured == 0:
+            return None
+        if self._captured <= self._max_frames:
+            frames = self._buffer[: self._captured].copy()
+        else:
+            start = self._captured % self._max_frames
+            frames = np.roll(self._buffer, -start, axis=0)
+        self._captured = 0
+        return frames
+
+    def __len__(self) -> int:
+        return min(self._captured, self._max_frames)
@@ -1,13 +1,122 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
 import shutil
-import traceback
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+from urllib.parse import urlparse
 
 import torch.nn as nn
 
+import wandb
+
 from utils.core.model_loader import ModelLoader
-from utils.core.wandb import WandB
 
 
-class ModelDownloader(WandB):
+class ArtifactBackend(ABC):
+    """
+    Source of model artifacts, every artifact is a directory of files.
+    """
+
+    @abstractmethod
+    def fetch(self, name: str, version: str, destination: str) -> Dict[str, Any]:
+        """
+        Download the files of an artifact into the destination directory.
+
+        Returns
+        -------
+        Dict[str, Any]
+            Metadata of the artifact
+        """
+
+
+class WandBBackend(ArtifactBackend):
+    """
+    Artifacts of a W&B project. The API client is created by the first fetch, so
+    no W&B login is needed when every artifact is already downloaded.
+    """
+
+    def __init__(self, project_folder: str, entity: str = "eirikreiestad-ntnu"):
+        self._api: wandb.Api | None = None
+        self._run_path = f"{entity}/{project_folder}"
+        self._lock = threading.Lock()
+
+    def fetch(self, name: str, version: str, destination: str) -> Dict[str, Any]:
+        if version == "":
+            raise ValueError(f"Version of {name} cannot be empty")
+        with self._lock:
+            if self._api is None:
+                self._api = wandb.Api()
+        artifact = self._api.artifact(f"{self._run_path}/{name}:{version}")
+        artifact.download(root=destination)
+        return dict(artifact.metadata)
+
+
+class LocalBackend(ArtifactBackend):
+    """
+    Mirror of artifacts in a local directory or a file:// URL, with the layout of
+    the model folder: one name:version directory with a metadata.json per artifact.
+    """
+
+    def __init__(self, root: str):
+        self._root = urlparse(root).path if root.startswith("file://") else root
+
+    def fetch(self, name: str, version: str, destination: str) -> Dict[str, Any]:
+        source = self._resolve(name, version)
+        metadata = {}
+        for file in os.listdir(source):
+            path = os.path.join(source, file)
+            if not os.path.isfile(path):
+                continue
+            if file.endswith("metadata.json"):
+                with open(path, "r") as f:
+                    metadata = json.load(f)
+                continue
+            shutil.copyfile(path, os.path.join(destination, file))
+        return metadata
+
+    def _resolve(self, name: str, version: str) -> str:
+        path = os.path.join(self._root, f"{name}:{version}")
+        if os.path.isdir(path):
+            return path
+        if version == "latest":
+            # The highest vN version of the artifact
+            versions = [
+                directory
+                for directory in os.listdir(self._root)
+                if re.fullmatch(rf"{re.escape(name)}:v\d+", directory)
+            ]
+            if len(versions) != 0:
+                latest = max(versions, key=lambda x: int(x.rsplit(":v", 1)[1]))
+                return os.path.join(self._root, latest)
+        raise FileNotFoundError(f"Artifact {name}:{version} not found in {self._root}")
+
+
+def build_artifact_backend(source: str, project_folder: str) -> ArtifactBackend:
+    """
+    The W&B backend for source "wandb", otherwise a local mirror at the path or
+    file:// URL of source.
+    """
+    if source == "wandb":
+        return WandBBackend(project_folder)
+    return LocalBackend(source)
+
+
+class ModelDownloader:
+    """
+    Download model artifacts into the model folder, concurrently.
+
+    Artifacts already in the model folder are skipped, so an interrupted download
+    resumes with the artifacts it did not finish. The files are kept once per
+    content hash in a content store and hard linked into the model folder, so
+    identical checkpoints take space once.
+    """
+
     def __init__(
         self,
         project_folder: str,
@@ -16,28 +125,62 @@ class ModelDownloader(WandB):
         model: nn.Module | None = None,
         model_folder: str = "artifacts",
         folder_suffix: str = "",
+        backend: ArtifactBackend | None = None,
+        workers: int = 4,
+        store_path: str = os.path.join("assets", "artifact_store"),
+        force_update: bool = False,
     ):
-        self.wandb = WandB(
-            project=project_folder,
-            run_name=None,
-            reinit=True,
-            save_steps=None,
-            tags=[],
-            dir=".",
-            only_api=True,
-        )
-
-        self._clean_models(model_folder)
-
+        """
+        Parameters
+        ----------
+        models : list[str]
+            Artifacts as name:version
+        model : nn.Module | None
+            Network every downloaded artifact is verified to load into
+        backend : ArtifactBackend | None
+            Source of the artifacts, W&B of the project folder if None
+        workers : int
+            Artifacts downloaded at the same time
+        store_path : str
+            Directory of the content store and of the partial downloads
+        force_update : bool
+            Download the artifacts even if they are in the model folder
+        """
+        self._backend = backend if backend is not None else WandBBackend(project_folder)
         self._model_name = model_name
-        self._run_id = f"eirikreiestad-ntnu/{project_folder}"
         self._extract_model_names(models)
 
         self._model = model
+        self._model_folder = model_folder
         self.folder_suffix = folder_suffix
+        self._workers = workers
+        self._store_path = store_path
+        self._force_update = force_update
+
+    def download(self):
+        os.makedirs(self._model_folder, exist_ok=True)
+        for directory in ("objects", "manifests", "partial"):
+            os.makedirs(os.path.join(self._store_path, directory), exist_ok=True)
+
+        artifacts = list(zip(self._model_artifacts, self._version_numbers))
+        missing = [
+            (name, version)
+            for name, version in artifacts
+            if self._force_update
+            or not (self._is_complete(name, version) or self._adopt(name, version))
+        ]
+        logging.info(
+            f"Downloading {len(missing)} of {len(artifacts)} artifacts, "
+            f"{len(artifacts) - len(missing)} are already downloaded"
+        )
 
-    def _clean_models(self, path: str):
-        shutil.rmtree(path, ignore_errors=True)
+        with ThreadPoolExecutor(self._workers) as pool:
+            # Raises the first error after the other downloads are done
+            list(pool.map(lambda artifact: self._load_model(*artifact), missing))
+
+        self._clean_models(
+            {self._directory(name, version) for name, version in artifacts}
+        )
 
     def _extract_model_names(self, model_names: list[str]):
         model_artifacts = []
@@ -51,24 +194,137 @@ class ModelDownloader(WandB):
         self._model_artifacts = model_artifacts
         self._version_numbers = version_numbers
 
-    def download(self):
-        for model_idx in range(len(self._model_artifacts)):
-            model_artifact = self._model_artifacts[model_idx]
-            version_number = self._version_numbers[model_idx]
-            self._load_model(model_artifact, version_number)
-
-    def _load_model(self, model_artifact: str, version_number: str):
-        artifact_dir, metadata = self.wandb.download_model(
-            self._run_id, model_artifact, version_number
+    def _clean_models(self, keep: set[str]):
+        """
+        Remove the artifacts of the model folder that were not requested.
+        """
+        for directory in os.listdir(self._model_folder):
+            if directory not in keep:
+                logging.info(f"Removing artifact {directory}")
+                shutil.rmtree(
+                    os.path.join(self._model_folder, directory), ignore_errors=True
+                )
+
+    def _directory(self, name: str, version: str) -> str:
+        return f"{name}:{version}{self.folder_suffix}"
+
+    def _manifest_path(self, name: str, version: str) -> str:
+        return os.path.join(
+            self._store_path, "manifests", self._directory(name, version) + ".json"
         )
-        if artifact_dir is None or metadata is None:
-            raise Exception(
-                f"Model {artifact_dir} not found or metadata {metadata} not found, {traceback.format_exc}"
-            )
 
-        if self._model is None:
-            return
+    def _is_complete(self, name: str, version: str) -> bool:
+        """
+        Whether the artifact was committed and its files are unchanged in size.
+        """
+        try:
+            with open(self._manifest_path(name, version), "r") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return False
+
+        directory = os.path.join(self._model_folder, self._directory(name, version))
+        for file, entry in manifest["files"].items():
+            path = os.path.join(directory, file)
+            if not os.path.isfile(path) or os.path.getsize(path) != entry["size"]:
+                return False
+        return True
+
+    def _adopt(self, name: str, version: str) -> bool:
+        """
+        Add an artifact of the model folder without a manifest, like one downloaded
+        before the content store, to the store instead of downloading it again.
+        """
+        directory = os.path.join(self._model_folder, self._directory(name, version))
+        try:
+            ModelLoader.load_model_artifact_from_path(directory)
+        except (FileNotFoundError, ValueError):
+            return False
+        with open(os.path.join(directory, "metadata.json"), "r") as f:
+            metadata = json.load(f)
+        self._write_manifest(name, version, metadata, self._store_files(directory))
+        return True
+
+    def _load_model(self, name: str, version: str):
+        directory = self._directory(name, version)
+        partial = os.path.join(self._store_path, "partial", directory)
+        # Left over by an interrupted download
+        shutil.rmtree(partial, ignore_errors=True)
+        os.makedirs(partial)
+
+        metadata = self._backend.fetch(name, version, partial)
+        with open(os.path.join(partial, "metadata.json"), "w") as f:
+            json.dump(metadata, f)
+
+        files = self._store_files(partial)
+
+        if self._model is not None:
+            # Test if model is loaded correctly
+            artifact = ModelLoader.load_model_artifact_from_path(partial)
+            ModelLoader.load_model_from_artifact(artifact, copy.deepcopy(self._model))
+
+        target = os.path.join(self._model_folder, directory)
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.move(partial, target)
+
+        # Written last, it marks the artifact as complete
+        self._write_manifest(name, version, metadata, files)
+        logging.info(f"Model downloaded at: {target}")
+
+    def _write_manifest(
+        self,
+        name: str,
+        version: str,
+        metadata: Dict[str, Any],
+        files: Dict[str, Dict[str, Any]],
+    ):
+        manifest_path = self._manifest_path(name, version)
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump({"metadata": metadata, "files": files}, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    def _store_files(self, directory: str) -> Dict[str, Dict[str, Any]]:
+        files = {}
+        for root, _, names in os.walk(directory):
+            for file in names:
+                path = os.path.join(root, file)
+                files[os.path.relpath(path, directory)] = self._store(path)
+        return files
+
+    def _store(self, path: str) -> Dict[str, Any]:
+        """
+        Add a file to the content store. A file with the same content already in
+        the store replaces it, as a hard link.
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        content = digest.hexdigest()
+        size = os.path.getsize(path)
+
+        stored = os.path.join(self._store_path, "objects", content)
+        try:
+            os.link(path, stored)
+            return {"sha256": content, "size": size}
+        except FileExistsError:
+            pass
+        except OSError:
+            # The store is on another file system, or links are not supported
+            if not os.path.exists(stored):
+                shutil.copyfile(path, stored + ".tmp")
+                os.replace(stored + ".tmp", stored)
+            return {"sha256": content, "size": size}
 
-        # Test if model is loaded correctly
-        artifact = ModelLoader.load_model_artifact_from_path(artifact_dir)
-        model = ModelLoader.load_model_from_artifact(artifact, self._model)
+        if os.path.samefile(path, stored):
+            return {"sha256": content, "size": size}
+        try:
+            os.link(stored, path + ".tmp")
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass
+        finally:
+            # Left when the rename is a no-op, or the link failed halfway
+            if os.path.lexists(path + ".tmp"):
+                os.remove(path + ".tmp")
+        return {"sha256": content, "size": size}
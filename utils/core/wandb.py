@@ -1,23 +1,22 @@
-from enum import Enum
 import json
 import logging
 import os
 from abc import ABC
-from typing import Dict, Optional
-from collections import defaultdict
+from typing import Dict, List, Literal, Optional
 
 import numpy as np
-import torch
 import torch.nn as nn
 
 import wandb
-from rllib.utils.image import save_gif
-
-
-class LogMethod(Enum):
-    OVERWRITE = "overwrite"
-    CUMULATIVE = "cumulative"
-    AVERAGE = "average"
+from utils.core.async_logger import (
+    AsyncLogger,
+    LogMethod,
+    LogRecord,
+    MetricAggregator,
+    ModelCheckpoint,
+    build_backend,
+)
+from utils.core.frame_capture import FrameCapture
 
 
 class WandB(ABC):
@@ -30,45 +29,67 @@ class WandB(ABC):
         tags: list[str] | None,
         dir: str | None,
         only_api: bool = False,
+        backend: Literal["wandb", "local"] = "wandb",
+        queue_size: int = 16,
+        max_frames: int = 256,
+        frame_stride: int = 1,
+        frame_downscale: int = 1,
     ):
+        self._api = None
+        self._logger: AsyncLogger | None = None
         if project is None:
-            self._api = None
             return
 
-        self._api = wandb.Api()
-
         if only_api:
+            self._api = wandb.Api()
             return
 
-        wandb.init(
-            project=project,
-            name=run_name,
-            reinit=reinit,
-            tags=tags,
-            dir=dir,
+        if backend == "wandb":
+            wandb.init(
+                project=project,
+                name=run_name,
+                reinit=reinit,
+                tags=tags,
+                dir=dir,
+            )
+        self._logger = AsyncLogger(
+            build_backend(backend, project, run_name, dir), queue_size
         )
         self._save_steps = save_steps
 
-        self._log = {}
-        self._log_average = defaultdict(list)
-        self._artifacts = {}
-        self._frames = []
+        self._metrics = MetricAggregator()
+        self._models: List[ModelCheckpoint] = []
+        self._frame_capture = FrameCapture(
+            save_steps, max_frames, frame_stride, frame_downscale
+        )
+
+    @property
+    def logging_enabled(self) -> bool:
+        return self._logger is not None
+
+    def capture_frame(self, episode: int) -> bool:
+        """
+        Whether the frame of the current step will be logged, so it should be rendered.
+        Called once per environment step, before rendering.
+        """
+        if self._logger is None:
+            return False
+        return self._frame_capture.sample(episode)
 
     def log_frame(self, frame: Optional[np.ndarray], step: int = 0):
         """
         Logging a frame, a rendering of the environment.
         """
-        if self._api is None:
+        if self._logger is None:
             return
         if frame is None:
             return
-        if self._save_steps is not None and step % self._save_steps != 0:
+        if not self._frame_capture.scheduled(step):
             return
         assert isinstance(
             frame, np.ndarray
         ), f"Frame must be a numpy array, but got {frame}"
-        frame = np.rot90(frame)
-        self._frames.append(frame)
+        self._frame_capture.add(frame)
 
     def log_model(
         self,
@@ -77,27 +98,23 @@ class WandB(ABC):
         step: int = 0,
         metadata: Dict = {},
     ):
-        if self._api is None:
+        if self._logger is None:
             return
         if self._save_steps is not None and step % self._save_steps != 0:
             return
-        file_path = f"{model_name}.pth"
-        torch.save(model.state_dict(), file_path)
-
-        artifact = wandb.Artifact(model_name, type="model")
-        artifact.metadata = metadata
-        self._artifacts[model_name] = artifact
-        self._artifacts[model_name].add_file(file_path)
-        os.remove(file_path)
+        # Copy to the cpu, as training continues while the worker serializes it,
+        # and the parameters may be views into a larger tensor (see ModuleEnsemble)
+        state_dict = {
+            key: value.detach().to("cpu", copy=True)
+            for key, value in model.state_dict().items()
+        }
+        self._models.append(ModelCheckpoint(model_name, state_dict, dict(metadata)))
 
     def log(self, data: dict):
-        if self._api is None:
+        if self._logger is None:
             return
-        if len(self._artifacts) > 0:
-            for _, value in self._artifacts.items():
-                wandb.log_artifact(value)
-            self._artifacts.clear()
-        wandb.log(data)
+        models, self._models = self._models, []
+        self._logger.submit(LogRecord(data, models=models))
 
     def add_log(
         self,
@@ -105,17 +122,9 @@ class WandB(ABC):
         value: float,
         method: LogMethod = LogMethod.OVERWRITE,
     ):
-        if self._api is None:
+        if self._logger is None:
             return
-
-        if method == LogMethod.OVERWRITE:
-            self._log[key] = value
-        elif method == LogMethod.CUMULATIVE:
-            self._log[key] = self._log.get(key, 0) + value
-        elif method == LogMethod.AVERAGE:
-            self._log_average[key].append(value)
-        else:
-            raise ValueError(f"Method {method} not recognized.")
+        self._metrics.add(key, value, method)
 
     def download_model(
         self, run_path: str, model_artifact: str, version_number: str
@@ -144,32 +153,20 @@ class WandB(ABC):
             return None, None
 
     def commit_log(self):
-        if self._api is None:
+        """
+        Hand everything logged since the last commit to the logging worker.
+        """
+        if self._logger is None:
             return
 
-        self._commit_frames()
-
-        for key, values in self._log_average.items():
-            self._log[key] = np.mean(values)
-
-        self.log(self._log)
-        self._log.clear()
-        self._log_average.clear()
-        self._artifact = None
+        frames = self._frame_capture.drain()
+        models, self._models = self._models, []
+        self._logger.submit(LogRecord(self._metrics.commit(), frames, models))
 
-    def _commit_frames(self):
-        if len(self._frames) == 0:
+    def flush_log(self):
+        """
+        Block until the logging worker has written everything committed so far.
+        """
+        if self._logger is None:
             return
-        rint = np.random.randint(0, 30)
-        # Ok so the problem is when running multiple instances, they might overwrite teh temp.gif at the same time.
-        # So a silly way is just to give them a random number at the end (could be float, but with ints we are limited to only storing X amount of gifs at a time).
-        # This will not prevent it, but reduce the chances:)
-        # Because I am lazy to write code that works (and this is more efficient than actually deleting files)
-        gif_path = f"assets/temp_{rint}.gif"
-        save_gif(self._frames, gif_path)
-        try:
-            gif = wandb.Image(gif_path)
-            self._log["gif"] = gif
-        except Exception as e:
-            logging.error(f"Error: Could not save gif: {e}")
-        self._frames = []
+        self._logger.flush()
@@ -8,8 +8,8 @@ from multiworld.multigrid.envs.go_to_goal import GoToGoalEnv
 from multiworld.multigrid.utils.preprocessing import PreprocessingEnum
 from utils.common.observation import (
     Observation,
+    load_observation,
     observation_data_to_numpy,
-    observation_from_file,
 )
 
 logger = logging.getLogger(__name__)
@@ -23,7 +23,7 @@ def main():
         "--render-observation",
         nargs=1,
         metavar=("filename"),
-        help="Render the observations stored in json files under assets/concepts with optional arguement [filename]",
+        help="Render the observations stored in npz or json files under assets/concepts with optional arguement [filename]",
     )
 
     args = parser.parse_args()
@@ -34,16 +34,11 @@ def main():
         logger.info("No valid arguments provided.")
         return
 
-    path = os.path.join("assets", "concepts", filename)
+    concept = os.path.splitext(filename)[0]
+    render(load_observation(concept, os.path.join("assets", "concepts")))
 
-    if not path.endswith(".json"):
-        path += ".json"
 
-    render(path)
-
-
-def render(filename: str):
-    observation: Observation = observation_from_file(filename)
+def render(observation: Observation):
     numpy_obs = observation_data_to_numpy(observation)
     grid = numpy_obs[0][0]
     width, height = grid.shape[:2]
@@ -0,0 +1,190 @@
+import logging
+import os
+from typing import Dict, List, Mapping, Sequence
+
+import numpy as np
+import torch
+import torch.nn as nn
+from numpy.typing import NDArray
+
+from xailib.common.processes import process_pool, worker_count
+
+
+class ShapAttributions:
+    """
+    SHAP attributions of model outputs to the inputs, with expected gradients as in
+    shap.GradientExplainer.
+
+    An attribution is the mean of grad f(z) * (x - x') over samples of a background
+    observation x' and a point z = x' + t (x - x') with t uniform in [0, 1]. The
+    samples of a batch of observations are evaluated as one forward and backward
+    pass, and the background set is kept as tensors for every batch and model.
+    """
+
+    def __init__(
+        self,
+        background: Sequence[NDArray | torch.Tensor],
+        samples: int = 200,
+        batch_size: int = 32,
+        output: int | None = None,
+        seed: int = 0,
+    ):
+        """
+        Parameters
+        ----------
+        background : Sequence[NDArray | torch.Tensor]
+            Background observations, one array of shape (background, ...) per model
+            input
+        samples : int
+            Expected gradient samples per observation
+        batch_size : int
+            Observations per forward and backward pass, of batch_size * samples rows
+        output : int | None
+            Output to attribute, the mean of all outputs if None
+        seed : int
+            Seed of the samples, the same for every model
+        """
+        self._background = [
+            torch.as_tensor(np.asarray(input), dtype=torch.float32)
+            for input in background
+        ]
+        self._samples = samples
+        self._batch_size = batch_size
+        self._output = output
+        self._seed = seed
+
+    def attribute(
+        self,
+        model: nn.Module,
+        inputs: Sequence[NDArray | torch.Tensor],
+        path: str | None = None,
+    ) -> List[NDArray[np.float32]]:
+        """
+        Attributions of the observations, one array of the shape of each input.
+
+        Parameters
+        ----------
+        inputs : Sequence[NDArray | torch.Tensor]
+            Observations, one array of shape (observations, ...) per model input
+        path : str | None
+            Prefix of memory-mapped .npy files the attributions of input i are
+            written to, as {path}_{i}.npy. In memory if None
+        """
+        inputs = [np.asarray(input, dtype=np.float32) for input in inputs]
+        attributions = [
+            (
+                np.lib.format.open_memmap(
+                    f"{path}_{i}.npy", mode="w+", dtype=np.float32, shape=input.shape
+                )
+                if path is not None
+                else np.empty(input.shape, dtype=np.float32)
+            )
+            for i, input in enumerate(inputs)
+        ]
+
+        rng = np.random.default_rng(self._seed)
+        for start in range(0, len(inputs[0]), self._batch_size):
+            end = min(start + self._batch_size, len(inputs[0]))
+            batch = [torch.from_numpy(input[start:end]) for input in inputs]
+            for attribution, batch_attribution in zip(
+                attributions, self._attribute_batch(model, batch, rng)
+            ):
+                attribution[start:end] = batch_attribution
+
+        for attribution in attributions:
+            if isinstance(attribution, np.memmap):
+                attribution.flush()
+        return attributions
+
+    def attribute_checkpoints(
+        self,
+        models: Mapping[str, nn.Module],
+        inputs: Sequence[NDArray | torch.Tensor],
+        directory: str,
+        workers: int | None = None,
+    ) -> Dict[str, List[str]]:
+        """
+        Attributions of the observations for every checkpoint, written to
+        memory-mapped .npy files in directory, one checkpoint per task of a process
+        pool.
+
+        Returns
+        -------
+        Dict[str, List[str]]
+            Paths of the attributions of each input, by checkpoint name. They can be
+            opened with np.load(path, mmap_mode="r")
+        """
+        os.makedirs(directory, exist_ok=True)
+        inputs = [np.asarray(input, dtype=np.float32) for input in inputs]
+        names = list(models.keys())
+        paths = [os.path.join(directory, name.replace(":", "_")) for name in names]
+
+        workers = worker_count(workers, len(names))
+        if workers <= 1:
+            for name, path in zip(names, paths):
+                self.attribute(models[name], inputs, path)
+                logging.info(f"Attributions of {name} written to {path}")
+        else:
+            with process_pool(workers, _set_engine, (self, models, inputs)) as pool:
+                for name, path in zip(
+                    names, pool.map(_attribute_checkpoint, names, paths)
+                ):
+                    logging.info(f"Attributions of {name} written to {path}")
+
+        return {
+            name: [f"{path}_{i}.npy" for i in range(len(inputs))]
+            for name, path in zip(names, paths)
+        }
+
+    def _attribute_batch(
+        self,
+        model: nn.Module,
+        batch: List[torch.Tensor],
+        rng: np.random.Generator,
+    ) -> List[NDArray[np.float32]]:
+        observations = len(batch[0])
+        shape = (observations, self._samples)
+        indices = torch.from_numpy(
+            rng.integers(0, len(self._background[0]), size=shape)
+        )
+        scales = torch.from_numpy(rng.uniform(size=shape).astype(np.float32))
+
+        differences = []
+        points = []
+        for input, background in zip(batch, self._background):
+            # (observations, samples, ...) of every input
+            difference = input.unsqueeze(1) - background[indices]
+            scale = scales.reshape(shape + (1,) * (input.dim() - 1))
+            point = background[indices] + scale * difference
+            differences.append(difference)
+            points.append(
+                point.reshape((-1,) + tuple(input.shape[1:])).requires_grad_()
+            )
+
+        outputs = model(*points)
+        target = (
+            outputs.mean(dim=1) if self._output is None else outputs[:, self._output]
+        )
+        gradients = torch.autograd.grad(target.sum(), points)
+
+        return [
+            (gradient.reshape(difference.shape) * difference).mean(dim=1).numpy()
+            for gradient, difference in zip(gradients, differences)
+        ]
+
+
+_engine: ShapAttributions | None = None
+_models: Mapping[str, nn.Module] | None = None
+_inputs: List[NDArray] | None = None
+
+
+def _set_engine(
+    engine: ShapAttributions, models: Mapping[str, nn.Module], inputs: List[NDArray]
+):
+    global _engine, _models, _inputs
+    _engine, _models, _inputs = engine, models, inputs
+
+
+def _attribute_checkpoint(name: str, path: str) -> str:
+    _engine.attribute(_models[name], _inputs, path)
+    return path
@@ -1,13 +1,27 @@
+import ctypes
+import json
 import logging
+import multiprocessing as mp
 import os
-import threading
-from typing import List, Literal
+import queue
+import time
+from typing import Dict, List, Literal
+
+import numpy as np
+from numpy.typing import NDArray
 
 from multiworld.base import MultiWorldEnv
 from multiworld.multigrid.base import MultiGridEnv
-from multiworld.multigrid.utils.wrappers import MultiGridConceptObsWrapper
+from multiworld.multigrid.core.concept import ConceptDetector, get_concept_checks
+from multiworld.utils.random import RandomMixin
+from multiworld.utils.typing import ObsType
 from utils.common.model import create_model
 from utils.common.model_artifact import ModelArtifact
+from utils.common.observation import observation_dicts_to_npz
+
+# Default worker limits, each policy worker holds its own copy of the model
+MAX_WORKERS = 8
+MAX_POLICY_WORKERS = 2
 
 
 def generate_concepts(
@@ -21,7 +35,32 @@ def generate_concepts(
     artifact_path: str = os.path.join("artifacts"),
     concept_path: str = os.path.join("assets", "concepts"),
     result_dir: str = os.path.join("assets", "results"),
+    workers: int | None = None,
+    timeout: float = 300,
+    negative_sample_rate: float = 0.2,
+    seed: int = 0,
 ):
+    """
+    Generate positive and negative observations of concepts, with several worker
+    processes filling shared per-concept quotas.
+
+    With method "random", the workers reset the environment before every step,
+    sampling new environment states instead of following episodes, which finds
+    rare concepts much faster. With method "policy", they act with the model.
+
+    Parameters
+    ----------
+    workers : int | None
+        Number of worker processes. If None, one per core up to MAX_WORKERS, or
+        MAX_POLICY_WORKERS with method "policy", where every worker loads the model
+    timeout : float
+        Stop when no quota made progress for this many seconds, the concepts
+        found so far are still written
+    negative_sample_rate : float
+        Probability of keeping an observation without a concept as a negative one
+    seed : int
+        Base seed, worker i uses seed + i
+    """
     all_concepts = []
     for concept in concepts:
         all_concepts.append(concept)
@@ -36,7 +75,7 @@ def generate_concepts(
                 else existing_concepts
             )
             existing_concepts = [
-                word.rstrip(".json") if word.endswith(".json") else word
+                os.path.splitext(word)[0] if word.endswith((".json", ".npz")) else word
                 for word in existing_concepts
             ]
 
@@ -48,47 +87,249 @@ def generate_concepts(
         except FileNotFoundError:
             pass
 
-    thread = threading.Thread(
-        target=generate_concepts_thread,
-        args=(
-            concepts,
-            env,
-            observations,
-            artifact,
-            method,
-            model_type,
-            artifact_path,
-            result_dir,
-        ),
+    if not isinstance(env, MultiGridEnv):
+        raise ValueError("Only MultiGridEnv is supported for concept generation.")
+
+    concept_names = list(get_concept_checks(concepts).keys())
+    assert len(concept_names) != 0, f"No concepts to check, {concepts}"
+
+    context = mp.get_context()
+    quotas = ConceptQuotas(context, len(concept_names), observations)
+    results = context.Queue()
+    if workers is None:
+        limit = MAX_POLICY_WORKERS if method == "policy" else MAX_WORKERS
+        workers = min(os.cpu_count() or 1, limit)
+    processes = [
+        context.Process(
+            target=_generate_concepts_worker,
+            args=(
+                seed + i,
+                env,
+                concept_names,
+                quotas,
+                results,
+                method,
+                artifact,
+                model_type,
+                artifact_path,
+                negative_sample_rate,
+            ),
+            daemon=True,
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    buckets = _collect_concepts(quotas, results, processes, len(concept_names), timeout)
+
+    for process in processes:
+        process.join()
+
+    _write_concepts(
+        concept_names, buckets, quotas.samples(), observations, concept_path, result_dir
     )
-    thread.start()
-    thread.join()
 
 
-def generate_concepts_thread(
+class ConceptQuotas:
+    """
+    Per-concept quotas shared by the workers of generate_concepts.
+    Bucket 2 * i holds the positive and 2 * i + 1 the negative observations of
+    concept i.
+    """
+
+    def __init__(self, context, concepts: int, quota: int):
+        self._quota = quota
+        self._counts = context.Array(ctypes.c_int64, 2 * concepts)
+        self._samples = context.Array(ctypes.c_int64, concepts)
+        self._done = context.Event()
+
+    @property
+    def quota(self) -> int:
+        return self._quota
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def stop(self):
+        self._done.set()
+
+    def counts(self) -> NDArray[np.int64]:
+        return np.frombuffer(self._counts.get_obj(), dtype=np.int64).copy()
+
+    def samples(self) -> NDArray[np.int64]:
+        return np.frombuffer(self._samples.get_obj(), dtype=np.int64).copy()
+
+    def full(self) -> NDArray[np.bool_]:
+        return self.counts() >= self._quota
+
+    def claim(self, buckets: NDArray[np.int_]) -> NDArray[np.bool_]:
+        """
+        Claim one slot in each of the buckets, in order, while they are not full.
+        A bucket may appear several times. Returns which of the claims succeeded.
+        """
+        # Rank of each claim among the claims on the same bucket
+        order = np.argsort(buckets, kind="stable")
+        sorted_buckets = buckets[order]
+        first = np.searchsorted(sorted_buckets, sorted_buckets, side="left")
+        rank = np.empty(len(buckets), dtype=np.int64)
+        rank[order] = np.arange(len(buckets)) - first
+
+        with self._counts.get_lock():
+            counts = np.frombuffer(self._counts.get_obj(), dtype=np.int64)
+            claimed = counts[buckets] + rank < self._quota
+            counts += np.bincount(buckets[claimed], minlength=len(counts))
+            if (counts >= self._quota).all():
+                self._done.set()
+        return claimed
+
+    def add_samples(self, samples: NDArray[np.int_]):
+        with self._samples.get_lock():
+            np.frombuffer(self._samples.get_obj(), dtype=np.int64)[:] += samples
+
+
+def _generate_concepts_worker(
+    seed: int,
+    env: MultiGridEnv,
     concepts: List[str],
-    env: MultiWorldEnv,
-    observations: int,
-    artifact: ModelArtifact,
+    quotas: ConceptQuotas,
+    results: mp.Queue,
     method: Literal["random", "policy"],
+    artifact: ModelArtifact,
     model_type: Literal["dqn"],
-    artifact_path: str = os.path.join("artifacts"),
-    results_dir: str = os.path.join("assets", "results"),
+    artifact_path: str,
+    negative_sample_rate: float,
 ):
-    if not isinstance(env, MultiGridEnv):
-        raise ValueError("Only MultiGridEnv is supported for concept generation.")
-
-    eval = method == "policy"
+    # Forked workers share the random state of the parent otherwise
+    np.random.seed(seed)
+    RandomMixin.__init__(env, np.random.default_rng(seed))
 
-    env_wrapped = MultiGridConceptObsWrapper(
-        env,
-        observations=observations,
-        concepts=concepts,
-        method=method,
-        results_dir=results_dir,
+    detector = ConceptDetector(concepts, env._preprocessing)
+    model = (
+        create_model(artifact, model_type, artifact_path, env, eval=True)
+        if method == "policy"
+        else None
     )
 
-    model = create_model(artifact, model_type, artifact_path, env_wrapped, eval)
+    observations, _ = env.reset(seed=seed)
+    while not quotas.done:
+        if method == "random":
+            observations, _ = env.reset()
+        actions = (
+            model.predict(observations)
+            if model is not None
+            else {
+                agent_id: np.random.randint(env.action_space[agent_id].n)
+                for agent_id in observations.keys()
+            }
+        )
+        observations, _, terminations, truncations, _ = env.step(actions)
+
+        agent_ids = list(observations.keys())
+        views = [observations[agent_id] for agent_id in agent_ids]
+        detected = detector(views)
+
+        full = quotas.full()
+        quotas.add_samples(np.where(full[0::2], 0, len(agent_ids)))
+
+        negative = ~detected & (
+            np.random.uniform(size=detected.shape) < negative_sample_rate
+        )
+        rows, columns = np.nonzero(detected)
+        negative_rows, negative_columns = np.nonzero(negative)
+        rows = np.concatenate([rows, negative_rows])
+        buckets = np.concatenate([2 * columns, 2 * negative_columns + 1])
+
+        open_buckets = ~full[buckets]
+        rows, buckets = rows[open_buckets], buckets[open_buckets]
+        if len(buckets) != 0:
+            claimed = quotas.claim(buckets)
+            results.put(
+                [
+                    (int(bucket), views[row])
+                    for row, bucket in zip(rows[claimed], buckets[claimed])
+                ]
+            )
+
+        if all(terminations.values()) or all(truncations.values()):
+            observations, _ = env.reset()
+
+
+def _collect_concepts(
+    quotas: ConceptQuotas,
+    results: mp.Queue,
+    processes: List[mp.Process],
+    concepts: int,
+    timeout: float,
+) -> List[List[ObsType]]:
+    """
+    Receive the claimed observations until the quotas are full, the workers stopped
+    or no progress was made for timeout seconds.
+    """
+    buckets: List[List[ObsType]] = [[] for _ in range(2 * concepts)]
+    last_progress = time.monotonic()
+    last_count = 0
+
+    while any(process.is_alive() for process in processes):
+        try:
+            for bucket, observation in results.get(timeout=1.0):
+                buckets[bucket].append(observation)
+        except queue.Empty:
+            pass
+
+        count = int(quotas.counts().sum())
+        if count != last_count:
+            last_count = count
+            last_progress = time.monotonic()
+            logging.info(
+                f"Number of concepts filled: {count} / {len(buckets) * quotas.quota}"
+            )
+        elif not quotas.done and time.monotonic() - last_progress > timeout:
+            logging.warning(f"Can not generate all concepts in {timeout} seconds.")
+            quotas.stop()
 
+    # The workers flushed their results before exiting
     while True:
-        model.learn()
+        try:
+            for bucket, observation in results.get(timeout=0.1):
+                buckets[bucket].append(observation)
+        except queue.Empty:
+            break
+    return buckets
+
+
+def _write_concepts(
+    concepts: List[str],
+    buckets: List[List[ObsType]],
+    samples: NDArray[np.int64],
+    observations: int,
+    concept_path: str,
+    results_dir: str,
+):
+    logging.info("Writing concept observations to disk...")
+    os.makedirs(concept_path, exist_ok=True)
+    info_str = "\n"
+    for i, concept in enumerate(concepts):
+        for name, bucket in (
+            (concept, buckets[2 * i]),
+            ("negative_" + concept, buckets[2 * i + 1]),
+        ):
+            info_str += f"{name} - {len(bucket)}\n"
+            observation_dicts_to_npz(
+                bucket[:observations], os.path.join(concept_path, f"{name}.npz")
+            )
+    logging.info("Concepts generated." + info_str)
+
+    os.makedirs(results_dir, exist_ok=True)
+    results: Dict[str, Dict[str, float]] = {}
+    for concept, num_samples in zip(concepts, samples.tolist()):
+        results[concept] = {
+            "num_observations": observations,
+            "num_samples": num_samples,
+            "normalized": observations / num_samples if num_samples != 0 else 0.0,
+        }
+
+    path = os.path.join(results_dir, "sample_efficiency.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=4)
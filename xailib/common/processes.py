@@ -0,0 +1,69 @@
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Tuple
+
+# Cores a process may use for its own pools, set in the workers of process_pool
+_cores: int | None = None
+
+
+def available_cores() -> int:
+    """
+    Cores of this process: all cores, or in a worker of process_pool its share
+    of the cores of the pool.
+    """
+    return _cores or os.cpu_count() or 1
+
+
+def worker_count(workers: int | None, tasks: int | None = None) -> int:
+    """
+    Processes of a pool: workers, or the available cores if None, and at most
+    one per task.
+    """
+    workers = workers or available_cores()
+    if tasks is not None:
+        workers = min(workers, tasks)
+    return max(1, workers)
+
+
+def process_pool(
+    workers: int,
+    initializer: Callable[..., Any] | None = None,
+    initargs: Tuple[Any, ...] = (),
+) -> ProcessPoolExecutor:
+    """
+    Process pool used by all the parallel XAI code.
+
+    The workers are spawned, since torch can deadlock in forked children of a
+    process that already used it, and every pool here runs models. Their
+    arguments are pickled instead of inherited. Each worker gets an equal share
+    of the available cores, so the pools it starts itself do not oversubscribe
+    the CPU.
+
+    Parameters
+    ----------
+    workers : int
+        Processes of the pool
+    initializer : Callable[..., Any] | None
+        Called as initializer(*initargs) in every worker once it started
+    initargs : Tuple[Any, ...]
+        Arguments of the initializer
+    """
+    cores = max(1, available_cores() // workers)
+    return ProcessPoolExecutor(
+        workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(cores, initializer, initargs),
+    )
+
+
+def _init_worker(
+    cores: int,
+    initializer: Callable[..., Any] | None,
+    initargs: Tuple[Any, ...],
+):
+    global _cores
+    _cores = cores
+    if initializer is not None:
+        initializer(*initargs)
@@ -0,0 +1,203 @@
+import csv
+import logging
+import os
+from collections import defaultdict
+from concurrent.futures import as_completed
+from typing import Any, Dict, List, Literal, Mapping
+
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.linear_model import LogisticRegression
+
+from utils.common.observation import Observation, zip_observation_data
+from utils.core.checkpoint_registry import checkpoint_step
+from xailib.common.activations import ActivationTracker, preprocess_activations
+from xailib.common.concept_score import binary_concept_score
+from xailib.common.processes import process_pool, worker_count
+
+Score = Literal["tcav_score", "concept_score"]
+
+SWEEP_FIELDS = [
+    "model",
+    "step",
+    "layer_idx",
+    "layer",
+    "concept",
+    "tcav_score",
+    "concept_score",
+]
+
+
+class ScoreSweep:
+    """
+    TCAV and binary concept scores of every checkpoint, layer and concept.
+
+    The test observations of all concepts are stacked into one batch, so a
+    checkpoint needs a single forward pass and one backward pass per output for
+    all its layers and concepts, instead of one per concept and layer. The scores
+    of a checkpoint are computed by one task of a process pool.
+    """
+
+    def __init__(
+        self,
+        models: Mapping[str, nn.Module],
+        observations: Dict[str, Observation],
+        probes: Dict[str, Dict[str, Dict[str, LogisticRegression]]],
+        ignore_layers: List[str] = [],
+    ):
+        """
+        Parameters
+        ----------
+        models : Mapping[str, nn.Module]
+            Models by checkpoint name, like a CheckpointRegistry
+        observations : Dict[str, Observation]
+            Test observations of the concepts
+        probes : Dict[str, Dict[str, Dict[str, LogisticRegression]]]
+            probes[concept][model_name][layer_name]
+        ignore_layers : List[str]
+            Layers without probes
+        """
+        self._models = models
+        self._probes = probes
+        self._ignore_layers = ignore_layers
+
+        self._concepts: Dict[str, slice] = {}
+        concept_inputs = []
+        start = 0
+        for concept, observation in observations.items():
+            if concept not in probes:
+                continue
+            if len(observation) == 0:
+                logging.warning(f"No test observations for {concept}, skipping it.")
+                continue
+            inputs, _ = zip_observation_data(observation)
+            concept_inputs.append([input.detach() for input in inputs])
+            self._concepts[concept] = slice(start, start + len(observation))
+            start += len(observation)
+
+        self._inputs = [torch.cat(inputs) for inputs in zip(*concept_inputs)]
+
+    def run(self, path: str, workers: int | None = None) -> str:
+        """
+        Score all checkpoints, appending the rows of a checkpoint to the csv file at
+        path as soon as it is done. The file can be read with read_sweep while the
+        sweep runs.
+
+        Parameters
+        ----------
+        workers : int | None
+            Processes scoring the checkpoints, the available cores if None (see
+            available_cores). 1 scores in this process
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=SWEEP_FIELDS)
+            writer.writeheader()
+            f.flush()
+
+            names = list(self._models.keys())
+            workers = worker_count(workers, len(names))
+            if workers <= 1:
+                for name in names:
+                    self._write_rows(f, writer, self.score(name))
+                return path
+
+            with process_pool(workers, _set_engine, (self,)) as pool:
+                futures = [pool.submit(_score_checkpoint, name) for name in names]
+                for future in as_completed(futures):
+                    self._write_rows(f, writer, future.result())
+        return path
+
+    def score(self, name: str) -> List[Dict[str, Any]]:
+        """
+        Scores of every layer and concept of a checkpoint, as rows of SWEEP_FIELDS.
+        """
+        if len(self._concepts) == 0:
+            return []
+
+        tracker = ActivationTracker(self._models[name], self._ignore_layers)
+        inputs = [input.clone().requires_grad_() for input in self._inputs]
+        activations, _, outputs = tracker.compute_activations(inputs)
+        tracker.clean()
+        layers = list(activations.values())
+        layer_outputs = [layer["output"] for layer in layers]
+
+        # Gradients of each output with respect to every layer, shared by the concepts
+        gradients = [
+            [
+                gradient.reshape(len(gradient), -1).numpy()
+                for gradient in torch.autograd.grad(
+                    outputs[:, i].sum(), layer_outputs, retain_graph=True
+                )
+            ]
+            for i in range(outputs.shape[1])
+        ]
+
+        rows = []
+        for concept, rows_slice in self._concepts.items():
+            layer_probes = list(self._probes[concept][name].items())
+            assert len(layer_probes) == len(
+                layers
+            ), f"Activations and probes must have the number of keys, got {len(layers)} and {len(layer_probes)}"
+            for layer_idx, (layer_name, probe) in enumerate(layer_probes):
+                cav = probe.coef_
+                tcav_score = np.mean(
+                    [
+                        (output_gradients[layer_idx][rows_slice] @ cav.T > 0).mean()
+                        for output_gradients in gradients
+                    ]
+                )
+                concept_score = binary_concept_score(
+                    preprocess_activations(layers[layer_idx])[rows_slice], probe
+                )
+                rows.append(
+                    {
+                        "model": name,
+                        "step": checkpoint_step(name),
+                        "layer_idx": layer_idx,
+                        "layer": layer_name,
+                        "concept": concept,
+                        "tcav_score": float(tcav_score),
+                        "concept_score": float(concept_score),
+                    }
+                )
+        return rows
+
+    def _write_rows(self, f, writer: csv.DictWriter, rows: List[Dict[str, Any]]):
+        writer.writerows(rows)
+        f.flush()
+        if len(rows) != 0:
+            logging.info(f"Scored {rows[0]['model']}")
+
+
+def read_sweep(path: str, score: Score) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Scores of a sweep file as scores[concept][model_name][layer_name], ordered by
+    training step, the layout of plot_3d. Only the checkpoints written so far are
+    read.
+    """
+    with open(path, "r", newline="") as f:
+        rows = sorted(
+            csv.DictReader(f),
+            key=lambda row: (int(row["step"]), int(row["layer_idx"])),
+        )
+
+    scores: Dict[str, Dict[str, Dict[str, float]]] = defaultdict(
+        lambda: defaultdict(dict)
+    )
+    for row in rows:
+        scores[row["concept"]][row["model"]][row["layer"]] = float(row[score])
+    return {concept: dict(models) for concept, models in scores.items()}
+
+
+_engine: ScoreSweep | None = None
+
+
+def _set_engine(engine: ScoreSweep):
+    global _engine
+    _engine = engine
+
+
+def _score_checkpoint(name: str) -> List[Dict[str, Any]]:
+    return _engine.score(name)
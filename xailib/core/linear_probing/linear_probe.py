@@ -67,7 +67,14 @@ class LinearProbe:
     ) -> LogisticRegression:
         pos_act = preprocess_activations(positive_activations)
         neg_act = preprocess_activations(negative_activations)
+        return LinearProbe.fit_regressor(pos_act, neg_act)
 
+    @staticmethod
+    def fit_regressor(
+        pos_act: np.ndarray,
+        neg_act: np.ndarray,
+        rng: np.random.Generator | None = None,
+    ) -> LogisticRegression:
         assert pos_act.shape[1] == neg_act.shape[1]
 
         positive_labels = np.ones(pos_act.shape[0])
@@ -76,7 +83,8 @@ class LinearProbe:
         combined_activations = np.concatenate([pos_act, neg_act])
         combined_labels = np.concatenate([positive_labels, negative_labels])
 
-        idx = np.random.permutation(combined_activations.shape[0])
+        permutation = rng.permutation if rng is not None else np.random.permutation
+        idx = permutation(combined_activations.shape[0])
         combined_activations = combined_activations[idx]
         combined_labels = combined_labels[idx]
 
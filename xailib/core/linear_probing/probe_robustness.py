@@ -0,0 +1,176 @@
+import logging
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.linear_model import LogisticRegression
+
+from utils.common.observation import load_observation, zip_observation_data
+from xailib.common.activations import ActivationTracker, preprocess_activations
+from xailib.common.processes import process_pool, worker_count
+from xailib.core.linear_probing.linear_probe import LinearProbe
+
+
+class ProbeRobustness:
+    """
+    Fit probes of one layer on random subsets of the concept datasets.
+
+    The model is given once, and the datasets are read and their activations at the
+    layer computed once per concept, so every fit only trains a logistic regression.
+    """
+
+    def __init__(
+        self,
+        model: nn.Module,
+        layer_idx: int,
+        ignore_layers: List[str] = [],
+        concept_path: str = os.path.join("assets", "concepts"),
+    ):
+        self._model = model
+        self._layer_idx = layer_idx
+        self._ignore_layers = ignore_layers
+        self._concept_path = concept_path
+        self._activations: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def activations(self, concept: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Flattened activations of the layer for the positive and negative observations.
+        """
+        if concept not in self._activations:
+            self._activations[concept] = (
+                self._layer_activations(concept),
+                self._layer_activations("negative_" + concept),
+            )
+        return self._activations[concept]
+
+    def fit(
+        self,
+        concept: str,
+        split: float = 1.0,
+        rng: np.random.Generator | None = None,
+    ) -> LogisticRegression | None:
+        """
+        Fit a probe on a random split of the positive and negative observations.
+        Returns None if the split has no positive observations.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        positive, negative = self.activations(concept)
+        positive = positive[
+            rng.permutation(len(positive))[: int(len(positive) * split)]
+        ]
+        negative = negative[
+            rng.permutation(len(negative))[: int(len(negative) * split)]
+        ]
+
+        if len(positive) == 0:
+            logging.warning(f"Positive observation for {concept} is empty.")
+            return None
+        return LinearProbe.fit_regressor(positive, negative, rng)
+
+    def bootstrap(
+        self,
+        concepts: List[str],
+        splits: List[float],
+        epochs: int,
+        workers: int | None = None,
+        seed: int | None = None,
+    ) -> Dict[str, Dict[float, np.ndarray]]:
+        """
+        Cosine similarity between the probe fitted on all observations and the
+        probes fitted on random splits, for every epoch.
+
+        Parameters
+        ----------
+        workers : int | None
+            Processes fitting the probes, the available cores if None (see
+            available_cores). 1 fits in this process
+        seed : int | None
+            Seed of the random splits
+
+        Returns
+        -------
+        Dict[str, Dict[float, np.ndarray]]
+            Concept -> split -> similarities of shape (epochs,). Concepts without
+            positive observations are empty
+        """
+        for concept in concepts:
+            self.activations(concept)
+
+        tasks = [
+            (concept, split)
+            for concept in concepts
+            for split in splits
+            for _ in range(epochs)
+        ]
+        seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+        task_concepts, task_splits = zip(*tasks) if len(tasks) != 0 else ((), ())
+
+        workers = worker_count(workers, len(tasks))
+        if workers == 1:
+            _set_engine(self)
+            coefs = list(map(_fit_coef, task_concepts, task_splits, seeds))
+        else:
+            # The cached activations are sent once per worker, not per task
+            with process_pool(workers, _set_engine, (self,)) as pool:
+                coefs = list(
+                    pool.map(
+                        _fit_coef,
+                        task_concepts,
+                        task_splits,
+                        seeds,
+                        chunksize=max(1, epochs // 2),
+                    )
+                )
+
+        similarities: Dict[str, Dict[float, np.ndarray]] = {}
+        index = 0
+        for concept in concepts:
+            base = self.fit(concept, 1.0, np.random.default_rng(seed))
+            similarities[concept] = {}
+            for split in splits:
+                split_coefs = coefs[index : index + epochs]
+                index += epochs
+                if base is None:
+                    continue
+                values = [
+                    _cosine_similarity(base.coef_, coef)
+                    for coef in split_coefs
+                    if coef is not None
+                ]
+                if len(values) != 0:
+                    similarities[concept][split] = np.array(values)
+        return similarities
+
+    @torch.no_grad()
+    def _layer_activations(self, concept: str) -> np.ndarray:
+        observation = load_observation(concept, self._concept_path)
+        if len(observation) == 0:
+            return np.zeros((0, 0))
+        inputs, _ = zip_observation_data(observation)
+        tracker = ActivationTracker(self._model, self._ignore_layers)
+        activations, _, _ = tracker.compute_activations(inputs)
+        tracker.clean()
+        layer = list(activations.values())[self._layer_idx]
+        return preprocess_activations(layer)
+
+
+_engine: ProbeRobustness | None = None
+
+
+def _set_engine(engine: ProbeRobustness):
+    global _engine
+    _engine = engine
+
+
+def _fit_coef(
+    concept: str, split: float, seed: np.random.SeedSequence
+) -> np.ndarray | None:
+    probe = _engine.fit(concept, split, np.random.default_rng(seed))
+    return probe.coef_ if probe is not None else None
+
+
+def _cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    a, b = a.ravel(), b.ravel()
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
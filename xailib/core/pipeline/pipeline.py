@@ -0,0 +1,310 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+from utils.common.numpy_collections import NumpyEncoder
+from xailib.common.processes import process_pool, worker_count
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    A step of a Pipeline.
+
+    The function is called as fn(config, path, **inputs), with the outputs of the
+    upstream stages named in inputs. path is a directory owned by the stage, for
+    the files it writes. It returns a dict with the outputs it declares.
+
+    A stage is cached under a hash of the config entries, the content of the files
+    and the keys of its upstream stages, so it only runs again when one of them
+    changes.
+    """
+
+    name: str
+    fn: Callable[..., Dict[str, Any] | None]
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    # Stages to run before, without using their outputs
+    after: Tuple[str, ...] = ()
+    # Dotted config keys, like "analyze.layer_idx"
+    config: Tuple[str, ...] = ()
+    # Files or directories the stage reads outside of its inputs, like checkpoints
+    files: Tuple[str, ...] = ()
+    # Files or directories the stage writes outside of its path
+    products: Tuple[str, ...] = ()
+    # Run on the process pool, concurrently with other stages
+    parallel: bool = False
+    cache: bool = True
+
+
+class _Cached:
+    """
+    Outputs of a cached stage, only loaded if a stage that runs needs them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+
+class Pipeline:
+    """
+    Run stages in dependency order, skipping the stages with a valid cache entry.
+
+    An interrupted run resumes from the last stage that completed, as every stage
+    is committed to the cache when it finishes. Parallel stages run concurrently
+    on a process pool as soon as their inputs are ready.
+    """
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        config: Dict[str, Any],
+        cache_dir: str = os.path.join("assets", "pipeline"),
+        run_dir: str | None = None,
+        workers: int | None = None,
+        force_update: bool = False,
+    ):
+        """
+        Parameters
+        ----------
+        stages : List[Stage]
+            Stages of the pipeline, stage names must be unique
+        config : Dict[str, Any]
+            Config the stages read their entries from
+        cache_dir : str
+            Directory of the cached stage outputs and files
+        run_dir : str | None
+            Directory the files of every stage are copied to after the run
+        workers : int | None
+            Processes of the pool for parallel stages, the available cores if None.
+            Each gets an equal share of the cores for its own pools
+        force_update : bool
+            Ignore the cache and run every stage
+        """
+        self._stages = {stage.name: stage for stage in stages}
+        assert len(self._stages) == len(stages), "Stage names must be unique"
+        self._producers = {
+            output: stage.name for stage in stages for output in stage.outputs
+        }
+        self._config = config
+        self._cache_dir = cache_dir
+        self._run_dir = run_dir
+        self._workers = worker_count(workers)
+        self._force_update = force_update
+
+        self._order = self._topological_order()
+        self._file_digests: Dict[Tuple[str, float, int], str] = {}
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Run the pipeline.
+
+        Returns
+        -------
+        Dict[str, Any]
+            Outputs of the stages that ran, and of the cached stages they needed
+        """
+        keys: Dict[str, str] = {}
+        values: Dict[str, Any] = {}
+        done: set[str] = set()
+        pending = list(self._order)
+        running: Dict[Future, Stage] = {}
+
+        with process_pool(self._workers) as pool:
+            while len(pending) != 0 or len(running) != 0:
+                for stage in [stage for stage in pending if self._ready(stage, done)]:
+                    pending.remove(stage)
+                    keys[stage.name] = self._key(stage, keys)
+                    stage_dir = self._stage_dir(stage, keys[stage.name])
+
+                    if self._is_cached(stage, stage_dir):
+                        logging.info(f"Stage {stage.name} is cached")
+                        for output in stage.outputs:
+                            values[output] = _Cached(stage_dir)
+                        done.add(stage.name)
+                        continue
+
+                    inputs = self._resolve_inputs(stage, values)
+                    os.makedirs(stage_dir, exist_ok=True)
+                    if stage.parallel:
+                        logging.info(f"Starting stage {stage.name}...")
+                        future = pool.submit(
+                            _run_stage, stage, self._config, stage_dir, inputs
+                        )
+                        running[future] = stage
+                        continue
+
+                    logging.info(f"Running stage {stage.name}...")
+                    outputs = _run_stage(stage, self._config, stage_dir, inputs)
+                    self._commit(stage, stage_dir, outputs, values)
+                    done.add(stage.name)
+
+                if len(running) == 0:
+                    continue
+
+                finished, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    stage_dir = self._stage_dir(stage, keys[stage.name])
+                    self._commit(stage, stage_dir, future.result(), values)
+                    done.add(stage.name)
+                    logging.info(f"Finished stage {stage.name}")
+
+        if self._run_dir is not None:
+            for stage in self._order:
+                self._copy_files(stage, self._stage_dir(stage, keys[stage.name]))
+
+        return {
+            output: value
+            for output, value in values.items()
+            if not isinstance(value, _Cached)
+        }
+
+    def _topological_order(self) -> List[Stage]:
+        order: List[Stage] = []
+        visiting: set[str] = set()
+        visited: set[str] = set()
+
+        def visit(name: str):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"The pipeline has a cycle through stage {name}")
+            visiting.add(name)
+            for dependency in self._dependencies(self._stages[name]):
+                visit(dependency)
+            visiting.remove(name)
+            visited.add(name)
+            order.append(self._stages[name])
+
+        for name in self._stages:
+            visit(name)
+        return order
+
+    def _dependencies(self, stage: Stage) -> List[str]:
+        for input in stage.inputs:
+            if input not in self._producers:
+                raise ValueError(f"No stage produces {input}, needed by {stage.name}")
+        for name in stage.after:
+            if name not in self._stages:
+                raise ValueError(f"Unknown stage {name}, needed by {stage.name}")
+        dependencies = [self._producers[input] for input in stage.inputs]
+        return list(dict.fromkeys(dependencies + list(stage.after)))
+
+    def _ready(self, stage: Stage, done: set[str]) -> bool:
+        return all(dependency in done for dependency in self._dependencies(stage))
+
+    def _key(self, stage: Stage, keys: Dict[str, str]) -> str:
+        """
+        Content hash of everything the outputs of the stage depend on.
+        """
+        content = {
+            "stage": stage.name,
+            "config": {key: _config_value(self._config, key) for key in stage.config},
+            "files": {path: self._digest(path) for path in stage.files},
+            "upstream": {name: keys[name] for name in self._dependencies(stage)},
+        }
+        encoded = json.dumps(content, sort_keys=True, cls=NumpyEncoder).encode()
+        return hashlib.sha256(encoded).hexdigest()[:16]
+
+    def _digest(self, path: str) -> str:
+        """
+        Content hash of a file, or of all files in a directory. Memoized on the
+        modification time and size of the files.
+        """
+        if not os.path.exists(path):
+            return ""
+        files = (
+            [path]
+            if os.path.isfile(path)
+            else sorted(
+                os.path.join(root, file)
+                for root, _, names in os.walk(path)
+                for file in names
+            )
+        )
+        digest = hashlib.sha256()
+        for file in files:
+            stat = os.stat(file)
+            memo_key = (file, stat.st_mtime, stat.st_size)
+            if memo_key not in self._file_digests:
+                file_digest = hashlib.sha256()
+                with open(file, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        file_digest.update(chunk)
+                self._file_digests[memo_key] = file_digest.hexdigest()
+            digest.update(os.path.relpath(file, path).encode())
+            digest.update(self._file_digests[memo_key].encode())
+        return digest.hexdigest()
+
+    def _stage_dir(self, stage: Stage, key: str) -> str:
+        return os.path.join(self._cache_dir, stage.name, key)
+
+    def _is_cached(self, stage: Stage, stage_dir: str) -> bool:
+        if self._force_update or not stage.cache:
+            return False
+        if not os.path.exists(os.path.join(stage_dir, _OUTPUTS)):
+            return False
+        return all(os.path.exists(path) for path in stage.products)
+
+    def _resolve_inputs(self, stage: Stage, values: Dict[str, Any]) -> Dict[str, Any]:
+        inputs = {}
+        for input in stage.inputs:
+            if isinstance(values[input], _Cached):
+                with open(os.path.join(values[input].path, _OUTPUTS), "rb") as f:
+                    for output, value in pickle.load(f).items():
+                        values[output] = value
+            inputs[input] = values[input]
+        return inputs
+
+    def _commit(
+        self,
+        stage: Stage,
+        stage_dir: str,
+        outputs: Dict[str, Any] | None,
+        values: Dict[str, Any],
+    ):
+        outputs = outputs or {}
+        missing = set(stage.outputs) - set(outputs.keys())
+        assert len(missing) == 0, f"Stage {stage.name} did not return {missing}"
+        values.update({output: outputs[output] for output in stage.outputs})
+
+        if not stage.cache:
+            return
+        # Written last and atomically, it marks the stage as completed
+        path = os.path.join(stage_dir, _OUTPUTS)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump({output: outputs[output] for output in stage.outputs}, f)
+        os.replace(path + ".tmp", path)
+
+    def _copy_files(self, stage: Stage, stage_dir: str):
+        if not os.path.isdir(stage_dir):
+            return
+        shutil.copytree(
+            stage_dir,
+            self._run_dir,
+            ignore=shutil.ignore_patterns(_OUTPUTS),
+            dirs_exist_ok=True,
+        )
+
+
+_OUTPUTS = "outputs.pkl"
+
+
+def _run_stage(
+    stage: Stage, config: Dict[str, Any], stage_dir: str, inputs: Dict[str, Any]
+) -> Dict[str, Any] | None:
+    return stage.fn(config, stage_dir, **inputs)
+
+
+def _config_value(config: Dict[str, Any], key: str) -> Any:
+    value = config
+    for part in key.split("."):
+        value = value[part]
+    return value
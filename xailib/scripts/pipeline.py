@@ -2,6 +2,7 @@ import json
 import logging
 import os
 import time
+from typing import Any, Dict
 
 from utils.common.collect_rollouts import collect_rollouts
 from utils.common.environment import create_environment
@@ -10,13 +11,13 @@ from utils.common.observation import filter_observations
 from utils.core.model_loader import ModelLoader
 from xailib.common.completeness_score import get_completeness_score
 from xailib.common.generate_concepts import generate_concepts
-from xailib.utils.activations import get_activations, get_concept_activations
+from xailib.common.processes import available_cores
+from xailib.core.pipeline.pipeline import Pipeline, Stage
 from xailib.utils.metrics import (
     calculate_probe_robustness,
     calculate_probe_similarities,
     calculate_statistics,
-    get_concept_scores,
-    get_tcav_scores,
+    get_sweep_scores,
 )
 from xailib.utils.observation import get_observations
 from xailib.utils.probes import get_probes_and_activations
@@ -24,18 +25,18 @@ from xailib.utils.probes import get_probes_and_activations
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+Outputs = Dict[str, Any]
 
-def main():
-    with open("xailib/configs/pipeline_config.json", "r") as f:
-        config = json.load(f)
 
-    current_time = time.strftime("%Y%m%d-%H%M%S")
+def _results(path: str) -> str:
+    return os.path.join(path, "results")
 
-    result_path = os.path.join("pipeline", f"{current_time}", "results")
-    figure_path = os.path.join("pipeline", f"{current_time}", "figures")
-    os.makedirs(result_path, exist_ok=True)
 
-    logging.info("Downloading models...")
+def _figures(path: str) -> str:
+    return os.path.join(path, "figures")
+
+
+def download(config: Dict, path: str) -> Outputs:
     download_models(
         low=config["wandb"]["models"]["low"],
         high=config["wandb"]["models"]["high"],
@@ -43,29 +44,33 @@ def main():
         model_name=config["wandb"]["models"]["name"],
         wandb_project_folder=config["wandb"]["project_folder"],
         artifact_path=config["path"]["artifacts"],
-        force_update=config["force_update"],
+        source=config["wandb"].get("source", "wandb"),
     )
 
+
+def load_artifact(config: Dict, path: str) -> Outputs:
     artifact = ModelLoader.load_latest_model_artifacts_from_path(
         config["path"]["artifacts"]
     )
+    return {"artifact": artifact, "environment": create_environment(artifact)}
+
 
-    logging.info("Creating environment...")
-    environment = create_environment(artifact)
-    logging.info("Collecting rollouts...")
+def rollouts(config: Dict, path: str, artifact, environment) -> Outputs:
     observations = collect_rollouts(
         env=environment,
         artifact=artifact,
         n=config["collect_rollouts"]["observations"],
         method=config["collect_rollouts"]["method"],
         observation_path=config["path"]["observations"],
-        force_update=config["force_update"],
+        force_update=True,
         model_type=config["model"]["type"],
         sample_rate=config["collect_rollouts"]["sample_rate"],
         artifact_path=config["path"]["artifacts"],
     )
-    observations = filter_observations(observations)
-    logging.info("Generating concepts...")
+    return {"observations": filter_observations(observations)}
+
+
+def concepts(config: Dict, path: str, artifact, environment) -> Outputs:
     generate_concepts(
         concepts=config["concepts"],
         env=environment,
@@ -73,20 +78,25 @@ def main():
         artifact=artifact,
         method=config["generate_concepts"]["method"],
         model_type=config["model"]["type"],
-        force_update=config["force_update"],
+        force_update=True,
         artifact_path=config["path"]["artifacts"],
         concept_path=config["path"]["concepts"],
-        result_dir=result_path,
+        result_dir=_results(path),
     )
-
-    logging.info("Loading observations...")
     (
         positive_observations,
         negative_observations,
         test_positive_observations,
-        test_negative_observations,
+        _,
     ) = get_observations(config["concepts"])
+    return {
+        "positive_observations": positive_observations,
+        "negative_observations": negative_observations,
+        "test_positive_observations": test_positive_observations,
+    }
+
 
+def models(config: Dict, path: str, artifact, environment) -> Outputs:
     models = get_models(
         artifact=artifact,
         model_type=config["model"]["type"],
@@ -102,8 +112,12 @@ def main():
         eval=True,
     )
     logging.info(latest_model)
+    return {"models": models, "latest_model": latest_model}
 
-    logging.info("Getting probes and activations...")
+
+def probes(
+    config: Dict, path: str, models, positive_observations, negative_observations
+) -> Outputs:
     probes, positive_activations, negative_activations = get_probes_and_activations(
         config["concepts"],
         config["analyze"]["ignore_layers"],
@@ -111,74 +125,173 @@ def main():
         positive_observations,
         negative_observations,
     )
-    logging.info("Calculating network completeness score...")
-    completeness_score = get_completeness_score(
-        probes=probes,
-        concepts=config["concepts"],
-        model=latest_model,
-        observations=observations,
-        layer_idx=config["analyze"]["layer_idx"],
-        epochs=config["completeness_score"]["network_epochs"],
-        ignore_layers=config["analyze"]["ignore_layers"],
-        method="network",
-        verbose=False,
-        result_path=result_path,
-    )
-    logging.info("Calculating decisiontree completeness score...")
-    completeness_score = get_completeness_score(
-        probes=probes,
-        concepts=config["concepts"],
-        model=latest_model,
-        observations=observations,
-        layer_idx=config["analyze"]["layer_idx"],
-        epochs=config["completeness_score"]["decisiontree_epochs"],
-        ignore_layers=config["analyze"]["ignore_layers"],
-        method="decisiontree",
-        verbose=False,
-        result_path=result_path,
-    )
+    return {"probes": probes, "positive_activations": positive_activations}
+
+
+def completeness(
+    config: Dict, path: str, probes, latest_model, observations
+) -> Outputs:
+    for method, epochs in (
+        ("network", config["completeness_score"]["network_epochs"]),
+        ("decisiontree", config["completeness_score"]["decisiontree_epochs"]),
+    ):
+        logging.info(f"Calculating {method} completeness score...")
+        get_completeness_score(
+            probes=probes,
+            concepts=config["concepts"],
+            model=latest_model,
+            observations=observations,
+            layer_idx=config["analyze"]["layer_idx"],
+            epochs=epochs,
+            ignore_layers=config["analyze"]["ignore_layers"],
+            method=method,
+            verbose=False,
+            result_path=_results(path),
+            figure_path=_figures(path),
+        )
 
-    test_positive_activations, test_input, test_output = get_concept_activations(
+
+def scores(
+    config: Dict, path: str, models, test_positive_observations, probes
+) -> Outputs:
+    get_sweep_scores(
         concepts=config["concepts"],
-        observation=test_positive_observations,
         models=models,
+        test_observations=test_positive_observations,
+        probes=probes,
         ignore_layers=config["analyze"]["ignore_layers"],
+        results_path=_results(path),
+        figure_path=_figures(path),
+        workers=config["analyze"].get("workers"),
     )
 
-    activations, input, output = get_activations(
-        {"latest": latest_model}, observations, config["analyze"]["ignore_layers"]
-    )
-    logging.info("Calculating concept scores...")
-    concept_scores = get_concept_scores(
-        config["concepts"], test_positive_activations, probes, result_path, figure_path
-    )
-    logging.info("Calculating TCAV scores...")
-    tcav_scores = get_tcav_scores(
-        config["concepts"],
-        test_positive_activations,
-        test_output,
-        probes,
-        result_path,
-        figure_path,
-    )
-    logging.info("Calculating probe robustness...")
+
+def robustness(config: Dict, path: str, latest_model) -> Outputs:
     calculate_probe_robustness(
         concepts=config["concepts"],
         model=latest_model,
         splits=config["analyze"]["splits"],
         layer_idx=config["analyze"]["layer_idx"],
         epochs=config["analyze"]["robustness_epochs"],
-        results_path=result_path,
+        results_path=_results(path),
+        # Runs in a worker of the pipeline pool, next to the other parallel stages
+        workers=available_cores(),
     )
-    logging.info("Calculating statistics...")
+
+
+def statistics(config: Dict, path: str, positive_activations, probes) -> Outputs:
     calculate_statistics(
         concepts=config["concepts"],
         activations=positive_activations,
         probes=probes,
         layer_idx=config["analyze"]["layer_idx"],
-        results_path=result_path,
+        results_path=_results(path),
+    )
+    calculate_probe_similarities(probes, config["analyze"]["layer_idx"], _results(path))
+
+
+def build_stages(config: Dict) -> list[Stage]:
+    artifacts = config["path"]["artifacts"]
+    concept_path = config["path"]["concepts"]
+    analyze = ("concepts", "analyze.ignore_layers", "analyze.layer_idx")
+    return [
+        Stage(
+            "download",
+            download,
+            config=("wandb", "path.artifacts"),
+            products=(artifacts,),
+        ),
+        Stage(
+            "artifact",
+            load_artifact,
+            outputs=("artifact", "environment"),
+            after=("download",),
+            files=(artifacts,),
+            cache=False,
+        ),
+        Stage(
+            "rollouts",
+            rollouts,
+            inputs=("artifact", "environment"),
+            outputs=("observations",),
+            config=("collect_rollouts", "model", "path.observations"),
+            files=(artifacts,),
+        ),
+        Stage(
+            "concepts",
+            concepts,
+            inputs=("artifact", "environment"),
+            outputs=(
+                "positive_observations",
+                "negative_observations",
+                "test_positive_observations",
+            ),
+            config=("concepts", "generate_concepts", "model"),
+            files=(artifacts,),
+            products=(concept_path,),
+        ),
+        Stage(
+            "models",
+            models,
+            inputs=("artifact", "environment"),
+            outputs=("models", "latest_model"),
+            config=("model",),
+            files=(artifacts,),
+            cache=False,
+        ),
+        Stage(
+            "probes",
+            probes,
+            inputs=("models", "positive_observations", "negative_observations"),
+            outputs=("probes", "positive_activations"),
+            config=analyze,
+        ),
+        Stage(
+            "completeness",
+            completeness,
+            inputs=("probes", "latest_model", "observations"),
+            config=analyze + ("completeness_score",),
+            parallel=True,
+        ),
+        Stage(
+            "scores",
+            scores,
+            inputs=("models", "test_positive_observations", "probes"),
+            config=analyze + ("analyze.workers",),
+        ),
+        Stage(
+            "robustness",
+            robustness,
+            inputs=("latest_model",),
+            after=("concepts",),
+            config=analyze + ("analyze.splits", "analyze.robustness_epochs"),
+            parallel=True,
+        ),
+        Stage(
+            "statistics",
+            statistics,
+            inputs=("positive_activations", "probes"),
+            config=analyze,
+            parallel=True,
+        ),
+    ]
+
+
+def main():
+    with open("xailib/configs/pipeline_config.json", "r") as f:
+        config = json.load(f)
+
+    current_time = time.strftime("%Y%m%d-%H%M%S")
+    run_path = os.path.join("pipeline", f"{current_time}")
+
+    pipeline = Pipeline(
+        build_stages(config),
+        config,
+        cache_dir=config["path"].get("cache", os.path.join("assets", "pipeline")),
+        run_dir=run_path,
+        force_update=config["force_update"],
     )
-    calculate_probe_similarities(probes, config["analyze"]["layer_idx"], result_path)
+    pipeline.run()
 
 
 if __name__ == "__main__":
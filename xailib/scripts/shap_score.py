@@ -6,6 +6,7 @@ import shap
 from rllib.utils.torch.processing import observations_seperate_to_torch
 from utils.common.collect_rollouts import collect_rollouts
 from utils.common.environment import create_environment
+from utils.common.image import one_hot_to_rgb
 from utils.common.model import get_models
 from utils.common.observation import (
     Observation,
@@ -13,12 +14,18 @@ from utils.common.observation import (
     normalize_observations,
 )
 from utils.core.model_loader import ModelLoader
+from xailib.common.attributions import ShapAttributions
 
 
 def main():
     model_type = "dqn"
     eval = True
     artifact_path = os.path.join("artifacts")
+    attribution_path = os.path.join("assets", "results", "shap")
+    background_size = 100
+    batch_size = 32
+    plots = 100
+    plot_rows = 10
 
     artifact = ModelLoader.load_latest_model_artifacts_from_path(artifact_path)
     environment = create_environment(artifact, agents=10)
@@ -29,7 +36,6 @@ def main():
         eval=eval,
         artifact_path=artifact_path,
     )
-    model = list(models.values())[-1]
 
     observations = collect_rollouts(
         env=environment,
@@ -42,35 +48,26 @@ def main():
 
     np.random.shuffle(observations)
     normalized_observations = normalize_observations(observations)
-    data = normalized_observations[..., Observation.OBSERVATION][0:100]
-    obs = observations_seperate_to_torch([d[0] for d in data])
-    explainer = shap.GradientExplainer(model, obs)
-    shap_values = explainer.shap_values(obs)
+    data = normalized_observations[..., Observation.OBSERVATION]
+    obs = [
+        input.detach().numpy()
+        for input in observations_seperate_to_torch([d[0] for d in data])
+    ]
 
-    mean_shap_values = np.array(shap_values[0]).mean(axis=-1)
-    pixel_values = np.array(obs[0], copy=True)
+    attributions = ShapAttributions(
+        background=[input[:background_size] for input in obs],
+        batch_size=batch_size,
+    )
+    paths = attributions.attribute_checkpoints(models, obs, attribution_path)
 
-    binary_to_rgb = {
-        0: [255, 0, 0],  # Red
-        1: [0, 255, 0],  # Green
-        2: [0, 0, 255],  # Blue
-        3: [255, 255, 0],  # Yellow
-        4: [0, 255, 255],  # Cyan
-    }
-    rgb_images = []
-    for pixel_value in pixel_values:
-        image = []
-        for row in pixel_value:
-            image_row = []
-            for cell in row:
-                image_row.append(binary_to_rgb[np.argmax(cell)])
-            image.append(image_row)
-        rgb_images.append(image)
-    rgb_images = np.array(rgb_images)
+    # Attributions of the image input of the latest checkpoint
+    shap_values = np.load(paths[list(models.keys())[-1]][0], mmap_mode="r")
+    rgb_images = one_hot_to_rgb(obs[0]) / 255
 
-    for i in range(mean_shap_values.shape[0]):
+    for start in range(0, min(len(shap_values), plots), plot_rows):
+        end = min(start + plot_rows, plots)
         # NOTE: If the pixel values are not shown, its because image plot does something witih kmeans because the shape != 3 and the values is 0. Just go in the code and add 1e-10 so it doesn't devide by 0.
-        shap.image_plot(mean_shap_values[i], rgb_images[i])
+        shap.image_plot(np.asarray(shap_values[start:end]), rgb_images[start:end])
 
 
 if __name__ == "__main__":
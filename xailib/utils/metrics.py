@@ -4,13 +4,12 @@ import math
 import os
 import time
 from collections import defaultdict
-from typing import Dict, List, Literal
+from typing import Dict, List, Literal, Tuple
 
 import matplotlib.pyplot as plt
 import numpy as np
 import torch
 import torch.nn as nn
-from scipy.spatial.distance import pdist
 from sklearn.linear_model import LinearRegression, LogisticRegression
 from sklearn.metrics import accuracy_score
 from sklearn.metrics.pairwise import cosine_similarity
@@ -30,6 +29,7 @@ from utils.common.observation import (
 )
 from utils.common.read import read_results
 from utils.common.write import write_results
+from utils.core.model_loader import ModelLoader
 from utils.core.plotting import plot_3d
 from xailib.common.activations import compute_activations_from_models
 from xailib.common.concept_score import (
@@ -37,11 +37,13 @@ from xailib.common.concept_score import (
     individual_binary_concept_score,
     individual_soft_concept_score,
 )
-from xailib.common.probes import get_probe
+from xailib.common.score_sweep import ScoreSweep, read_sweep
 from xailib.common.tcav_score import tcav_scores
 from xailib.common.train_model import train_decision_tree, train_model
+from xailib.core.linear_probing.probe_robustness import ProbeRobustness
 from xailib.core.network.feed_forward import FeedForwardNetwork
 from xailib.utils.logging import log_shapley_values, log_similarity, log_stats
+from xailib.utils.statistics import ActivationStatistics
 
 
 def get_tcav_scores(
@@ -106,6 +108,51 @@ def get_concept_scores(
     return concept_scores
 
 
+def get_sweep_scores(
+    concepts: List[str],
+    models: Dict[str, nn.Module],
+    test_observations: Dict[str, Observation],
+    probes: Dict[str, Dict[str, Dict[str, LogisticRegression]]],
+    ignore_layers: List[str] = [],
+    results_path: str = os.path.join("assets", "results"),
+    figure_path: str = os.path.join("assets", "figures"),
+    workers: int | None = None,
+    show: bool = False,
+) -> Tuple[Dict[str, Dict[str, float]], Dict[str, Dict[str, float]]]:
+    """
+    TCAV and concept scores of all checkpoints with a ScoreSweep, streamed to
+    score_sweep.csv, then written and plotted like get_tcav_scores and
+    get_concept_scores.
+    """
+    sweep = ScoreSweep(
+        models,
+        {concept: test_observations[concept] for concept in concepts},
+        probes,
+        ignore_layers,
+    )
+    path = sweep.run(os.path.join(results_path, "score_sweep.csv"), workers)
+
+    results = {}
+    for score, filename in (
+        ("tcav_score", "tcav"),
+        ("concept_score", "concept_score"),
+    ):
+        scores = read_sweep(path, score)
+        for concept, concept_scores in scores.items():
+            plot_3d(
+                concept_scores,
+                label=concept,
+                folder_path=figure_path,
+                filename=f"{filename}_{concept}",
+                min=0,
+                max=1,
+                show=show,
+            )
+        write_results(scores, os.path.join(results_path, f"{score}s.json"))
+        results[score] = scores
+    return results["tcav_score"], results["concept_score"]
+
+
 def compute_accuracy_decision_tree(
     concepts: List[str],
     activations: Dict[str, Dict],
@@ -263,19 +310,21 @@ def calculate_probe_robustness(
     epochs: int,
     results_path: str = os.path.join("assets", "results"),
     ignore_layers: List[str] = [],
+    workers: int | None = None,
 ):
-    concept_similarities = defaultdict(lambda: defaultdict(float))
-    for _ in range(epochs):
-        concept_probe_robustness = probe_robustness(
-            concepts, layer_idx, model, splits, ignore_layers=ignore_layers
-        )
-        for concept in concepts:
-            for key, value in concept_probe_robustness[concept].items():
-                concept_similarities[concept][key] += value
-
-    for concept in concepts:
-        for key in concept_similarities[concept].keys():
-            concept_similarities[concept][key] /= epochs
+    model = ModelLoader.load_latest_model_from_path("artifacts", model)
+    robustness = ProbeRobustness(model, layer_idx, ignore_layers)
+    similarities = robustness.bootstrap(concepts, splits, epochs, workers)
+
+    # Averaged over the epochs, as 1x1 arrays like sklearn's cosine_similarity,
+    # the format the readers of probe_robustness.json expect
+    concept_similarities = {
+        concept: {
+            split: np.array([[values.sum() / epochs]])
+            for split, values in similarities[concept].items()
+        }
+        for concept in concepts
+    }
 
     path = os.path.join(results_path, "probe_robustness.json")
     concept_similarities = convert_numpy_to_float(concept_similarities)
@@ -285,48 +334,6 @@ def calculate_probe_robustness(
     return concept_similarities
 
 
-def probe_robustness(
-    concepts: List[str],
-    layer_idx: int,
-    model: nn.Module,
-    splits: List[float],
-    ignore_layers: List[str] = [],
-) -> Dict:
-    concept_similarities = {}
-    for concept in concepts:
-        similarities = get_probe_similarity(
-            concept, layer_idx, model, splits, ignore_layers=ignore_layers
-        )
-        concept_similarities[concept] = similarities
-
-    return concept_similarities
-
-
-def get_probe_similarity(
-    concept: str,
-    layer_idx: int,
-    model: nn.Module,
-    splits: List[float],
-    ignore_layers: List[str] = [],
-) -> Dict[float, float]:
-    base = get_probe(concept, layer_idx, model, 1.0, ignore_layers=ignore_layers)
-    if base is None:
-        return {}
-
-    probe_splits = {}
-    for split in splits:
-        probe = get_probe(concept, layer_idx, model, split, ignore_layers=ignore_layers)
-        if probe is None:
-            continue
-        probe_splits[split] = probe
-
-    similarities = {
-        key: cosine_similarity(base.coef_, probe.coef_)
-        for key, probe in probe_splits.items()
-    }
-    return similarities
-
-
 def calculate_statistics(
     concepts: List[str],
     activations: Dict[str, Dict[str, Dict[str, np.ndarray]]],
@@ -354,6 +361,7 @@ def calculate_statistic(
     activations: Dict[str, Dict[str, np.ndarray]],
     probes: Dict[str, Dict[str, LogisticRegression]],
     layer_idx: int,
+    batch_size: int = 65536,
 ):
     layer_activations = list(activations["latest"].values())[layer_idx]["output"]
     probe = list(probes["latest"].values())[layer_idx]
@@ -365,42 +373,34 @@ def calculate_statistic(
     n_samples = points.shape[0]
     points = points.reshape(n_samples, -1)
 
-    mean = np.mean(points)
-    variance = np.var(points)
-    std_dev = np.std(points)
-    median = np.median(points)
-    range_val = np.ptp(points)
+    statistics = ActivationStatistics(seed=0)
+    for start in range(0, n_samples, batch_size):
+        statistics.update(points[start : start + batch_size])
 
-    q75, q25 = np.percentile(points, [75, 25])
+    median, q75, q25 = statistics.quantiles([50, 75, 25])
     iq_range = q75 - q25
 
-    try:
-        pairwise_distances = pdist(points, "mahalanobis")
-    except ValueError as e:
-        logging.warning(e)
-        logging.info("Running pdist with euclidean distance")
-        pairwise_distances = pdist(points, "euclidean")
-    mean_distance = np.mean(pairwise_distances)
+    mean_distance, mean_distance_ci, _ = statistics.mean_distance("mahalanobis")
     density = 1 / mean_distance if mean_distance != 0 else float("inf")
-    centroid = np.mean(points, axis=0)
-    cav = probe.coef_
-    accuracy = cosine_similarity(centroid.reshape(-1, 1), cav.reshape(-1, 1))
-    centroid = centroid.flatten()
-    cav = cav.flatten()
+    centroid = statistics.centroid
+    cav = probe.coef_.flatten()
+    # cosine_similarity of the (features, 1) column vectors, only its first entry
+    accuracy = float(np.sign(centroid[0]) * np.sign(cav[0]))
 
     projection = (np.dot(centroid, cav) / np.dot(cav, cav)) * cav
     vector_perp = cav - projection
     distance = np.linalg.norm(vector_perp)
 
     stats = {
-        "mean": float(mean),
-        "variance": float(variance),
-        "std_dev": float(std_dev),
+        "mean": statistics.mean,
+        "variance": statistics.variance,
+        "std_dev": statistics.std_dev,
         "median": float(median),
-        "range": float(range_val),
+        "range": statistics.range,
         "iq_range": float(iq_range),
         "density": density,
-        "accuracy": accuracy[0][0],
+        "mean_distance_ci": mean_distance_ci,
+        "accuracy": accuracy,
         "distance": distance,
     }
     return stats
@@ -0,0 +1,196 @@
+import logging
+from typing import Literal, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+DistanceMetric = Literal["mahalanobis", "euclidean"]
+
+
+class ActivationStatistics:
+    """
+    Streaming statistics of activations of shape (samples, features), fed in batches.
+
+    Moments and the covariance are merged exactly per batch (Chan et al.), so they
+    need O(features^2) memory whatever the number of samples. Quantiles and pairwise
+    distances are estimated from a uniform reservoir sample of the rows, instead of
+    the O(samples^2) pairwise distance matrix.
+    """
+
+    def __init__(self, reservoir_size: int = 4096, seed: int | None = None):
+        """
+        Parameters
+        ----------
+        reservoir_size : int
+            Rows kept to estimate quantiles and mean pairwise distances
+        seed : int | None
+            Seed of the reservoir and pair sampling
+        """
+        self._reservoir_size = reservoir_size
+        self._rng = np.random.default_rng(seed)
+
+        self.count = 0
+        self._mean: NDArray[np.float64] | None = None
+        self._m2: NDArray[np.float64] | None = None
+        self._min = np.inf
+        self._max = -np.inf
+        self._reservoir: NDArray[np.float64] | None = None
+
+    def update(self, points: NDArray):
+        """
+        Add a batch of rows of shape (batch, features).
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(len(points), -1)
+        if len(points) == 0:
+            return
+        if self._mean is None:
+            features = points.shape[1]
+            self._mean = np.zeros(features)
+            self._m2 = np.zeros((features, features))
+            self._reservoir = np.empty((0, features))
+
+        batch_count = len(points)
+        batch_mean = points.mean(axis=0)
+        centered = points - batch_mean
+        batch_m2 = centered.T @ centered
+
+        total = self.count + batch_count
+        delta = batch_mean - self._mean
+        self._mean = self._mean + delta * (batch_count / total)
+        self._m2 = (
+            self._m2
+            + batch_m2
+            + np.outer(delta, delta) * (self.count * batch_count / total)
+        )
+        self._min = min(self._min, float(points.min()))
+        self._max = max(self._max, float(points.max()))
+
+        self._update_reservoir(points)
+        self.count = total
+
+    @property
+    def features(self) -> int:
+        return len(self._mean) if self._mean is not None else 0
+
+    @property
+    def centroid(self) -> NDArray[np.float64]:
+        return self._mean
+
+    def covariance(self, ddof: int = 1) -> NDArray[np.float64]:
+        return self._m2 / max(self.count - ddof, 1)
+
+    @property
+    def mean(self) -> float:
+        """
+        Mean of all values, over samples and features.
+        """
+        return float(self._mean.mean())
+
+    @property
+    def variance(self) -> float:
+        """
+        Variance of all values, over samples and features.
+        """
+        feature_variances = np.diag(self._m2) / self.count
+        return float(np.mean(feature_variances + (self._mean - self.mean) ** 2))
+
+    @property
+    def std_dev(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    @property
+    def range(self) -> float:
+        return self._max - self._min
+
+    def quantiles(self, q: NDArray | list[float]) -> NDArray[np.float64]:
+        """
+        Quantiles of all values, estimated from the reservoir. q is in [0, 100].
+        """
+        return np.percentile(self._reservoir, q)
+
+    def rms_distance(self, metric: DistanceMetric = "euclidean") -> float:
+        """
+        Root mean squared distance between pairs of distinct samples, in closed form.
+
+        For the euclidean distance, E||x - y||^2 = 2 trace(cov) over pairs of distinct
+        samples with the sample covariance. For the mahalanobis distance with the
+        inverse sample covariance, this is 2 * features.
+        """
+        if metric == "mahalanobis":
+            return float(np.sqrt(2 * self.features))
+        return float(np.sqrt(2 * np.trace(self.covariance())))
+
+    def mean_distance(
+        self,
+        metric: DistanceMetric = "mahalanobis",
+        pairs: int = 100_000,
+        batch_size: int = 8192,
+    ) -> Tuple[float, float, DistanceMetric]:
+        """
+        Mean distance between pairs of distinct samples, estimated on random pairs of
+        the reservoir.
+
+        The mahalanobis distance uses the inverse sample covariance, like
+        scipy.spatial.distance.pdist. It falls back to the euclidean distance when
+        the covariance is singular.
+
+        Returns
+        -------
+        Tuple[float, float, DistanceMetric]
+            Estimate, half width of its 95% confidence interval and the metric used
+        """
+        reservoir = self._reservoir
+        if len(reservoir) < 2:
+            return 0.0, 0.0, metric
+
+        inverse_covariance = None
+        if metric == "mahalanobis":
+            try:
+                if self.count <= self.features:
+                    raise np.linalg.LinAlgError(
+                        f"The number of observations ({self.count}) is too small; "
+                        "the covariance matrix is singular. For observations with "
+                        f"{self.features} dimensions, at least {self.features + 1} "
+                        "observations are required."
+                    )
+                inverse_covariance = np.linalg.inv(self.covariance())
+            except np.linalg.LinAlgError as e:
+                logging.warning(e)
+                logging.info("Using the euclidean distance")
+                metric = "euclidean"
+
+        first = self._rng.integers(0, len(reservoir), pairs)
+        # Uniform over the other rows, so pairs are of distinct samples
+        second = (first + self._rng.integers(1, len(reservoir), pairs)) % len(reservoir)
+
+        distances = np.empty(pairs)
+        for start in range(0, pairs, batch_size):
+            end = min(start + batch_size, pairs)
+            diff = reservoir[first[start:end]] - reservoir[second[start:end]]
+            if inverse_covariance is not None:
+                squared = np.einsum("ij,ij->i", diff @ inverse_covariance, diff)
+            else:
+                squared = np.einsum("ij,ij->i", diff, diff)
+            distances[start:end] = np.sqrt(np.maximum(squared, 0))
+
+        half_width = 1.96 * distances.std(ddof=1) / np.sqrt(pairs)
+        return float(distances.mean()), float(half_width), metric
+
+    def _update_reservoir(self, points: NDArray[np.float64]):
+        """
+        Reservoir sampling (algorithm R), vectorized over the batch.
+        """
+        used = min(max(self._reservoir_size - len(self._reservoir), 0), len(points))
+        if used > 0:
+            self._reservoir = np.concatenate([self._reservoir, points[:used]])
+            points = points[used:]
+        if len(points) == 0:
+            return
+
+        # Global index of each remaining row, each replaces a random slot with
+        # probability reservoir_size / (index + 1)
+        indices = self.count + used + np.arange(len(points))
+        slots = (self._rng.random(len(points)) * (indices + 1)).astype(np.int64)
+        replace = slots < self._reservoir_size
+        # Later rows overwrite earlier ones in the same slot, as in the sequential loop
+        self._reservoir[slots[replace]] = points[replace]